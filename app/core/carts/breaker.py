@@ -0,0 +1,70 @@
+import threading
+from time import monotonic
+import logging
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker mínimo para el store remoto del carrito.
+    - closed: las llamadas van a Redis; N fallos seguidos abren el circuito.
+    - open: se falla rápido (sin tocar Redis) hasta que vence reset_timeout.
+    - half_open: se deja pasar un único sondeo; si funciona se cierra, si no se reabre.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.open_count = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Indica si la llamada actual puede ir al store remoto."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                log.info("Circuito de Redis cerrado: se retoma el store remoto.")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.open_count += 1
+                    log.warning("Circuito de Redis abierto: se usa el store local.")
+                self._state = OPEN
+                self._opened_at = monotonic()
+
+    def trip(self) -> None:
+        """Abre el circuito de inmediato (p. ej. Redis caído al arrancar)."""
+        with self._lock:
+            self._failures = self.failure_threshold
+        self.record_failure()
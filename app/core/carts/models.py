@@ -65,3 +65,20 @@ class Cart:
             "updated_at": self.updated_at,
             "last_action": self.last_action or {},
         }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict, currency: str = "COP") -> "Cart":
+        """Reconstruye un carrito desde el JSON persistido por los stores."""
+        items = {
+            i["sku"]: CartItem(**{k: v for k, v in i.items() if k != "line_total"})
+            for i in data["items"]
+        }
+        return cls(
+            session_id=session_id,
+            items=items,
+            currency=data.get("currency", currency),
+            created_at=data.get("created_at", _now()),
+            updated_at=data.get("updated_at", _now()),
+            version=data.get("version", 1),
+            last_action=data.get("last_action", {}),
+        )
@@ -1,28 +1,69 @@
+import os
 from time import time
 from app.core.carts.models import CartItem
 from app.core.carts.store_redis import RedisCartStore
 from app.core.carts.store_memory import MemoryCartStore
+from app.core.carts.store_sqlite import SQLiteCartStore
+from app.core.carts.store_failover import FailoverCartStore
+from app.core.carts.breaker import CircuitBreaker
+from app.utils.metrics import chat_stage
 import logging
 
 log = logging.getLogger(__name__)
 
+CART_STORE = os.getenv("CART_STORE", "redis").strip().lower()
+CART_FALLBACK_STORE = os.getenv("CART_FALLBACK_STORE", "memory").strip().lower()
+CART_SQLITE_PATH = os.getenv("CART_SQLITE_PATH", os.path.join("var", "carts.sqlite3"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+CART_BREAKER_FAILURES = int(os.getenv("CART_BREAKER_FAILURES", "3"))
+CART_BREAKER_RESET_SECONDS = float(os.getenv("CART_BREAKER_RESET_SECONDS", "10"))
+CART_REPLAY_ON_FAILBACK = os.getenv("CART_REPLAY_ON_FAILBACK", "1").lower() in ("1", "true", "yes")
+
+
+def build_local_store(kind: str):
+    """Crea un store sin red: 'sqlite' (compartido entre workers) o 'memory'."""
+    if kind == "sqlite":
+        return SQLiteCartStore(path=CART_SQLITE_PATH)
+    return MemoryCartStore()
+
 
 class CartService:
     """Operaciones CRUD con validación y fallback local."""
 
-    def __init__(self, redis_url="redis://localhost:6379/0", client=None):
-        # Intenta Redis y si falla usa memoria (para dev/local sin Redis).
+    def __init__(self, redis_url="redis://localhost:6379/0", client=None, backend=None, fallback=None):
+        backend = (backend or CART_STORE).lower()
+        fallback = (fallback or CART_FALLBACK_STORE).lower()
+        if backend in ("sqlite", "memory"):
+            self.store = build_local_store(backend)
+            log.info(f"CartService usando {backend}.")
+            return
+
+        # Redis detrás de un circuit breaker: si no responde se usa el store local
+        # configurado (memoria o SQLite) y se reintenta periódicamente.
+        breaker = CircuitBreaker(CART_BREAKER_FAILURES, CART_BREAKER_RESET_SECONDS)
+        self.store = FailoverCartStore(
+            RedisCartStore(url=redis_url, client=client, socket_timeout=REDIS_SOCKET_TIMEOUT),
+            build_local_store(fallback),
+            breaker=breaker,
+            replay_on_failback=CART_REPLAY_ON_FAILBACK,
+        )
         try:
-            self.store = RedisCartStore(url=redis_url, client=client)
-            self.store.client.ping()
+            self.store.primary.client.ping()
             log.info("CartService usando Redis.")
         except Exception as err:
-            log.warning(f"No se pudo conectar a Redis ({err}). Usando carrito en memoria.")
-            self.store = MemoryCartStore()
+            log.warning(f"No se pudo conectar a Redis ({err}). Usando carrito local ({fallback}) hasta que responda.")
+            breaker.trip()
+
+    def metrics(self) -> dict:
+        """Estado del backend del carrito (breaker y tiempo de espera en Redis)."""
+        if isinstance(self.store, FailoverCartStore):
+            return self.store.metrics()
+        return {"backend": type(self.store).__name__, "breaker_state": None}
 
     def _session(self, session_id: str) -> str:
         return session_id or "anon-session"
 
+    @chat_stage("cart")
     def add(self, session_id: str, item: CartItem, merge=True):
         session_id = self._session(session_id)
         cart = self.store.get_or_create(session_id, item.currency)
@@ -55,6 +96,7 @@ class CartService:
         self.store.save(cart)
         return cart.to_summary()
 
+    @chat_stage("cart")
     def remove(self, session_id: str, sku: str, qty: int | None = None):
         session_id = self._session(session_id)
         cart = self.store.get_or_create(session_id)
@@ -85,6 +127,7 @@ class CartService:
         self.store.save(cart)
         return cart.to_summary()
 
+    @chat_stage("cart")
     def clear(self, session_id: str):
         session_id = self._session(session_id)
         self.store.clear(session_id)
@@ -98,6 +141,7 @@ class CartService:
         self.store.save(cart)
         return cart.to_summary()
 
+    @chat_stage("cart")
     def show(self, session_id: str):
         session_id = self._session(session_id)
         return self.store.get_or_create(session_id).to_summary()
@@ -0,0 +1,144 @@
+import threading
+from time import perf_counter
+from app.core.carts.breaker import CircuitBreaker, CLOSED, HALF_OPEN
+from app.core.carts.models import Cart
+from app.utils.metrics import REDIS_SECONDS
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class FailoverCartStore:
+    """
+    Store que envuelve Redis (primario) y un store local (fallback) detrás de un circuit breaker.
+    Con el circuito abierto las operaciones van directo al store local sin esperar timeouts;
+    un sondeo periódico (half-open) devuelve el tráfico a Redis cuando vuelve a responder.
+    Tras el failback, un hilo en segundo plano reescribe en Redis los carritos
+    modificados durante la caída (si replay_on_failback está activo) y borra del
+    store local todo lo que sirvió, para que la próxima caída no use carritos viejos.
+    Una petición cuyo carrito sigue pendiente lo reescribe ella misma antes de ir a Redis.
+    """
+
+    def __init__(self, primary, fallback, breaker: CircuitBreaker | None = None, replay_on_failback=True):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker()
+        self.replay_on_failback = replay_on_failback
+        self._dirty: set[str] = set()  # modificados en el store local durante la caída
+        self._touched: set[str] = set()  # servidos por el store local (se limpian tras el failback)
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()  # un carrito a la vez entre el hilo y las peticiones
+        self._replay_thread: threading.Thread | None = None
+        self.redis_wait_seconds = 0.0
+        self.redis_calls = 0
+        self.redis_errors = 0
+        self.fallback_calls = 0
+        self.replayed_carts = 0
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.breaker.state == CLOSED else type(self.fallback).__name__
+
+    def _timed(self, fn, *args):
+        start = perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = perf_counter() - start
+            REDIS_SECONDS.observe(elapsed, client="cart")
+            with self._lock:
+                self.redis_wait_seconds += elapsed
+                self.redis_calls += 1
+
+    def _probe(self) -> None:
+        """Sondeo half-open: solo un ping; el replay corre en segundo plano (ver _failback)."""
+        self._timed(self.primary.client.ping)
+
+    def _replay_one(self, session_id: str) -> None:
+        """Reescribe en Redis el carrito pendiente (si aplica) y lo borra del store local."""
+        with self._replay_lock:
+            with self._lock:
+                if session_id not in self._touched:
+                    return  # ya lo procesó el hilo u otra petición
+                dirty = session_id in self._dirty
+            if dirty and self.replay_on_failback:
+                self._timed(self.primary.save, self.fallback.get_or_create(session_id))
+            self.fallback.clear(session_id)
+            with self._lock:
+                self._dirty.discard(session_id)
+                self._touched.discard(session_id)
+                if dirty and self.replay_on_failback:
+                    self.replayed_carts += 1
+
+    def _start_failback(self) -> None:
+        with self._lock:
+            if not self._touched or (self._replay_thread and self._replay_thread.is_alive()):
+                return
+            self._replay_thread = threading.Thread(target=self._failback, name="cart-failback", daemon=True)
+            self._replay_thread.start()
+
+    def _failback(self) -> None:
+        """Vacía el store local mientras el circuito siga cerrado; se detiene al primer fallo de Redis."""
+        replayed = self.replayed_carts
+        while self.breaker.state == CLOSED:
+            with self._lock:
+                session_id = next(iter(self._touched), None)
+            if session_id is None:
+                break
+            try:
+                self._replay_one(session_id)
+            except Exception as err:
+                with self._lock:
+                    self.redis_errors += 1
+                self.breaker.record_failure()
+                log.warning(f"Replay de carritos interrumpido ({err}); se retoma en el próximo failback.")
+                return
+        if self.replayed_carts > replayed:
+            log.info(f"{self.replayed_carts - replayed} carritos reescritos en Redis tras la recuperación.")
+
+    def _call(self, method: str, session_id: str, *args):
+        if self.breaker.allow():
+            try:
+                if self.breaker.state == HALF_OPEN:
+                    self._probe()
+                if session_id in self._touched:
+                    self._replay_one(session_id)
+                result = self._timed(getattr(self.primary, method), *args)
+                self.breaker.record_success()
+                if self._touched:
+                    self._start_failback()
+                return result
+            except Exception as err:
+                with self._lock:
+                    self.redis_errors += 1
+                self.breaker.record_failure()
+                log.warning(f"Redis falló en {method} ({err}). Usando store local.")
+        with self._lock:
+            self.fallback_calls += 1
+            self._touched.add(session_id)
+            if method != "get_or_create":
+                self._dirty.add(session_id)
+        return getattr(self.fallback, method)(*args)
+
+    def get_or_create(self, session_id: str, currency: str = "COP") -> Cart:
+        return self._call("get_or_create", session_id, session_id, currency)
+
+    def save(self, cart: Cart) -> None:
+        return self._call("save", cart.session_id, cart)
+
+    def clear(self, session_id: str) -> None:
+        return self._call("clear", session_id, session_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "breaker_state": self.breaker.state,
+                "breaker_open_count": self.breaker.open_count,
+                "redis_calls": self.redis_calls,
+                "redis_errors": self.redis_errors,
+                "redis_wait_seconds": round(self.redis_wait_seconds, 6),
+                "fallback_calls": self.fallback_calls,
+                "pending_replay": len(self._dirty),
+                "replayed_carts": self.replayed_carts,
+            }
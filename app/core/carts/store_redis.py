@@ -1,15 +1,20 @@
 import json
 import redis
 from time import time
-from app.core.carts.models import Cart, CartItem
+from app.core.carts.models import Cart
 import logging
 
 log = logging.getLogger(__name__)
 
 class RedisCartStore:
     """Persistencia con auditoría y TTL renovable."""
-    def __init__(self, url="redis://localhost:6379/0", ttl_seconds=3600, client=None):
-        self.client = client or redis.Redis.from_url(url, decode_responses=True)
+    def __init__(self, url="redis://localhost:6379/0", ttl_seconds=3600, client=None, socket_timeout=None):
+        self.client = client or redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+        )
         self.ttl = ttl_seconds
 
     def _key(self, session_id: str) -> str:
@@ -18,20 +23,7 @@ class RedisCartStore:
     def get_or_create(self, session_id: str, currency: str = "COP") -> Cart:
         raw = self.client.get(self._key(session_id))
         if raw:
-            data = json.loads(raw)
-            items = {
-                i["sku"]: CartItem(**{k: v for k, v in i.items() if k != "line_total"})
-                for i in data["items"]
-            }
-            return Cart(
-                session_id=session_id,
-                items=items,
-                currency=data.get("currency", currency),
-                created_at=data.get("created_at", time()),
-                updated_at=data.get("updated_at", time()),
-                version=data.get("version", 1),
-                last_action=data.get("last_action", {}),
-            )
+            return Cart.from_dict(session_id, json.loads(raw), currency)
         cart = Cart(session_id=session_id, items={}, currency=currency)
         self.save(cart)
         return cart
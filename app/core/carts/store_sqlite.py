@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from app.core.carts.models import Cart
+import logging
+
+log = logging.getLogger(__name__)
+
+# Sentencias fijas: sqlite3 cachea la sentencia preparada por conexión
+# (cached_statements), así que cada llamada reutiliza el plan compilado.
+_SQL_CREATE = """
+CREATE TABLE IF NOT EXISTS carts (
+    session_id TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+_SQL_CREATE_IDX = "CREATE INDEX IF NOT EXISTS ix_carts_expires_at ON carts (expires_at)"
+_SQL_GET = "SELECT data FROM carts WHERE session_id = ? AND expires_at > ?"
+_SQL_UPSERT = """
+INSERT INTO carts (session_id, data, expires_at) VALUES (?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+"""
+_SQL_DELETE = "DELETE FROM carts WHERE session_id = ?"
+_SQL_PURGE = "DELETE FROM carts WHERE expires_at <= ?"
+
+
+class SQLiteCartStore:
+    """
+    Carrito compartido entre workers de un mismo host sobre un archivo SQLite en modo WAL.
+    Mantiene una conexión por hilo y el mismo TTL renovable que RedisCartStore.
+    """
+
+    def __init__(self, path="var/carts.sqlite3", ttl_seconds=3600, cleanup_interval=300):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(_SQL_CREATE)
+        conn.execute(_SQL_CREATE_IDX)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=5.0,
+                isolation_level=None,  # autocommit: cada sentencia es su propia transacción
+                cached_statements=64,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get_or_create(self, session_id: str, currency: str = "COP") -> Cart:
+        row = self._conn().execute(_SQL_GET, (session_id, time())).fetchone()
+        if row:
+            return Cart.from_dict(session_id, json.loads(row[0]), currency)
+        cart = Cart(session_id=session_id, items={}, currency=currency)
+        self.save(cart)
+        return cart
+
+    def save(self, cart: Cart) -> None:
+        now = time()
+        cart.updated_at = now
+        cart.version += 1
+        data = cart.to_summary()
+        data["created_at"] = cart.created_at
+        self._conn().execute(_SQL_UPSERT, (cart.session_id, json.dumps(data), now + self.ttl))
+        self._maybe_cleanup(now)
+        log.info(f"Cart {cart.session_id} actualizado en SQLite. Versión {cart.version}")
+
+    def clear(self, session_id: str) -> None:
+        self._conn().execute(_SQL_DELETE, (session_id,))
+        log.info(f"Carrito {session_id} eliminado en SQLite.")
+
+    def purge_expired(self) -> int:
+        """Elimina carritos vencidos. Retorna el número de filas borradas."""
+        cur = self._conn().execute(_SQL_PURGE, (time(),))
+        return cur.rowcount
+
+    def _maybe_cleanup(self, now: float) -> None:
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self.cleanup_interval
+        removed = self.purge_expired()
+        if removed:
+            log.info(f"{removed} carritos vencidos eliminados de SQLite.")
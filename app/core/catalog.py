@@ -1,34 +1,77 @@
-import csv, difflib, json, os, re, unicodedata
+import csv, difflib, hashlib, json, logging, os, re, unicodedata
 
-CATALOG_FILE = os.path.join(os.path.dirname(__file__), "../data/Catalog.csv")
-SYNONYMS_FILE = os.path.join(os.path.dirname(__file__), "../data/synonyms.json")
+from app.core.catalog_snapshot import CatalogSnapshot
+from app.utils.metrics import chat_stage, registry
+from app.utils.structured_log import trace
+
+log = logging.getLogger(__name__)
+
+CATALOG_FILE = os.getenv("CATALOG_FILE") or os.path.join(os.path.dirname(__file__), "../data/Catalog.csv")
+SYNONYMS_FILE = os.getenv("SYNONYMS_FILE") or os.path.join(os.path.dirname(__file__), "../data/synonyms.json")
+# Snapshot binario compilado con `python -m app.core.catalog_snapshot --build` (vacío = leer el CSV)
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "").strip()
+CATALOG_SNAPSHOT_CANDIDATES = int(os.getenv("CATALOG_SNAPSHOT_CANDIDATES", "100"))
 
 # ----------------------------------------------------------------------
 # 1️⃣ CARGA DEL CATÁLOGO Y SINÓNIMOS
 # ----------------------------------------------------------------------
-def load_catalog():
+def load_catalog(path: str | None = None):
     """Carga el CSV del catálogo detectando codificación automáticamente."""
     for enc in ("utf-8-sig", "latin-1"):
         try:
-            with open(CATALOG_FILE, encoding=enc) as f:
+            with open(path or CATALOG_FILE, encoding=enc) as f:
                 return list(csv.DictReader(f))
         except UnicodeDecodeError:
             continue
     raise RuntimeError("No se pudo leer el catálogo con las codificaciones conocidas.")
 
-CATALOG = load_catalog()
+def file_version(path: str) -> str:
+    """Hash corto del archivo: identifica qué versión del catálogo está cargada."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def _open_snapshot() -> CatalogSnapshot | None:
+    """Abre CATALOG_SNAPSHOT si corresponde a los archivos actuales; si no, se usa el CSV."""
+    if not CATALOG_SNAPSHOT:
+        return None
+    try:
+        snapshot = CatalogSnapshot(CATALOG_SNAPSHOT)
+    except (OSError, ValueError) as err:
+        log.warning(f"Snapshot de catálogo no disponible ({err}); se usa el CSV.")
+        return None
+    expected = {"catalog": file_version(CATALOG_FILE)}
+    if os.path.exists(SYNONYMS_FILE):
+        expected["synonyms"] = file_version(SYNONYMS_FILE)
+    if snapshot.sources != expected:
+        log.warning(f"{CATALOG_SNAPSHOT} no corresponde al catálogo actual; se usa el CSV (recompilar con python -m app.core.catalog_snapshot --build).")
+        return None
+    return snapshot
+
+SNAPSHOT = _open_snapshot()
+CATALOG = SNAPSHOT.rows if SNAPSHOT is not None else load_catalog()
+CATALOG_VERSION = SNAPSHOT.sources["catalog"] if SNAPSHOT is not None else file_version(CATALOG_FILE)
+
+@registry.collector
+def _catalog_metrics():
+    return [
+        ("catalog_snapshot_info", "Versión del catálogo cargado", ("version",), [((CATALOG_VERSION,), 1)]),
+        ("catalog_products", "Productos en el catálogo", (), [((), len(CATALOG))]),
+        ("catalog_mmap_snapshot", "1 si el catálogo se sirve desde el snapshot mmap", (), [((), int(SNAPSHOT is not None))]),
+    ]
 
-if os.path.exists(SYNONYMS_FILE):
+if SNAPSHOT is None and os.path.exists(SYNONYMS_FILE):
     with open(SYNONYMS_FILE, encoding="utf-8-sig") as f:
         SYNONYMS = json.load(f)
 else:
-    SYNONYMS = {}
+    SYNONYMS = {}  # con snapshot, los sinónimos viven en su trie
 
 # Normalizados en caché para evitar recomputar en cada llamada
 CATALOG_NORMALIZED = []
 CATALOG_NAMES_NORMALIZED = []
 CATALOG_NORM_MAP = {}
 SYNONYMS_NORMALIZED = {}
+SYNONYM_PATTERNS = []  # [(producto, regex compilado)] en el orden de synonyms.json
+_CACHES_READY = False
 
 # ----------------------------------------------------------------------
 # 2️⃣ NORMALIZACIÓN DE TEXTO
@@ -44,29 +87,60 @@ def normalize_text(text: str) -> str:
 # ----------------------------------------------------------------------
 # CACHE DE NOMBRES NORMALIZADOS
 # ----------------------------------------------------------------------
-def _init_caches() -> None:
-    """Construye caches de nombres normalizados para catálogo y sinónimos."""
+def rebuild_caches() -> None:
+    """
+    Construye las caches de nombres normalizados y los regex de sinónimos.
+    Se arman aparte y se publican al final: un request concurrente (p. ej.
+    durante el warm-up) nunca ve caches a medio construir.
+    """
     global CATALOG_NORMALIZED, CATALOG_NAMES_NORMALIZED, CATALOG_NORM_MAP, SYNONYMS_NORMALIZED
-    if CATALOG_NORMALIZED and SYNONYMS_NORMALIZED:
-        return
-
-    if not CATALOG_NORMALIZED:
-        for row in CATALOG:
-            norm_name = normalize_text(row["nombre"])
-            CATALOG_NORMALIZED.append((row["nombre"], norm_name))
-            CATALOG_NAMES_NORMALIZED.append(norm_name)
-            CATALOG_NORM_MAP.setdefault(norm_name, row)
-
-    if not SYNONYMS_NORMALIZED:
-        for key, variants in SYNONYMS.items():
-            normalized_vars = []
-            for v in variants:
-                nv = normalize_text(v)
-                if len(nv) <= 2:
-                    continue
-                normalized_vars.append(nv)
-            if normalized_vars:
-                SYNONYMS_NORMALIZED[key] = normalized_vars
+    global SYNONYM_PATTERNS, _CACHES_READY
+    catalog_normalized, names_normalized, norm_map = [], [], {}
+    for row in (CATALOG if SNAPSHOT is None else ()):  # el snapshot ya trae sus índices
+        norm_name = normalize_text(row["nombre"])
+        catalog_normalized.append((row["nombre"], norm_name))
+        names_normalized.append(norm_name)
+        norm_map.setdefault(norm_name, row)
+
+    synonyms_normalized, patterns = {}, []
+    for key, variants in SYNONYMS.items():
+        normalized_vars = []
+        for v in variants:
+            nv = normalize_text(v)
+            if len(nv) <= 2:
+                continue
+            normalized_vars.append(nv)
+            # Compilados una vez: son más que los que guarda la caché interna de `re`
+            patterns.append((key, re.compile(rf"\b{re.escape(nv)}\b")))
+        if normalized_vars:
+            synonyms_normalized[key] = normalized_vars
+
+    CATALOG_NORMALIZED, CATALOG_NAMES_NORMALIZED, CATALOG_NORM_MAP = catalog_normalized, names_normalized, norm_map
+    SYNONYMS_NORMALIZED, SYNONYM_PATTERNS = synonyms_normalized, patterns
+    _CACHES_READY = True
+
+
+def _init_caches() -> None:
+    """Construye las caches en el primer uso (el warm-up del arranque las adelanta)."""
+    if not _CACHES_READY:
+        rebuild_caches()
+
+def _fuzzy_pool(text: str):
+    """
+    Nombres sobre los que corre la búsqueda difusa: todo el catálogo en memoria,
+    o con snapshot CATALOG_SNAPSHOT_CANDIDATES filas (en orden del CSV, como la
+    caché). Con catálogos más grandes que ese límite son las que más trigramas
+    comparten con `text`, así que el resultado puede diferir del CSV.
+    """
+    if SNAPSHOT is None:
+        return CATALOG_NORMALIZED, CATALOG_NAMES_NORMALIZED, CATALOG_NORM_MAP
+    normalized, norm_map = [], {}
+    for index in SNAPSHOT.candidates(text, CATALOG_SNAPSHOT_CANDIDATES):
+        row = SNAPSHOT.row(index)
+        norm_name = SNAPSHOT.normalized_name(index)
+        normalized.append((row["nombre"], norm_name))
+        norm_map.setdefault(norm_name, row)
+    return normalized, [name for _, name in normalized], norm_map
 
 # ----------------------------------------------------------------------
 # 3️⃣ FUNCIÓN DE SIMILITUD Y COINCIDENCIA INTELIGENTE
@@ -74,13 +148,12 @@ def _init_caches() -> None:
 def similarity(a, b):
     return difflib.SequenceMatcher(None, a, b).ratio()
 
+@chat_stage("catalog_match")
 def find_product_from_message(message: str) -> str | None:
     """
     Busca el producto más probable en el catálogo.
     Incluye coincidencia difusa, sinónimos y control de umbral.
     """
-    print("✅ EJECUTANDO VERSION CORRECTA DE catalog.py")
-
     _init_caches()
     msg = normalize_text(message)
     words = msg.split()
@@ -88,15 +161,20 @@ def find_product_from_message(message: str) -> str | None:
     best_score = 0.0
 
     # 🔹 Prioridad 1: sinónimos (si existe synonyms.json)
-    for key, norm_variants in SYNONYMS_NORMALIZED.items():
-        for norm_variant in norm_variants:
-            if re.search(rf"\b{re.escape(norm_variant)}\b", msg):
-                print(f"[DEBUG] Coincidencia exacta por sinónimo: {key}")
-                return key
+    if SNAPSHOT is not None:
+        key = SNAPSHOT.match_synonym(msg)
+        if key:
+            trace("catalog.match", via="sinonimo", producto=key)
+            return key
+    for key, pattern in SYNONYM_PATTERNS:
+        if pattern.search(msg):
+            trace("catalog.match", via="sinonimo", producto=key)
+            return key
 
 
     # 🔹 Prioridad 2: coincidencia directa o parcial
-    for original_name, name in CATALOG_NORMALIZED:
+    pool, pool_names, pool_map = _fuzzy_pool(msg)
+    for original_name, name in pool:
         for w in words:
             if w in name or name in w:
                 score = similarity(msg, name)
@@ -105,10 +183,10 @@ def find_product_from_message(message: str) -> str | None:
 
     # 🔹 Prioridad 3: coincidencia difusa más general
     for w in words:
-        matches = difflib.get_close_matches(w, CATALOG_NAMES_NORMALIZED, n=1, cutoff=0.65)
+        matches = difflib.get_close_matches(w, pool_names, n=1, cutoff=0.65)
         if matches:
             match_norm = matches[0]
-            row = CATALOG_NORM_MAP.get(match_norm)
+            row = pool_map.get(match_norm)
             if row:
                 score = similarity(msg, match_norm)
                 if score > best_score:
@@ -119,15 +197,15 @@ def find_product_from_message(message: str) -> str | None:
     # 🔹 Filtro final y retorno controlado
     # ------------------------------------------------------------------
     if not best_match:
-        print(f"[DEBUG] Ninguna coincidencia fuerte (max score={best_score:.2f})")
+        trace("catalog.match", via="ninguna", score=round(best_score, 2))
         return None
 
     # 🔹 Evita falsos positivos (ej. 'detergente' → 'té verde')
     if best_score < 0.65:
-        print(f"[DEBUG] Coincidencia débil descartada (score={best_score:.2f})")
+        trace("catalog.match", via="descartada", producto=best_match, score=round(best_score, 2))
         return None
 
-    print(f"[DEBUG] Mejor coincidencia aceptada: {best_match} (score={best_score:.2f})")
+    trace("catalog.match", via="difusa", producto=best_match, score=round(best_score, 2))
     return best_match
 
 
@@ -135,19 +213,25 @@ def find_product_from_message(message: str) -> str | None:
 # ----------------------------------------------------------------------
 # 4️⃣ ACCESO A UNA FILA COMPLETA DEL CATÁLOGO
 # ----------------------------------------------------------------------
+@chat_stage("catalog_match")
 def get_product_row(product_name: str) -> dict | None:
     """Devuelve la fila completa del producto por nombre o coincidencia aproximada."""
     if not product_name:
         return None
     _init_caches()
     normalized = normalize_text(product_name)
-    if normalized in CATALOG_NORM_MAP:
+    if SNAPSHOT is not None:
+        index = SNAPSHOT.lookup_exact(normalized)
+        if index is not None:
+            return SNAPSHOT.row(index)
+    elif normalized in CATALOG_NORM_MAP:
         return CATALOG_NORM_MAP[normalized]
 
     # Buscar coincidencia cercana si no hay exacta
-    match = difflib.get_close_matches(normalized, CATALOG_NAMES_NORMALIZED, n=1, cutoff=0.4)
+    _, pool_names, pool_map = _fuzzy_pool(normalized)
+    match = difflib.get_close_matches(normalized, pool_names, n=1, cutoff=0.4)
     if match:
-        row = CATALOG_NORM_MAP.get(match[0])
+        row = pool_map.get(match[0])
         if row:
             return row
     return None
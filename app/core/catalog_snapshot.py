@@ -0,0 +1,331 @@
+# app/core/catalog_snapshot.py
+"""
+Snapshot binario del catálogo para servidores con varios workers.
+
+Cada worker que parsea `Catalog.csv` y `synonyms.json` arma sus propias cachés
+normalizadas: con catálogos grandes la RSS se multiplica por la cantidad de
+workers y cada arranque tarda segundos. El compilador escribe un archivo con
+todo lo que necesita `app/core/catalog.py` ya resuelto; los workers lo abren
+con `mmap` de solo lectura (CATALOG_SNAPSHOT=ruta), así que las páginas viven
+en el page cache del sistema y se comparten entre procesos sin `--preload`.
+
+Secciones (arreglos nativos alineados a 8 bytes; el header JSON guarda
+offsets, typecodes, byteorder y el hash de los archivos fuente):
+- `str_offsets`/`str_data`: tabla de strings internados (celdas del CSV,
+  nombres normalizados, claves de sinónimos).
+- `cells`: filas × columnas como ids de string; `norm_names` y `norm_sorted`
+  (filas ordenadas por nombre normalizado, para la búsqueda exacta).
+- `gram_keys`/`gram_offsets`/`gram_postings`: índice invertido de trigramas
+  (crc32) → filas; acota la búsqueda difusa a los candidatos que comparten
+  más trigramas con el mensaje.
+- `tok_*`, `node_edges`, `edge_tok`, `edge_child`, `node_key`: trie por
+  tokens de las variantes de sinónimos. `node_key` es la clave de menor orden
+  que termina en el nodo, así se respeta la prioridad de synonyms.json.
+
+Compilar (repetir cada vez que cambie el catálogo; un snapshot desactualizado
+se ignora y se vuelve al CSV):
+    python -m app.core.catalog_snapshot --build var/catalog.snap
+    python -m app.core.catalog_snapshot --info var/catalog.snap
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+MAGIC = b"CATSNAP1"
+FORMAT_VERSION = 1
+
+
+def _grams(text: str) -> set[int]:
+    """Trigramas (crc32) de un texto normalizado, con un espacio de relleno a cada lado."""
+    padded = f" {' '.join(text.split())} "
+    return {zlib.crc32(padded[i:i + 3].encode()) for i in range(len(padded) - 2)}
+
+
+# === Compilador ===
+class _Strings:
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def add(self, value: str) -> int:
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return sid
+
+
+def _string_table(values: list[str]) -> tuple[array, bytes]:
+    offsets, chunks, pos = array("I", [0]), [], 0
+    for value in values:
+        data = value.encode("utf-8")
+        chunks.append(data)
+        pos += len(data)
+        offsets.append(pos)
+    return offsets, b"".join(chunks)
+
+
+def build_snapshot(rows: list[dict], synonyms: dict[str, list[str]], path: str, sources: dict | None = None) -> dict:
+    """Escribe el snapshot de `rows`/`synonyms` en `path` (atómico). Retorna el header."""
+    from app.core.catalog import normalize_text
+
+    columns = list(rows[0].keys()) if rows else []
+    strings = _Strings()
+    cells = array("I")
+    norm_names = array("I")
+    postings: dict[int, list[int]] = {}
+    for i, row in enumerate(rows):
+        cells.extend(strings.add(row.get(c) or "") for c in columns)
+        norm = normalize_text(row["nombre"])
+        norm_names.append(strings.add(norm))
+        for gram in _grams(norm):
+            postings.setdefault(gram, []).append(i)
+    norm_sorted = array("I", sorted(range(len(rows)), key=lambda i: (strings.values[norm_names[i]].encode(), i)))
+
+    gram_keys, gram_offsets, gram_postings = array("I"), array("I", [0]), array("I")
+    for gram in sorted(postings):
+        gram_keys.append(gram)
+        gram_postings.extend(postings[gram])
+        gram_offsets.append(len(gram_postings))
+
+    # Trie de sinónimos: mismas variantes que la caché en memoria (normalizadas, > 2 caracteres)
+    keys = list(synonyms)
+    children: list[dict[str, int]] = [{}]
+    node_key = array("i", [-1])
+    for order, key in enumerate(keys):
+        for variant in synonyms[key]:
+            norm = normalize_text(variant)
+            if len(norm) <= 2 or not norm.split():
+                continue
+            node = 0
+            for token in norm.split():
+                child = children[node].get(token)
+                if child is None:
+                    child = children[node][token] = len(children)
+                    children.append({})
+                    node_key.append(-1)
+                node = child
+            if node_key[node] == -1:
+                node_key[node] = order  # las claves se recorren en orden: la primera gana
+    tokens = sorted({t for edges in children for t in edges}, key=lambda t: t.encode())
+    token_ids = {t: i for i, t in enumerate(tokens)}
+    tok_offsets, tok_data = _string_table(tokens)
+    node_edges, edge_tok, edge_child = array("I", [0]), array("I"), array("I")
+    for edges in children:
+        for token in sorted(edges, key=token_ids.__getitem__):
+            edge_tok.append(token_ids[token])
+            edge_child.append(edges[token])
+        node_edges.append(len(edge_tok))
+    syn_keys = array("I", (strings.add(k) for k in keys))
+
+    str_offsets, str_data = _string_table(strings.values)
+    sections = {
+        "str_offsets": str_offsets, "str_data": str_data,
+        "cells": cells, "norm_names": norm_names, "norm_sorted": norm_sorted,
+        "gram_keys": gram_keys, "gram_offsets": gram_offsets, "gram_postings": gram_postings,
+        "tok_offsets": tok_offsets, "tok_data": tok_data,
+        "node_edges": node_edges, "edge_tok": edge_tok, "edge_child": edge_child, "node_key": node_key,
+        "syn_keys": syn_keys,
+    }
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "sources": sources or {},
+        "columns": columns,
+        "rows": len(rows),
+        "synonym_keys": len(keys),
+        "sections": {},
+    }
+    # Offsets relativos al fin del header; el header se rellena a múltiplo de 8
+    pos, blobs = 0, []
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else data
+        typecode = data.typecode if isinstance(data, array) else "B"
+        header["sections"][name] = [pos, len(raw), typecode]
+        pad = -len(raw) % 8
+        blobs.append(raw + b"\0" * pad)
+        pos += len(raw) + pad
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    head += b" " * (-(len(MAGIC) + 4 + len(head)) % 8)
+
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(head)) + head)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return header
+
+
+def compile_files(catalog_file: str, synonyms_file: str, path: str) -> dict:
+    from app.core.catalog import file_version, load_catalog
+
+    rows = load_catalog(catalog_file)
+    synonyms = {}
+    sources = {"catalog": file_version(catalog_file)}
+    if os.path.exists(synonyms_file):
+        with open(synonyms_file, encoding="utf-8-sig") as f:
+            synonyms = json.load(f)
+        sources["synonyms"] = file_version(synonyms_file)
+    return build_snapshot(rows, synonyms, path, sources)
+
+
+# === Lectura (mmap) ===
+class SnapshotRows(Sequence):
+    """Filas del catálogo como secuencia de dicts decodificados al acceder."""
+
+    def __init__(self, snapshot: "CatalogSnapshot"):
+        self._snap = snapshot
+
+    def __len__(self) -> int:
+        return self._snap.row_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._snap.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._snap.row(index)
+
+
+class CatalogSnapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un snapshot de catálogo")
+        (head_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        base = len(MAGIC) + 4 + head_len
+        self.header = json.loads(bytes(self._mm[len(MAGIC) + 4:base]))
+        if self.header["format"] != FORMAT_VERSION or self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path}: formato o byteorder incompatibles, recompilar")
+        view = memoryview(self._mm)
+        for name, (offset, length, typecode) in self.header["sections"].items():
+            section = view[base + offset:base + offset + length]
+            setattr(self, name, section if typecode == "B" else section.cast(typecode))
+        self.columns = self.header["columns"]
+        self.row_count = self.header["rows"]
+        self.sources = self.header["sources"]
+        self.rows = SnapshotRows(self)
+
+    # --- Strings ---
+    def string(self, sid: int) -> str:
+        return bytes(self.str_data[self.str_offsets[sid]:self.str_offsets[sid + 1]]).decode("utf-8")
+
+    def _token(self, tid: int) -> bytes:
+        return bytes(self.tok_data[self.tok_offsets[tid]:self.tok_offsets[tid + 1]])
+
+    def row(self, index: int) -> dict:
+        width = len(self.columns)
+        start = index * width
+        return {c: self.string(self.cells[start + k]) for k, c in enumerate(self.columns)}
+
+    def normalized_name(self, index: int) -> str:
+        return self.string(self.norm_names[index])
+
+    # --- Búsquedas ---
+    def lookup_exact(self, normalized: str) -> int | None:
+        """Primera fila (en orden del CSV) cuyo nombre normalizado es exactamente `normalized`."""
+        target = normalized.encode()
+        lo, hi = 0, self.row_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.normalized_name(self.norm_sorted[mid]).encode() < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.row_count and self.normalized_name(self.norm_sorted[lo]) == normalized:
+            return self.norm_sorted[lo]
+        return None
+
+    def candidates(self, text: str, limit: int) -> list[int]:
+        """
+        `limit` filas para la búsqueda difusa, en orden del CSV. Si el catálogo
+        cabe en `limit` son todas (mismo resultado que sin snapshot); si no, las
+        que más trigramas comparten con `text`, completadas en orden del CSV con
+        filas sin trigramas en común (difflib también puede elegirlas).
+        """
+        if self.row_count <= limit:
+            return list(range(self.row_count))
+        counts: Counter = Counter()
+        for gram in _grams(text):
+            i = bisect.bisect_left(self.gram_keys, gram)
+            if i < len(self.gram_keys) and self.gram_keys[i] == gram:
+                counts.update(self.gram_postings[self.gram_offsets[i]:self.gram_offsets[i + 1]])
+        rows = {row for row, _ in counts.most_common(limit)}
+        row = 0
+        while len(rows) < limit:
+            rows.add(row)
+            row += 1
+        return sorted(rows)
+
+    def _token_id(self, token: str) -> int | None:
+        target = token.encode()
+        lo, hi = 0, len(self.tok_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._token(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.tok_offsets) - 1 and self._token(lo) == target:
+            return lo
+        return None
+
+    def _child(self, node: int, tid: int) -> int | None:
+        lo, hi = self.node_edges[node], self.node_edges[node + 1]
+        i = bisect.bisect_left(self.edge_tok, tid, lo, hi)
+        if i < hi and self.edge_tok[i] == tid:
+            return self.edge_child[i]
+        return None
+
+    def match_synonym(self, normalized_message: str) -> str | None:
+        """Clave de sinónimo de menor orden cuya variante aparece como secuencia de tokens."""
+        ids = [self._token_id(t) for t in normalized_message.split()]
+        best = -1
+        for start in range(len(ids)):
+            node = 0
+            for tid in ids[start:]:
+                if tid is None:
+                    break
+                node = self._child(node, tid)
+                if node is None:
+                    break
+                key = self.node_key[node]
+                if key >= 0 and (best < 0 or key < best):
+                    best = key
+        return self.string(self.syn_keys[best]) if best >= 0 else None
+
+
+if __name__ == "__main__":
+    from app.core.catalog import CATALOG_FILE, SYNONYMS_FILE
+
+    parser = argparse.ArgumentParser(description="Compila o inspecciona el snapshot binario del catálogo.")
+    parser.add_argument("--build", metavar="RUTA", help="Escribir el snapshot en esta ruta")
+    parser.add_argument("--catalog", default=CATALOG_FILE, help="CSV del catálogo")
+    parser.add_argument("--synonyms", default=SYNONYMS_FILE, help="JSON de sinónimos")
+    parser.add_argument("--info", metavar="RUTA", help="Mostrar el header de un snapshot")
+    args = parser.parse_args()
+    if args.build:
+        header = compile_files(args.catalog, args.synonyms, args.build)
+        size = os.path.getsize(args.build)
+        print(f"[catalog_snapshot] {args.build}: {header['rows']} productos, {header['synonym_keys']} claves de sinónimos, {size / 1024:.0f} KiB")
+    elif args.info:
+        header = CatalogSnapshot(args.info).header
+        print(json.dumps({k: v for k, v in header.items() if k != "sections"}, ensure_ascii=False, indent=2))
+    else:
+        parser.print_help()
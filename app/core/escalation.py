@@ -1,5 +1,3 @@
-print("🔥 escalation.py CARGADO desde:", __file__)
-
 # -*- coding: utf-8 -*-
 """
 AI-FoodSales • Escalamiento v1.4.1
@@ -19,6 +17,9 @@ import re, difflib
 from dataclasses import dataclass
 from typing import Dict, List
 
+from app.utils.metrics import chat_stage
+from app.utils.structured_log import trace
+
 
 # ---------------------------
 # Léxicos base
@@ -395,6 +396,7 @@ def score_sarcasm(text: str, s: Scores):
 # Decisión principal
 # ---------------------------
 
+@chat_stage("escalation")
 def should_escalate(message:str)->Dict:
     if not message:
         return {"agent_response":"","should_escalate":False,"summary":{}}
@@ -428,14 +430,6 @@ def should_escalate(message:str)->Dict:
     score_complaint(t, s)
     score_sarcasm(t, s)
 
-    # --- DEBUG TEMPORAL (eliminar luego) ---
-    print(">>> SHOULD_ESCALATE CALLED with raw message:", repr(message))
-    print(">>> normalized text:", repr(t))
-    print(">>> SCORES BEFORE DECISION -> sarcasm:", s.sarcasm, "complaint:", s.complaint, "politeness:", s.politeness)
-    print(">>> CUES:", s.cues)
-    # --- END DEBUG ---
-
-
     # 👉 NUEVO BLOQUE: sarcasmo fuerte cuenta como reclamo implícito
     if s.sarcasm >= THRESHOLDS["sarcasm"]:
         s.complaint += 0.8
@@ -475,8 +469,17 @@ def should_escalate(message:str)->Dict:
             "Quiero ayudarte mejor. ¿Podrías indicar el número de pedido y describir brevemente el problema "
             "(cobro erróneo, producto faltante, demora, calidad)?"
         )
-    
-    print(">>> DEBUG SCORES:", s.sarcasm, s.complaint, s.politeness, s.cues)
+
+    trace(
+        "escalation.scores",
+        texto=t,
+        sarcasm=round(s.sarcasm, 2),
+        complaint=round(s.complaint, 2),
+        politeness=round(s.politeness, 2),
+        threshold=thr,
+        cues=s.cues,
+        escalate=escalate,
+    )
 
     # 🧩 Failsafe: asegurar estructura de retorno completa
     if not isinstance(s.cues, dict):
@@ -0,0 +1,236 @@
+# app/core/faq_index.py
+"""
+Recuperación de respuestas para la intención FAQ (BM25 sobre los documentos).
+
+Fuentes (FAQ_SOURCES, separadas por coma): `app/data/faq.json` (una entrada
+por clave), `Docs/FAQ_FoodSales.txt` (una pasada por pregunta `###`) y
+`Docs/Agent-policies.txt` (una por sección `##`). Los documentos `Agent-*` son
+instrucciones internas: compiten en el ranking (una pregunta sobre stock no
+debe contestarse con una FAQ ajena) pero su texto no se muestra al cliente.
+Cada pasaje se indexa con su
+título (con doble peso) y su cuerpo, normalizados: minúsculas, sin tildes,
+sin stopwords y con un stemmer de sufijos en español, así "devoluciones",
+"devolución" y "devolver" caen en el mismo término.
+
+- `answer_faq(pregunta)` devuelve el pasaje con mayor puntaje BM25 (o None si
+  ninguno supera FAQ_MIN_SCORE). Las respuestas se cachean por pregunta
+  normalizada (FAQ_CACHE_SIZE).
+- El índice se arma en el warm-up del arranque. Cada FAQ_RELOAD_SECONDS una
+  consulta revisa mtime/tamaño de las fuentes; si cambiaron, se reconstruye
+  y se vacía la caché.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.utils.structured_log import trace
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+FAQ_SOURCES = [
+    p.strip() for p in os.getenv(
+        "FAQ_SOURCES",
+        ",".join([
+            os.path.join(_ROOT, "app", "data", "faq.json"),
+            os.path.join(_ROOT, "Docs", "FAQ_FoodSales.txt"),
+            os.path.join(_ROOT, "Docs", "Agent-policies.txt"),
+        ]),
+    ).split(",") if p.strip()
+]
+FAQ_MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "1.0"))
+FAQ_CACHE_SIZE = int(os.getenv("FAQ_CACHE_SIZE", "1024"))
+FAQ_RELOAD_SECONDS = float(os.getenv("FAQ_RELOAD_SECONDS", "5"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TITLE_WEIGHT = 2
+
+# ---------------------------
+# Normalización
+# ---------------------------
+
+STOPWORDS = {
+    "a", "al", "algo", "ante", "como", "con", "contra", "cual", "cuales", "cuando", "cuanto", "cuanta",
+    "cuantos", "cuantas", "de", "del", "desde", "donde", "e", "el", "ella", "ellos", "en", "entre", "es",
+    "esa", "ese", "eso", "esta", "estan", "este", "esto", "ha", "hay", "la", "las", "le", "les", "lo", "los", "me", "mi", "mis", "muy", "nos", "o", "para",
+    "pero", "por", "porque", "que", "quien", "se", "si", "sin", "sobre", "son", "su", "sus", "te", "tu",
+    "un", "una", "uno", "unos", "unas", "y", "ya", "yo", "usted", "ustedes", "hola", "quiero", "quisiera",
+    "tienen", "tiene", "hacen", "puedo", "puede", "pueden", "saber", "favor", "gracias", "buenas", "buenos",
+}
+
+# Sufijos del más largo al más corto; se quita uno solo si quedan ≥ 3 letras
+_SUFFIXES = sorted([
+    "abilidades", "ibilidades", "abilidad", "ibilidad", "amientos", "imientos", "amiento", "imiento",
+    "aciones", "uciones", "idades", "mente", "adoras", "adores", "ancias", "acion", "ucion", "ancia",
+    "adora", "ador", "idad", "ables", "ibles", "able", "ible", "istas", "ista", "osos", "osas", "oso", "osa",
+    "ivas", "ivos", "iva", "ivo", "ando", "iendo", "ados", "adas", "idos", "idas", "ado", "ada", "ido", "ida",
+    "ar", "er", "ir", "an", "en", "es", "os", "as", "s", "o", "a", "e",
+], key=len, reverse=True)
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def analyze(text: str) -> list[str]:
+    """Texto → términos indexables (minúsculas, sin tildes ni stopwords, con stem)."""
+    words = re.findall(r"[a-z0-9]+", _strip_accents(text.lower()))
+    return [stem(w) for w in words if w not in STOPWORDS]
+
+
+# ---------------------------
+# Pasajes
+# ---------------------------
+
+@dataclass
+class Passage:
+    source: str
+    title: str
+    text: str
+    internal: bool = False  # instrucción para el agente, no apta para mostrar
+
+
+@dataclass
+class FaqHit:
+    passage: Passage
+    score: float
+
+
+def _clean(line: str) -> str:
+    return line.replace("**", "").replace("*", "").rstrip()
+
+
+def _markdown_sections(path: str, marker: str, internal: bool = False) -> list[Passage]:
+    """Un pasaje por encabezado `marker` (p. ej. '### '); ignora el título del documento y los separadores."""
+    passages, title, body = [], None, []
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    for line in lines + [marker]:
+        if line.startswith(marker):
+            if title and any(body):
+                passages.append(Passage(os.path.basename(path), title, "\n".join(body).strip(), internal))
+            title = re.sub(r"^\d+\.\s*", "", _clean(line[len(marker):]).strip())
+            body = []
+        elif title is not None and line.strip() != "---":
+            body.append(_clean(line))
+    return passages
+
+
+def load_passages(sources: list[str]) -> list[Passage]:
+    passages = []
+    for path in sources:
+        if not os.path.exists(path):
+            continue
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8-sig") as f:
+                passages += [Passage(os.path.basename(path), key, answer) for key, answer in json.load(f).items()]
+        elif os.path.basename(path).lower().startswith("faq"):
+            passages += _markdown_sections(path, "### ")
+        else:
+            passages += _markdown_sections(path, "## ", internal=os.path.basename(path).startswith("Agent-"))
+    return passages
+
+
+# ---------------------------
+# Índice BM25
+# ---------------------------
+
+class FaqIndex:
+    def __init__(self, passages: list[Passage]):
+        self.passages = passages
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths: list[int] = []
+        for doc_id, passage in enumerate(passages):
+            terms = analyze(passage.title) * TITLE_WEIGHT + analyze(passage.text)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+        n = len(passages)
+        self.avg_length = sum(self.lengths) / n if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, terms: tuple[str, ...], k: int = 1) -> list[FaqHit]:
+        scores: dict[int, float] = {}
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [FaqHit(self.passages[doc_id], round(score, 4)) for doc_id, score in best]
+
+
+def _signature(sources: list[str]) -> tuple:
+    result = []
+    for path in sources:
+        try:
+            st = os.stat(path)
+            result.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            result.append((path, None, None))
+    return tuple(result)
+
+
+_index: FaqIndex | None = None
+_index_signature: tuple | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def rebuild_index() -> FaqIndex:
+    """Construye el índice desde FAQ_SOURCES y lo publica (vacía la caché de respuestas)."""
+    global _index, _index_signature, _checked_at
+    with _lock:
+        signature = _signature(FAQ_SOURCES)
+        index = FaqIndex(load_passages(FAQ_SOURCES))
+        _index, _index_signature, _checked_at = index, signature, time.monotonic()
+        _cached_search.cache_clear()
+    return index
+
+
+def get_index() -> FaqIndex:
+    """Índice actual; lo reconstruye si las fuentes cambiaron (revisión cada FAQ_RELOAD_SECONDS)."""
+    global _checked_at
+    if _index is None:
+        return rebuild_index()
+    now = time.monotonic()
+    if now - _checked_at >= FAQ_RELOAD_SECONDS:
+        _checked_at = now
+        if _signature(FAQ_SOURCES) != _index_signature:
+            return rebuild_index()
+    return _index
+
+
+@lru_cache(maxsize=FAQ_CACHE_SIZE)
+def _cached_search(terms: tuple[str, ...]) -> FaqHit | None:
+    hits = _index.search(terms, k=1)
+    return hits[0] if hits and hits[0].score >= FAQ_MIN_SCORE else None
+
+
+def answer_faq(question: str) -> FaqHit | None:
+    """Pasaje que mejor responde la pregunta, o None si ninguno es suficientemente relevante."""
+    get_index()
+    terms = tuple(sorted(set(analyze(question))))
+    if not terms:
+        return None
+    hit = _cached_search(terms)
+    if hit is not None:
+        trace("faq.match", fuente=hit.passage.source, titulo=hit.passage.title, score=hit.score, interno=hit.passage.internal)
+    return hit
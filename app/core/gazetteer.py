@@ -0,0 +1,175 @@
+# app/core/gazetteer.py
+"""
+Gazetteer de municipios para las intenciones de logística.
+
+Cada fila de `app/data/municipalities.csv` (GAZETTEER_FILE) trae municipio,
+departamento, región de despacho, banda de entrega en días hábiles (vacía =
+zona regional, GAZETTEER_DEFAULT_DAYS) y alias separados por `|`
+("b quilla", "santa fe de bogota", "villavo"). Nombres y alias se normalizan
+(minúsculas, sin tildes ni puntuación) y se cargan en un trie por tokens.
+
+`find_place(texto)` recorre el mensaje una sola vez y devuelve el municipio
+con la coincidencia más larga ("santa rosa de cabal" antes que "santa ...").
+El costo por token es un acceso a diccionario, así que no depende del tamaño
+del gazetteer. Para no confundir palabras comunes con municipios ("caldas",
+"florida"), la coincidencia debe ir precedida de una preposición de lugar
+(en, a, para, hasta, hacia, desde) o ser el mensaje completo. Si un nombre
+existe en varios departamentos, gana el que se mencione en el mensaje; si no,
+el primero del archivo.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+
+GAZETTEER_FILE = os.getenv(
+    "GAZETTEER_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "data", "municipalities.csv"),
+)
+GAZETTEER_DEFAULT_DAYS = os.getenv("GAZETTEER_DEFAULT_DAYS", "4–6")
+
+log = logging.getLogger(__name__)
+
+# Palabras que introducen un lugar ("envían a ...", "entrega en ...")
+LOCATION_CUES = {"en", "a", "para", "hasta", "hacia", "desde", "municipio", "ciudad"}
+
+_END = ""  # clave del trie que guarda los municipios que terminan en el nodo
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y sin puntuación ("B/quilla" → "b quilla")."""
+    text = "".join(c for c in unicodedata.normalize("NFD", text.lower()) if unicodedata.category(c) != "Mn")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    department: str
+    region: str
+    delivery_days: str
+    principal: bool  # banda propia en el archivo; las demás son zona regional
+
+
+class Gazetteer:
+    def __init__(self, places: list[tuple[Place, list[str]]]):
+        self.places = [place for place, _ in places]
+        self.trie: dict = {}
+        self.by_name: dict[str, list[Place]] = {}
+        self.departments: dict[str, tuple[str, ...]] = {}
+        for place, aliases in places:
+            for alias in [place.name] + aliases:
+                key = normalize(alias)
+                if not key:
+                    continue
+                node = self.trie
+                for token in key.split():
+                    node = node.setdefault(token, {})
+                bucket = node.setdefault(_END, [])
+                if place not in bucket:
+                    bucket.append(place)
+                names = self.by_name.setdefault(key, [])
+                if place not in names:
+                    names.append(place)
+            self.departments.setdefault(place.department, tuple(normalize(place.department).split()))
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _pick(self, candidates: list[Place], tokens: list[str]) -> Place:
+        if len(candidates) > 1:
+            joined = f" {' '.join(tokens)} "
+            for place in candidates:
+                if f" {' '.join(self.departments[place.department])} " in joined:
+                    return place
+        return candidates[0]
+
+    def find(self, text: str) -> Place | None:
+        """Municipio mencionado en el texto (coincidencia más larga), o None."""
+        tokens = normalize(text).split()
+        i = 0
+        while i < len(tokens):
+            if i > 0 and tokens[i - 1] not in LOCATION_CUES:
+                i += 1
+                continue
+            node, best, end = self.trie, None, i
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if _END in node:
+                    best, end = node[_END], j + 1
+            # Al inicio, sin preposición, solo vale si el mensaje es el lugar ("Medellín?")
+            if best is not None and (i > 0 or end == len(tokens)):
+                return self._pick(best, tokens)
+            i += 1
+        return None
+
+    def lookup(self, name: str, department: str | None = None) -> Place | None:
+        """Municipio por nombre o alias exacto (normalizado); `department` desempata homónimos."""
+        candidates = self.by_name.get(normalize(name or ""))
+        if not candidates:
+            return None
+        for place in candidates:
+            if department and place.department == department:
+                return place
+        return candidates[0]
+
+
+def load_gazetteer(path: str | None = None) -> Gazetteer:
+    path = path or GAZETTEER_FILE
+    places = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            name = (row.get("municipio") or "").strip()
+            if not name:
+                continue
+            days = (row.get("entrega_dias") or "").strip()
+            place = Place(
+                name=name,
+                department=(row.get("departamento") or "").strip(),
+                region=(row.get("region") or "").strip(),
+                delivery_days=days or GAZETTEER_DEFAULT_DAYS,
+                principal=bool(days),
+            )
+            aliases = [a.strip() for a in (row.get("alias") or "").split("|") if a.strip()]
+            places.append((place, aliases))
+    return Gazetteer(places)
+
+
+_gazetteer: Gazetteer | None = None
+_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                try:
+                    _gazetteer = load_gazetteer()
+                except FileNotFoundError:
+                    log.warning(f"No se encontró el gazetteer de municipios ({GAZETTEER_FILE}); sin detección de ciudad.")
+                    _gazetteer = Gazetteer([])
+    return _gazetteer
+
+
+def rebuild_gazetteer() -> Gazetteer:
+    """Recarga GAZETTEER_FILE y publica el trie nuevo (warm-up o cambio del archivo)."""
+    global _gazetteer
+    gazetteer = load_gazetteer()
+    _gazetteer = gazetteer
+    return gazetteer
+
+
+def find_place(text: str) -> Place | None:
+    return get_gazetteer().find(text)
+
+
+def lookup_place(name: str, department: str | None = None) -> Place | None:
+    return get_gazetteer().lookup(name, department)
@@ -3,9 +3,13 @@ from pydoc import text
 import json, os, re
 from difflib import SequenceMatcher
 
+from app.core.gazetteer import find_place
+from app.utils.metrics import chat_stage
+
 DATA_DIR = os.path.join('app', 'data')
-SYNONYMS_FILE = os.path.join(DATA_DIR, 'synonyms.json')
+SYNONYMS_FILE = os.getenv('SYNONYMS_FILE') or os.path.join(DATA_DIR, 'synonyms.json')
 ENRICHED_SYNONYMS: dict[str, list[str]] = {}
+ENRICHED_PATTERNS: dict[str, re.Pattern] = {}  # variante → regex "cantidad + variante"
 
 
 
@@ -56,10 +60,12 @@ def detect_purchase_intent(text: str) -> str:
 # -------------------------------------------------------------
 # INTENCIÓN LOGÍSTICA
 # -------------------------------------------------------------
+@chat_stage("logistics")
 def detect_logistics_intent(text: str) -> tuple[bool, dict]:
     """
     Detecta si el mensaje se refiere a temas logísticos (entrega, cobertura, etc.).
-    Retorna (True/False, {"type": str, "city": Optional[str]}).
+    Retorna (True/False, {"type": str, "city", "department", "region": Optional[str]}).
+    La ciudad sale del gazetteer de municipios (coincidencia más larga).
     """
     if not text:
         return False, {}
@@ -95,15 +101,17 @@ def detect_logistics_intent(text: str) -> tuple[bool, dict]:
     else:
         subtype = "generic"
 
-    city_match = re.search(
-        r"\b(en|a)\s+(bogota|medellin|cali|barranquilla|cartagena|bucaramanga|pereira|manizales|cucuta)\b",
-        text,
-    )
-    city = city_match.group(2).title() if city_match else None
+    place = find_place(text)
+    city = place.name if place else None
     if city and subtype == "generic":
         subtype = "city_delivery"
 
-    return True, {"type": subtype, "city": city}
+    return True, {
+        "type": subtype,
+        "city": city,
+        "department": place.department if place else None,
+        "region": place.region if place else None,
+    }
 
 
 # -------------------------------------------------------------
@@ -222,7 +230,7 @@ def _load_enriched_synonyms() -> dict[str, list[str]]:
     Carga synonyms.json una sola vez y genera variaciones singular/plural y compuestas.
     Esto evita recalcular en cada invocación de extracción.
     """
-    global ENRICHED_SYNONYMS
+    global ENRICHED_SYNONYMS, ENRICHED_PATTERNS
     if ENRICHED_SYNONYMS:
         return ENRICHED_SYNONYMS
 
@@ -260,10 +268,17 @@ def _load_enriched_synonyms() -> dict[str, list[str]]:
                     sset.add(plural_first)
         enriched[canonical] = list(sset)
 
+    # Un regex por variante, compilado una vez (son cientos: no caben en la caché de `re`)
+    ENRICHED_PATTERNS = {
+        variant: re.compile(rf"(?<![a-záéíóúñ])(\d+)\s+(?:de\s+)?{re.escape(variant)}(?:\s*9\s*mm)?(?![\wáéíóúñ])")
+        for variants in enriched.values()
+        for variant in variants
+    }
     ENRICHED_SYNONYMS = enriched
     return ENRICHED_SYNONYMS
 
 
+@chat_stage("product_extraction")
 def extract_products_and_quantities(message: str) -> list[dict]:
     import json, os, re, unicodedata
     try:
@@ -347,8 +362,7 @@ def extract_products_and_quantities(message: str) -> list[dict]:
 
         # --- Coincidencia exacta ---
         for variant in variants:
-            pattern = rf"(?<![a-záéíóúñ])(\d+)\s+(?:de\s+)?{re.escape(variant)}(?:\s*9\s*mm)?(?![\wáéíóúñ])"
-            matches = list(re.finditer(pattern, txt))
+            matches = list(ENRICHED_PATTERNS[variant].finditer(txt))
             if matches:
                 qty_total = int(matches[0].group(1))  # toma solo la primera coincidencia
                 matched = True
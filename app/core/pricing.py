@@ -1,6 +1,9 @@
 import re
 
+from app.utils.metrics import chat_stage
 
+
+@chat_stage("pricing")
 def compute_discount_data(product, cantidad: int) -> dict:
     """
     Retorna datos de precio y descuento por volumen.
@@ -39,6 +42,7 @@ def compute_discount_data(product, cantidad: int) -> dict:
     }
 
 
+@chat_stage("pricing")
 def calculate_total(product, cantidad):
     clean_product = {k.strip().lower(): v for k, v in product.items()}
     nombre  = clean_product.get("nombre", "Producto sin nombre")
@@ -12,6 +12,8 @@ Descripción:
 from unittest import result
 from app.core.summary import build_summary
 from app.core.escalation import should_escalate
+from app.core.gazetteer import find_place, lookup_place
+from app.utils.structured_log import trace
 
 
 # --- BLOQUE NUEVO: Cortesía Contextual ---
@@ -90,36 +92,10 @@ def generate_response(product_data: dict, message: str):
     
     # --- EXCEPCIÓN: tiempos de entrega por ciudad o región ---
     if "entrega" in msg or "llegada" in msg:
-        import re
-
-        # Detecta ciudad tras "en", "a" o "para", incluso con frases intermedias
-        match = re.search(
-            r"(?:en|a|para)\s+(?:la\s+entrega\s+a\s+)?([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
-            message,
-            re.UNICODE | re.IGNORECASE
-        )
-
-        ciudad = ""
-        if match:
-            posible = match.group(1).strip()
-            # Evita falsos positivos como "entrega", "pedido", etc.
-            if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
-                ciudad = " ".join([p.capitalize() for p in posible.split()])
-
-        # Si no detectó ciudad pero la frase tiene 'para' seguido de un nombre, capturarlo igualmente
-        if not ciudad:
-            match_alt = re.search(
-                r"para\s+([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
-                message,
-                re.UNICODE | re.IGNORECASE
-            )
-            if match_alt:
-                posible = match_alt.group(1).strip()
-                if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
-                    ciudad = " ".join([p.capitalize() for p in posible.split()])
-
-        if ciudad:
-            response_text = f"El tiempo estimado de entrega en {ciudad} es de 2 a 5 días hábiles, según disponibilidad logística."
+        # Municipio por el gazetteer (coincidencia más larga, con alias y sin tildes)
+        place = find_place(message)
+        if place:
+            response_text = f"{_place_delivery_text(place)} Tiempo estimado según disponibilidad logística."
         else:
             response_text = "Los tiempos de entrega son de 2 a 5 días hábiles en ciudades principales y de 4 a 6 días en zonas regionales."
 
@@ -162,13 +138,20 @@ def generate_response(product_data: dict, message: str):
         }
 
     if intents["faq"]:
-        response_text = (
-            "Pedidos mínimos: 4 unidades (Congelados), 5 (Lácteos), 12 (Bebidas) o $200.000 COP mixto.\n"
-            "Tiempos de entrega: 2–3 días hábiles principales / 4–6 regionales.\n"
-            "Formas de pago: transferencia, tarjeta o contraentrega (zonas urbanas).\n"
-            "Devoluciones: máximo 24h con evidencia.\n"
-            "¿Quieres que te gestione una cotización o más información?"
-        )
+        # Pasaje de faq.json / Docs que mejor responde; si ninguno es relevante
+        # (o ganó una política interna del agente), el resumen general
+        from app.core.faq_index import answer_faq
+        hit = answer_faq(message)
+        if hit and not hit.passage.internal:
+            response_text = f"{hit.passage.text}\n¿Quieres que te gestione una cotización o más información?"
+        else:
+            response_text = (
+                "Pedidos mínimos: 4 unidades (Congelados), 5 (Lácteos), 12 (Bebidas) o $200.000 COP mixto.\n"
+                "Tiempos de entrega: 2–3 días hábiles principales / 4–6 regionales.\n"
+                "Formas de pago: transferencia, tarjeta o contraentrega (zonas urbanas).\n"
+                "Devoluciones: máximo 24h con evidencia.\n"
+                "¿Quieres que te gestione una cotización o más información?"
+            )
         return {
             "agent_response": response_text,
             "should_escalate": should_escalate_flag,
@@ -181,14 +164,14 @@ def generate_response(product_data: dict, message: str):
     if logistic_detected:
         subtype = logistic_data.get("type")
         city = logistic_data.get("city")
-        response_text = build_logistics_response(subtype, city)
+        response_text = build_logistics_response(subtype, city, logistic_data.get("department"))
         return {
             "agent_response": response_text,
             "should_escalate": should_escalate_flag,
             "summary": build_summary(message, response_text),
         }
     # 📦 6️⃣ Productos (soporte multiproducto con cálculo de precios)
-    print(f"[DEBUG] product_data recibido en responses: {product_data}", flush=True)
+    trace("responses.product_data", product_data=product_data)
 
     # 📦 Productos (soporte multiproducto con cálculo de precios)
     if product_data:
@@ -200,8 +183,7 @@ def generate_response(product_data: dict, message: str):
         if isinstance(product_data, list):
             for p in product_data:
                 cantidad = int(p.get("cantidad", 1))
-                print(f"[RESPONSES] Invocando calculate_total() para {p.get('nombre')}", flush=True)
-                print(f"[TRACE] p keys: {list(p.keys())}", flush=True)
+                trace("responses.calculate_total", producto=p.get("nombre"), cantidad=cantidad)
 
                 # calculate_total retorna string, pero podemos extraer valor numérico
                 line_text = calculate_total(p, cantidad)
@@ -215,7 +197,7 @@ def generate_response(product_data: dict, message: str):
 
         else:
             cantidad = int(product_data.get("cantidad", 1))
-            print(f"[RESPONSES] Invocando calculate_total() para {product_data.get('nombre')}", flush=True)
+            trace("responses.calculate_total", producto=product_data.get("nombre"), cantidad=cantidad)
             line_text = calculate_total(product_data, cantidad)
             response_lines.append(line_text)
             import re
@@ -231,18 +213,18 @@ def generate_response(product_data: dict, message: str):
         response_text = "No pude identificar el producto en tu mensaje. ¿Podrías darme más detalles?"
 
 
-def build_logistics_response(subtype: str, city: str | None = None) -> str:
-    city_delivery_map = {
-        "bogota": "Para Bogotá: entrega en 2–3 días hábiles.",
-        "medellin": "Para Medellín: entrega en 2–3 días hábiles.",
-        "cali": "Para Cali: entrega en 3–4 días hábiles.",
-        "barranquilla": "Para Barranquilla: entrega en 3–5 días hábiles.",
-        "cartagena": "Para Cartagena: entrega en 3–5 días hábiles.",
-        "bucaramanga": "Para Bucaramanga: entrega en 3–5 días hábiles.",
-        "pereira": "Para Pereira: entrega en 3–4 días hábiles.",
-        "manizales": "Para Manizales: entrega en 3–4 días hábiles.",
-        "cucuta": "Para Cúcuta (zona regional): entrega en 4–6 días hábiles.",
-    }
+def _place_delivery_text(place) -> str:
+    """Banda de entrega del municipio: las ciudades principales tienen la suya, el resto es zona regional."""
+    if place.principal:
+        return f"Para {place.name}: entrega en {place.delivery_days} días hábiles."
+    return (
+        f"Para {place.name}, {place.department} (zona regional {place.region}): "
+        f"entrega en {place.delivery_days} días hábiles."
+    )
+
+
+def build_logistics_response(subtype: str, city: str | None = None, department: str | None = None) -> str:
+    place = lookup_place(city, department) if city else None
 
     if subtype == "weekend":
         return (
@@ -257,15 +239,19 @@ def build_logistics_response(subtype: str, city: str | None = None) -> str:
             "¿Deseas que te confirme la franja disponible para tu zona?"
         )
     elif subtype == "coverage":
+        if place:
+            return (
+                f"Sí, realizamos envíos a {place.name}. {_place_delivery_text(place)} "
+                "¿Deseas que te confirme la disponibilidad para tu dirección?"
+            )
         return (
             "Realizamos envíos a nivel nacional. Cobertura directa en ciudades principales "
             "y vía transportadora para zonas regionales. ¿Deseas que valide si llegamos a tu municipio?"
         )
-    elif subtype == "city_delivery":
-        if city:
-            key = city.lower()
-            city_text = city_delivery_map.get(key, "")
-            return (city_text + " ¿Deseas que te confirme el tiempo exacto de entrega en esa zona?").strip()
+    elif subtype in ("city_delivery", "delivery_time") and place:
+        return _place_delivery_text(place) + " ¿Deseas que te confirme el tiempo exacto de entrega en esa zona?"
+    elif subtype == "city_delivery" and city:
+        return "¿Deseas que te confirme el tiempo exacto de entrega en esa zona?"
     return (
         "Los tiempos de entrega son de 2 a 3 días hábiles en ciudades principales "
         "y de 4 a 6 días en regionales. ¿Deseas que te confirme la disponibilidad para tu zona?"
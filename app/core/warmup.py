@@ -0,0 +1,172 @@
+# app/core/warmup.py
+"""
+Warm-up del arranque y reporte de tiempos por componente.
+
+Sin esto, el primer cliente después de cada deploy paga las cachés
+normalizadas del catálogo, los sinónimos enriquecidos y la compilación de
+cientos de regex. El lifespan registra sus propios pasos (esquema,
+migraciones) en `startup` y lanza `run_warmup()` en un hilo:
+
+1. construye las cachés y patrones del catálogo y de `nlp_rules`, el índice
+   de FAQ y el gazetteer de municipios;
+2. pasa mensajes canario por cada detector del pipeline de /chat/.
+
+`GET /health/ready` responde 503 hasta que el warm-up termina (y sigue en 503
+si no se pudieron construir los índices). Un canario que falla queda en el
+reporte y en el log pero no bloquea la readiness: el resto del pipeline sigue
+sirviendo. Con WARMUP_ENABLED=0 las cachés vuelven a
+construirse en el primer request y la app queda lista al terminar el lifespan.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1").lower() in ("1", "true", "yes")
+
+log = logging.getLogger(__name__)
+
+# Mensajes canario: uno por camino del pipeline (cortesía, precio, pedido
+# multiproducto, logística, reclamo con sarcasmo, preguntas frecuentes)
+CANARY_MESSAGES = [
+    "hola, buenas tardes",
+    "cuánto vale el queso mozzarella",
+    "quiero 3 arepas rellenas y dos croquetas de pollo",
+    "hacen envíos a medellín? cuánto se demora",
+    "wow, qué excelente servicio, el pedido llegó incompleto otra vez 🙄",
+    "tienen descuento por volumen? aceptan pago contraentrega?",
+    "cuál es el pedido mínimo? qué formas de pago aceptan?",
+    "cuánto tarda la entrega en San Andrés de Tumaco",
+]
+
+
+class StartupReport:
+    """Tiempos por componente del arranque y estado de la readiness."""
+
+    def __init__(self):
+        self.components: list[dict] = []
+        self.state = "starting"  # starting → warming → ready | failed
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.total_seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def record(self, name: str, seconds: float, detail: str = "", error: str | None = None) -> None:
+        with self._lock:
+            self.components.append({
+                "component": name,
+                "seconds": round(seconds, 4),
+                "detail": detail,
+                "error": error,
+            })
+
+    @contextmanager
+    def step(self, name: str):
+        """Mide un bloque (el bloque puede completar `info["detail"]`). Registra y relanza errores."""
+        info = {"detail": ""}
+        start = time.perf_counter()
+        error = None
+        try:
+            yield info
+        except Exception as err:
+            error = f"{type(err).__name__}: {err}"
+            log.exception("Falló el componente de arranque %s", name)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, info["detail"], error)
+
+    def mark_ready(self) -> None:
+        self.total_seconds = round(time.perf_counter() - self._t0, 4)
+        self.state = "ready"
+
+    def table(self) -> list[str]:
+        """Tabla de texto (una línea por componente) para el log de arranque."""
+        with self._lock:
+            rows = list(self.components)
+        width = max([len(r["component"]) for r in rows] + [10])
+        lines = [f"{'componente':<{width}}  {'ms':>9}  detalle"]
+        for r in rows:
+            detail = f"ERROR {r['error']}" if r["error"] else r["detail"]
+            lines.append(f"{r['component']:<{width}}  {r['seconds'] * 1000:>9.1f}  {detail}")
+        if self.total_seconds is not None:
+            lines.append(f"{'total':<{width}}  {self.total_seconds * 1000:>9.1f}")
+        return lines
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            components = list(self.components)
+        return {
+            "status": self.state,
+            "total_seconds": self.total_seconds,
+            "components": components,
+        }
+
+
+startup = StartupReport()
+
+
+def _canary(report: StartupReport, name: str, fn, messages) -> None:
+    try:
+        with report.step(f"canary:{name}") as info:
+            for message in messages:
+                fn(message)
+            info["detail"] = f"{len(messages)} casos"
+    except Exception:
+        pass  # ya quedó en el reporte y en el log
+
+
+def run_warmup(report: StartupReport = startup) -> StartupReport:
+    """Construye índices y patrones y ejercita cada detector. Bloqueante: correr en un hilo."""
+    report.state = "warming"
+    from app.core import catalog, faq_index, gazetteer, nlp_rules
+    from app.core.escalation import should_escalate
+    from app.core.pricing import calculate_total
+    from app.core.responses import detect_courtesy_intent, generate_response
+
+    try:
+        with report.step("catalog_caches") as info:
+            catalog.rebuild_caches()
+            if catalog.SNAPSHOT is not None:
+                info["detail"] = f"{len(catalog.CATALOG)} productos, snapshot mmap {catalog.CATALOG_SNAPSHOT}"
+            else:
+                info["detail"] = f"{len(catalog.CATALOG)} productos, {len(catalog.SYNONYM_PATTERNS)} patrones"
+        with report.step("enriched_synonyms") as info:
+            nlp_rules._load_enriched_synonyms()
+            info["detail"] = f"{len(nlp_rules.ENRICHED_SYNONYMS)} productos, {len(nlp_rules.ENRICHED_PATTERNS)} patrones"
+        with report.step("faq_index") as info:
+            index = faq_index.rebuild_index()
+            info["detail"] = f"{len(index.passages)} pasajes, {len(index.postings)} términos"
+        with report.step("gazetteer") as info:
+            info["detail"] = f"{len(gazetteer.rebuild_gazetteer())} municipios"
+    except Exception:
+        report.state = "failed"  # sin índices el chat no puede responder: no declarar ready
+        log.error("Warm-up fallido\n%s", "\n".join(report.table()))
+        return report
+
+    _canary(report, "courtesy", detect_courtesy_intent, CANARY_MESSAGES)
+    _canary(report, "purchase_intent", nlp_rules.detect_purchase_intent, CANARY_MESSAGES)
+    _canary(report, "logistics", nlp_rules.detect_logistics_intent, CANARY_MESSAGES)
+    _canary(report, "additional_intents", nlp_rules.detect_additional_intents, CANARY_MESSAGES)
+    _canary(report, "escalation", should_escalate, CANARY_MESSAGES)
+    _canary(report, "catalog_match", catalog.find_product_from_message, CANARY_MESSAGES)
+    _canary(report, "product_extraction", nlp_rules.extract_products_and_quantities, CANARY_MESSAGES)
+    _canary(report, "faq", faq_index.answer_faq, CANARY_MESSAGES)
+    _canary(report, "gazetteer", gazetteer.find_place, CANARY_MESSAGES)
+
+    rows = catalog.CATALOG[:3]
+    _canary(report, "pricing", lambda row: calculate_total(row, 12), rows)
+    _canary(report, "responses", lambda message: generate_response(rows[0] if rows else None, message), CANARY_MESSAGES)
+
+    report.mark_ready()
+    log.info(
+        "Warm-up completo\n%s",
+        "\n".join(report.table()),
+        extra={"startup": {c["component"]: c["seconds"] for c in report.components}, "total_seconds": report.total_seconds},
+    )
+    return report
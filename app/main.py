@@ -1,22 +1,69 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from app.routers import chat, health, orders, reports
+from app.core.warmup import WARMUP_ENABLED, run_warmup, startup
+from app.routers import chat, health, metrics, orders, reports
 from app.storage import models  # noqa: F401  # Mantener import para registrar modelos
-from app.storage.db import Base, engine
+from app.storage.db import Base, async_engine, engine
+from app.storage.migrations import run_migrations
+from app.storage.outbox import OUTBOX_WORKER, run_outbox_worker
+from app.storage.partitioning import ORDERS_PARTITIONING, ensure_partitioned_schema, run_partition_maintainer
+from app.utils.logger import close_interaction_log
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.profiler import PROFILER_ENABLED, PROFILER_TOKEN, ProfilerMiddleware
+from app.utils.structured_log import configure_logging, shutdown_logging
+
+log = logging.getLogger(__name__)
 
 
 # --- Lifespan ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Se ejecuta al iniciar la app
-    Base.metadata.create_all(bind=engine)
-    print("[startup] Base de datos inicializada y tablas creadas (si no existen).")
+    configure_logging()
+    registry.start_flusher()
+    partitioned = ORDERS_PARTITIONING == "monthly" and engine.dialect.name == "postgresql"
+    if ORDERS_PARTITIONING == "monthly":
+        with startup.step("partitions"):
+            created = ensure_partitioned_schema(engine)
+        if created:
+            log.info(f"Particiones creadas: {created}")
+    with startup.step("schema"):
+        Base.metadata.create_all(bind=engine)
+    log.info("Base de datos inicializada y tablas creadas (si no existen).")
+    with startup.step("migrations") as info:
+        applied = run_migrations(engine)
+        info["detail"] = f"{len(applied)} aplicadas" if applied else ""
+    if applied:
+        log.info(f"Migraciones aplicadas: {applied}")
+    stop_outbox = asyncio.Event()
+    outbox_task = None
+    if OUTBOX_WORKER == "inline":
+        outbox_task = asyncio.create_task(run_outbox_worker(stop_outbox))
+        log.info("Worker de outbox relacional iniciado.")
+    partition_task = asyncio.create_task(run_partition_maintainer(stop_outbox)) if partitioned else None
+    # Warm-up en un hilo: el servidor ya acepta conexiones y /health/ready responde 503 mientras tanto
+    warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup, startup)) if WARMUP_ENABLED else None
+    if warmup_task is None:
+        startup.mark_ready()
     yield
     # Al apagar la app
-    print("[shutdown] App finalizada correctamente.")
+    stop_outbox.set()
+    if outbox_task is not None:
+        await outbox_task
+    if partition_task is not None:
+        await partition_task
+    if warmup_task is not None:
+        await warmup_task
+    await async_engine.dispose()
+    await asyncio.to_thread(close_interaction_log)
+    registry.flush()
+    log.info("App finalizada correctamente.")
+    shutdown_logging()
 
 
 # --- Inicializacion de la app ---
@@ -26,14 +73,25 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # --- Routers ---
 app.include_router(chat.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(orders.router)
 app.include_router(reports.router)
 
+# --- Profiler bajo demanda (solo si está habilitado: sin costo en otro caso) ---
+if PROFILER_ENABLED and PROFILER_TOKEN:
+    from app.routers import admin
+
+    app.add_middleware(ProfilerMiddleware)
+    app.include_router(admin.router)
+elif PROFILER_ENABLED:
+    log.warning("PROFILER_ENABLED sin PROFILER_TOKEN: el profiler no se monta.")
+
 
 @app.get("/")
 async def root():
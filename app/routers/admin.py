@@ -0,0 +1,76 @@
+import hmac
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.utils.profiler import PROFILER_TOKEN, profiler
+
+router = APIRouter(prefix="/admin/profile", tags=["Admin"])
+
+
+def _require_admin(x_admin_token: str = Header(default="")):
+    if not PROFILER_TOKEN or not hmac.compare_digest(x_admin_token, PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="No autorizado.")
+
+
+class ProfileRequest(BaseModel):
+    mode: Literal["sample", "cprofile"] = "sample"
+    requests: int | None = Field(default=None, ge=1)
+    seconds: float | None = Field(default=None, gt=0)
+    interval_ms: float = Field(default=5.0, ge=1)
+
+
+@router.post("/start", dependencies=[Depends(_require_admin)])
+async def start_profile(body: ProfileRequest):
+    """Perfila las próximas N llamadas a /chat/ o una ventana de tiempo en este worker."""
+    if body.requests is None and body.seconds is None:
+        raise HTTPException(status_code=400, detail="Indica 'requests' o 'seconds'.")
+    try:
+        session = profiler.start(body.mode, body.requests, body.seconds, body.interval_ms)
+    except RuntimeError as err:
+        raise HTTPException(status_code=409, detail=str(err))
+    return session.status()
+
+
+@router.post("/stop", dependencies=[Depends(_require_admin)])
+async def stop_profile():
+    session = profiler.stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No hay sesión de profiling.")
+    return session.status()
+
+
+@router.get("/status", dependencies=[Depends(_require_admin)])
+async def profile_status():
+    session = profiler.session
+    if session is None:
+        return {"active": False}
+    if session.active and session.expired():
+        session.stop()
+    return session.status()
+
+
+@router.get("/result", dependencies=[Depends(_require_admin)])
+async def profile_result(format: Literal["summary", "collapsed", "pstats"] = Query("summary")):
+    """
+    summary: tiempo por etapa; collapsed: stacks para flamegraph (modo sample);
+    pstats: tabla de cProfile (modo cprofile). El dump completo queda en el archivo de `file`.
+    """
+    session = profiler.session
+    if session is None:
+        raise HTTPException(status_code=404, detail="No hay sesión de profiling.")
+    if session.active:
+        if not session.expired():
+            raise HTTPException(status_code=409, detail="La sesión sigue activa.")
+        session.stop()
+    if format == "summary":
+        return {**session.status(), "stages": session.stage_summary()}
+    if format == "collapsed":
+        if session.mode != "sample":
+            raise HTTPException(status_code=400, detail="collapsed solo está disponible en modo sample.")
+        return PlainTextResponse(session.collapsed())
+    if session.mode != "cprofile":
+        raise HTTPException(status_code=400, detail="pstats solo está disponible en modo cprofile.")
+    return PlainTextResponse(session.pstats_text())
@@ -1,3 +1,4 @@
+import logging
 import os
 from fastapi import APIRouter
 from pydantic import BaseModel
@@ -9,10 +10,39 @@ from app.core.nlp_rules import detect_purchase_intent, detect_logistics_intent
 
 from app.core.carts.service import CartService
 from app.core.carts.models import CartItem
+from app.utils.logger import log_interaction
+from app.utils.metrics import chat_stage, registry
+from app.utils.structured_log import finish_trace, start_trace
+
+log = logging.getLogger(__name__)
+
 cart_service = CartService(redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+
+@registry.collector
+def _cart_metrics():
+    """Backend del carrito y estado del breaker para /metrics."""
+    m = cart_service.metrics()
+    state = m.get("breaker_state")
+    collected = [
+        ("cart_store_backend_info", "Backend activo del carrito", ("backend",), [((m["backend"],), 1)]),
+    ]
+    if state is not None:
+        collected += [
+            (
+                "cart_breaker_state",
+                "Estado del circuit breaker de Redis (1 = estado actual)",
+                ("state",),
+                [((s,), int(s == state)) for s in ("closed", "open", "half_open")],
+            ),
+            ("cart_breaker_open_count", "Veces que se abrió el breaker", (), [((), m["breaker_open_count"])]),
+            ("cart_fallback_calls", "Operaciones atendidas por el store local", (), [((), m["fallback_calls"])]),
+            ("cart_pending_replay", "Carritos pendientes de reescribir en Redis", (), [((), m["pending_replay"])]),
+        ]
+    return collected
+
 class ChatMessage(BaseModel):
     message: str
     session_id: str | None = None
@@ -60,6 +90,7 @@ ack_terms = [
     "quedo atento",
 ]
 
+@chat_stage("courtesy")
 def detect_courtesy_intent(message: str) -> bool:
     msg = _norm_txt(message)
     return any(term in msg for term in greet_terms + thanks_terms + ack_terms)
@@ -96,6 +127,16 @@ def _format_last_action(cart_summary: dict | None) -> str | None:
 
 @router.post("/")
 async def chat_endpoint(data: ChatMessage):
+    token = start_trace(data.session_id)
+    try:
+        result = await _chat_reply(data)
+    finally:
+        finish_trace(token, session_id=data.session_id, channel=data.channel)
+    # Solo encola: la escritura a disco la hace el hilo del logger
+    log_interaction(data.session_id, data.message, result.get("agent_response"), data.channel or "unknown")
+    return result
+
+async def _chat_reply(data: ChatMessage) -> dict:
     try:
         user_input = data.message.lower().strip()
 
@@ -401,7 +442,7 @@ async def chat_endpoint(data: ChatMessage):
         if logistic_detected and "entrega" not in response["agent_response"]:
             subtype = logistic_info.get("type")
             city = logistic_info.get("city")
-            logistics_text = build_logistics_response(subtype, city)
+            logistics_text = build_logistics_response(subtype, city, logistic_info.get("department"))
             if product_row:
                 response["agent_response"] += f"\n\n{logistics_text}"
             else:
@@ -416,6 +457,7 @@ async def chat_endpoint(data: ChatMessage):
                             "detected": True,
                             "type": subtype,
                             "city": city,
+                            "region": logistic_info.get("region"),
                         },
                     },
                 }
@@ -450,9 +492,7 @@ async def chat_endpoint(data: ChatMessage):
         }
 
     except Exception as e:
-        import traceback
-        print("[ERROR] chat_endpoint:", e)
-        traceback.print_exc()
+        log.exception("chat_endpoint falló", extra={"session_id": data.session_id})
         return {
             "agent_response": "Ocurrio un error interno en el servidor.",
             "should_escalate": True,
@@ -1,6 +1,23 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.warmup import startup
+
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("/")
 async def health_check():
     return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """Readiness: 503 hasta que termina el warm-up; incluye los tiempos de arranque por componente."""
+    return JSONResponse(startup.as_dict(), status_code=200 if startup.ready else 503)
+
+
+@router.get("/cart")
+async def cart_health():
+    """Backend activo del carrito, estado del circuit breaker y espera acumulada en Redis."""
+    from app.routers.chat import cart_service
+    return cart_service.metrics()
@@ -1,10 +1,21 @@
 # app/routers/orders.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.storage.db import get_db
+import asyncio
+import base64
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.storage.bulk_orders import bulk_insert_orders
+from app.storage.db import AsyncSessionLocal, get_async_db
 from app.storage.models import Order
-from app.storage.sync_relational import sync_order_to_relational  # <-- Nuevo import
+from app.storage.outbox import enqueue_order_sync
+from app.storage.rollups import move_orders_status
+from app.storage.report_cache import bump_orders_version
 from datetime import datetime
+from types import SimpleNamespace
 from app.storage.order_serial import next_order_serial
 from typing import Optional
 
@@ -49,38 +60,61 @@ def _can_transition(current: str, target: str) -> bool:
     return target_n in ALLOWED_TRANSITIONS[current_n]
 
 
+def _normalize_item(item: dict) -> dict:
+    """`cantidad` se guarda como entero (order_items.quantity): se valida por orden y no en el lote."""
+    if "cantidad" not in item:
+        return item
+    cantidad = float(item["cantidad"])
+    if not cantidad.is_integer():
+        raise HTTPException(
+            status_code=400,
+            detail=f"La cantidad debe ser un número entero (item {item.get('nombre')!r}: {item['cantidad']}).",
+        )
+    return {**item, "cantidad": int(cantidad)}
+
+
+def _validate_new_order(order_data: dict) -> tuple[str, list, str, float]:
+    """Valida los campos de una orden nueva y calcula el total a partir de los items."""
+    user_id = order_data.get("user_id")
+    items = order_data.get("items", [])
+    status = _normalize_status(order_data.get("status", "pending"))
+
+    if not user_id or not items:
+        raise HTTPException(
+            status_code=400,
+            detail="Faltan campos obligatorios: user_id o items."
+        )
+
+    if status not in ALLOWED_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estado no permitido. Usa uno de: {', '.join(sorted(ALLOWED_STATUSES))}"
+        )
+
+    items = [_normalize_item(item) for item in items]
+
+    # Calcular total automáticamente
+    total = sum(
+        float(item.get("cantidad", 0)) * float(item.get("precio_unitario", 0))
+        for item in items
+    )
+    return user_id, items, status, total
+
+
 @router.post("/")
-def create_order(order_data: dict, db: Session = Depends(get_db)):
+async def create_order(order_data: dict, db: AsyncSession = Depends(get_async_db)):
     """
     Inserta una nueva orden en la base de datos.
     Calcula el total automáticamente a partir de los items.
-    Además, sincroniza las tablas relacionales (customers, products, order_items).
+    Las tablas relacionales (customers, products, order_items) se sincronizan
+    de forma asíncrona a través del outbox.
     """
     try:
-        user_id = order_data.get("user_id")
-        items = order_data.get("items", [])
-        status = _normalize_status(order_data.get("status", "pending"))
-
-        if not user_id or not items:
-            raise HTTPException(
-                status_code=400,
-                detail="Faltan campos obligatorios: user_id o items."
-            )
-
-        if status not in ALLOWED_STATUSES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Estado no permitido. Usa uno de: {', '.join(sorted(ALLOWED_STATUSES))}"
-            )
-
-        # Calcular total automáticamente
-        total = sum(
-            float(item.get("cantidad", 0)) * float(item.get("precio_unitario", 0))
-            for item in items
-        )
-
-        from app.storage.order_serial import next_order_serial
-        serial = next_order_serial()
+        user_id, items, status, total = _validate_new_order(order_data)
+
+        # Serial reservado en la misma transacción que la orden
+        created_at = datetime.utcnow()
+        serial = await db.run_sync(next_order_serial, created_at)
 
         # Crear la orden principal
         new_order = Order(
@@ -89,71 +123,237 @@ def create_order(order_data: dict, db: Session = Depends(get_db)):
             total=total,
             status=status,
             order_serial=serial,
-            created_at=datetime.utcnow()
+            created_at=created_at
         )
 
         db.add(new_order)
-        db.commit()
-        db.refresh(new_order)
+        await db.flush()
+        order_id = new_order.id
 
-        # === NUEVO: sincronización relacional ===
-        try:
-            sync_order_to_relational(db, new_order)
-        except Exception as sync_err:
-            # No rompemos la creación de la orden si falla la sincronización
-            print(f"⚠️ Error sincronizando la orden {new_order.id}: {sync_err}")
+        # === Sincronización relacional vía outbox (misma transacción, fuera del request) ===
+        enqueue_order_sync(db, order_id)
+        await db.commit()
+        await asyncio.to_thread(bump_orders_version)
 
         return {
             "message": "Orden creada correctamente",
-            "order_id": new_order.id,
-            "order_serial": new_order.order_serial, 
+            "order_id": order_id,
+            "order_serial": serial,
             "total": total,
             "items": items
         }
 
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/")
-def list_orders(db: Session = Depends(get_db)):
+# === Carga masiva ===
+BULK_BATCH_SIZE = int(os.getenv("ORDERS_BULK_BATCH_SIZE", "1000"))
+BULK_MAX_ORDERS = int(os.getenv("ORDERS_BULK_MAX_ORDERS", "50000"))
+
+
+async def _read_bulk_payload(request: Request) -> list:
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            return [json.loads(line) for line in body.decode().splitlines() if line.strip()]
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as err:
+        raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {err}")
+    if isinstance(payload, dict):
+        payload = payload.get("orders")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Envía un arreglo JSON de órdenes (o NDJSON).")
+    return payload
+
+
+@router.post("/bulk")
+async def create_orders_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
-    Lista todas las órdenes almacenadas en la base de datos.
+    Crea órdenes en bloque (integraciones ERP / back-office).
+    Acepta un arreglo JSON (o {"orders": [...]}) o NDJSON (Content-Type: application/x-ndjson).
+    Se procesa en lotes de ORDERS_BULK_BATCH_SIZE, cada uno en su propia transacción;
+    la respuesta trae el resultado de cada orden en el orden de entrada.
     """
-    orders = db.query(Order).all()
-    return {"total_orders": len(orders), "orders": orders}
+    payload = await _read_bulk_payload(request)
+    if len(payload) > BULK_MAX_ORDERS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ORDERS} órdenes por solicitud.")
+
+    results: list[dict | None] = [None] * len(payload)
+    valid: list[tuple[int, dict]] = []
+    for index, order_data in enumerate(payload):
+        try:
+            if not isinstance(order_data, dict):
+                raise HTTPException(status_code=400, detail="Cada orden debe ser un objeto JSON.")
+            user_id, items, status, total = _validate_new_order(order_data)
+            valid.append((index, {"user_id": user_id, "items": items, "status": status, "total": total}))
+        except HTTPException as err:
+            results[index] = {"index": index, "ok": False, "error": err.detail}
+        except (AttributeError, TypeError, ValueError) as err:
+            results[index] = {"index": index, "ok": False, "error": f"Orden inválida: {err}"}
+
+    for start in range(0, len(valid), BULK_BATCH_SIZE):
+        batch = valid[start:start + BULK_BATCH_SIZE]
+        try:
+            created = await bulk_insert_orders(db, [order for _, order in batch])
+            await db.commit()
+        except Exception as err:
+            await db.rollback()
+            for index, _ in batch:
+                results[index] = {"index": index, "ok": False, "error": f"Lote rechazado: {err}"}
+            continue
+        for (index, _), row in zip(batch, created):
+            results[index] = {"index": index, "ok": True, **row}
+
+    accepted = sum(1 for r in results if r["ok"])
+    if accepted:
+        await asyncio.to_thread(bump_orders_version)
+    return {"accepted": accepted, "rejected": len(results) - accepted, "results": results}
+
+
+# === Paginación keyset sobre (created_at, id) ===
+def _order_to_dict(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "items": order.items,
+        "total": order.total,
+        "status": order.status,
+        "order_serial": order.order_serial,
+        "created_at": order.created_at,
+        "customer_id": order.customer_id,
+    }
+
+
+def _encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def _orders_page_query(user_id=None, status=None, order_serial=None, cursor=None):
+    """SELECT de órdenes (más recientes primero) con filtros y posición keyset."""
+    stmt = select(Order)
+    if user_id:
+        stmt = stmt.where(Order.user_id == user_id)
+    if status:
+        stmt = stmt.where(Order.status == _normalize_status(status))
+    if order_serial:
+        stmt = stmt.where(Order.order_serial == order_serial)
+    if cursor:
+        created_at, order_id = _decode_cursor(cursor)
+        # El límite explícito sobre created_at permite descartar particiones (el de tupla no)
+        stmt = stmt.where(
+            Order.created_at <= created_at,
+            tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id),
+        )
+    return stmt.order_by(Order.created_at.desc(), Order.id.desc())
+
+
+def _orders_count_query(user_id=None, status=None, order_serial=None):
+    """Total de órdenes con los mismos filtros de la página, sin cursor."""
+    stmt = select(func.count(Order.id))
+    if user_id:
+        stmt = stmt.where(Order.user_id == user_id)
+    if status:
+        stmt = stmt.where(Order.status == _normalize_status(status))
+    if order_serial:
+        stmt = stmt.where(Order.order_serial == order_serial)
+    return stmt
+
 
+async def _fetch_page(db: AsyncSession, stmt, limit: int) -> dict:
+    """Una página: `count` es la cantidad de órdenes en ella, no el total."""
+    rows = (await db.execute(stmt.limit(limit + 1))).scalars().all()
+    page = rows[:limit]
+    return {
+        "count": len(page),
+        "orders": [_order_to_dict(o) for o in page],
+        "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None,
+    }
+
+
+def _stream_ndjson(stmt):
+    """Exporta en NDJSON con cursor del servidor; nunca carga toda la tabla."""
+    async def rows():
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=500))
+            async for order in result.scalars():
+                yield json.dumps(jsonable_encoder(_order_to_dict(order)), ensure_ascii=False) + "\n"
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+def _latest_user_order_query(user_id: str, order_serial: str | None = None):
+    """Última orden del usuario (o la del serial indicado)."""
+    stmt = select(Order).where(Order.user_id == user_id)
+    if order_serial:
+        stmt = stmt.where(Order.order_serial == order_serial)
+    return stmt.order_by(Order.id.desc()).limit(1)
 
 
+@router.get("/")
+async def list_orders(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None),
+    status: str | None = Query(None),
+    user_id: str | None = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Lista órdenes paginadas (más recientes primero).
+    - limit/cursor: paginación keyset; usa `next_cursor` de la respuesta para la siguiente página.
+    - status/user_id: filtros opcionales.
+    - format=ndjson: exporta todas las órdenes que cumplan los filtros en streaming (ignora limit).
+    - total_orders es el total con los filtros; count, las órdenes de esta página.
+    """
+    stmt = _orders_page_query(user_id=user_id, status=status, cursor=cursor)
+    if format == "ndjson":
+        return _stream_ndjson(stmt)
+    page = await _fetch_page(db, stmt, limit)
+    total = (await db.execute(_orders_count_query(user_id=user_id, status=status))).scalar_one()
+    return {"total_orders": total, **page}
+
 
 @router.get("/status")
-def get_order_status(
+async def get_order_status(
     user_id: str | None = None,
     order_serial: str | None = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Consulta el estado de las ordenes de un usuario (para sesiones posteriores).
     - Si envias order_serial, devuelve solo esa orden.
-    - Si no, devuelve todas las ordenes del usuario.
+    - Si no, devuelve las ordenes del usuario paginadas (limit/cursor, más recientes primero).
+    - total_orders es el total del usuario; count, las órdenes de esta página.
     """
     if not user_id:
         raise HTTPException(status_code=400, detail="Debes enviar user_id.")
 
-    q = db.query(Order).filter(Order.user_id == user_id)
-    if order_serial:
-        q = q.filter(Order.order_serial == order_serial)
-    orders = q.order_by(Order.id.desc()).all()
-
-    return {
-        "total_orders": len(orders),
-        "orders": orders,
-    }
+    stmt = _orders_page_query(user_id=user_id, order_serial=order_serial, cursor=cursor)
+    if format == "ndjson":
+        return _stream_ndjson(stmt)
+    page = await _fetch_page(db, stmt, limit)
+    total = (await db.execute(_orders_count_query(user_id=user_id, order_serial=order_serial))).scalar_one()
+    return {"total_orders": total, **page}
 
 
 @router.put("/{order_id}/status")
-def update_order_status(order_id: int, payload: dict, db: Session = Depends(get_db)):
+async def update_order_status(order_id: int, payload: dict, db: AsyncSession = Depends(get_async_db)):
     """
     Actualiza el estado de una orden validando una m·lima m quina de estados.
     Estados permitidos: pending, confirmed, preparing, ready, shipped, delivered, cancelled, escalated.
@@ -167,7 +367,10 @@ def update_order_status(order_id: int, payload: dict, db: Session = Depends(get_
             detail=f"Estado no permitido. Usa uno de: {', '.join(sorted(ALLOWED_STATUSES))}",
         )
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # FOR UPDATE: serializa con otras transiciones y con la sync del outbox (rollups)
+    order = (
+        await db.execute(select(Order).where(Order.id == order_id).with_for_update())
+    ).scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada.")
 
@@ -179,9 +382,9 @@ def update_order_status(order_id: int, payload: dict, db: Session = Depends(get_
         )
 
     order.status = new_status
-    db.add(order)
-    db.commit()
-    db.refresh(order)
+    await db.run_sync(move_orders_status, [(order, current_status)], new_status)
+    await db.commit()
+    await asyncio.to_thread(bump_orders_version)
 
     return {
         "message": "Estado actualizado",
@@ -194,8 +397,133 @@ def update_order_status(order_id: int, payload: dict, db: Session = Depends(get_
 
 
 
+# === Cambio de estado en lote ===
+STATUS_BATCH_MAX = int(os.getenv("ORDERS_STATUS_BATCH_MAX", "1000"))
+
+
+def _allowed_sources(target: str) -> tuple[list[str], list[str]]:
+    """Estados desde los que se puede pasar a `target` y estados con regla explícita (ver _can_transition)."""
+    sources = [s for s, nexts in ALLOWED_TRANSITIONS.items() if target in nexts]
+    return sources, list(ALLOWED_TRANSITIONS)
+
+
+def _batch_transition_candidates(ids: list[int], serials: list[str], target: str):
+    """Órdenes pedidas que admiten la transición (ALLOWED_TRANSITIONS en SQL), bloqueadas, con su estado actual."""
+    sources, known = _allowed_sources(target)
+    current = func.lower(func.trim(func.coalesce(Order.status, "pending")))
+    return (
+        select(Order.id.label("id"), current.label("old_status"))
+        .where(or_(Order.id.in_(ids), Order.order_serial.in_(serials)))
+        .where(or_(current.in_(sources), current.not_in(known)))
+        .order_by(Order.id)
+        .with_for_update()
+    )
+
+
+_BATCH_RETURNING = (Order.id, Order.order_serial, Order.customer_id, Order.created_at, Order.total)
+
+
+async def _apply_batch_transition(db: AsyncSession, ids: list[int], serials: list[str], target: str) -> list:
+    """
+    Aplica la transición y retorna (id, order_serial, customer_id, created_at, total, old_status).
+    PostgreSQL: un solo UPDATE ... FROM (subconsulta FOR UPDATE) ... RETURNING con el
+    estado anterior. SQLite no permite RETURNING de la tabla del FROM: SELECT + UPDATE.
+    """
+    prev = _batch_transition_candidates(ids, serials, target)
+    if db.bind.dialect.name == "postgresql":
+        prev = prev.subquery("prev")
+        stmt = (
+            update(Order)
+            .where(Order.id == prev.c.id)
+            .values(status=target)
+            .returning(*_BATCH_RETURNING, prev.c.old_status)
+            .execution_options(synchronize_session=False)
+        )
+        return (await db.execute(stmt)).all()
+
+    old = dict((await db.execute(prev)).all())
+    if not old:
+        return []
+    stmt = (
+        update(Order)
+        .where(Order.id.in_(list(old)))
+        .values(status=target)
+        .returning(*_BATCH_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    return [SimpleNamespace(**r._mapping, old_status=old[r.id]) for r in await db.execute(stmt)]
+
+
+@router.put("/status:batch")
+async def update_orders_status_batch(payload: dict, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cambia el estado de muchas órdenes en una sola sentencia.
+    Body: {"status": "shipped", "ids": [1, 2], "order_serials": ["AIFS-..."]}.
+    Responde, en el orden pedido, qué órdenes cambiaron y cuáles se rechazaron.
+    """
+    new_status = _normalize_status(payload.get("status"))
+    if new_status not in ALLOWED_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estado no permitido. Usa uno de: {', '.join(sorted(ALLOWED_STATUSES))}",
+        )
+    try:
+        ids = [int(i) for i in payload.get("ids") or []]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="'ids' debe ser una lista de enteros.")
+    serials = [str(s) for s in payload.get("order_serials") or []]
+    if not ids and not serials:
+        raise HTTPException(status_code=400, detail="Debes enviar 'ids' u 'order_serials'.")
+    if len(ids) + len(serials) > STATUS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Máximo {STATUS_BATCH_MAX} órdenes por lote.")
+
+    updated = await _apply_batch_transition(db, ids, serials, new_status)
+    changes = [
+        (SimpleNamespace(id=r.id, customer_id=r.customer_id, created_at=r.created_at, total=r.total), r.old_status)
+        for r in updated
+    ]
+    await db.run_sync(move_orders_status, changes, new_status)
+    await db.commit()
+    if updated:
+        await asyncio.to_thread(bump_orders_version)
+
+    # Diagnóstico solo de las rechazadas: no existen o su estado no admite la transición
+    by_id = {r.id: r for r in updated}
+    by_serial = {r.order_serial: r for r in updated}
+    missing_ids = [i for i in ids if i not in by_id]
+    missing_serials = [s for s in serials if s not in by_serial]
+    current: dict = {}
+    if missing_ids or missing_serials:
+        rows = await db.execute(
+            select(Order.id, Order.order_serial, Order.status)
+            .where(or_(Order.id.in_(missing_ids), Order.order_serial.in_(missing_serials)))
+        )
+        for r in rows:
+            current[r.id] = current[r.order_serial] = r
+
+    results = []
+    for ref in [*ids, *serials]:
+        row = by_id.get(ref) if isinstance(ref, int) else by_serial.get(ref)
+        if row is not None:
+            results.append({
+                "ref": ref, "ok": True, "order_id": row.id, "order_serial": row.order_serial,
+                "previous_status": row.old_status, "status": new_status,
+            })
+        elif ref in current:
+            found = current[ref]
+            results.append({
+                "ref": ref, "ok": False, "order_id": found.id, "order_serial": found.order_serial,
+                "error": f"Transición inválida: {_normalize_status(found.status)} -> {new_status}",
+            })
+        else:
+            results.append({"ref": ref, "ok": False, "error": "Orden no encontrada."})
+
+    accepted = sum(1 for r in results if r["ok"])
+    return {"status": new_status, "updated": accepted, "rejected": len(results) - accepted, "results": results}
+
+
 @router.post("/escalate")
-def escalate_order(payload: dict, db: Session = Depends(get_db)):
+async def escalate_order(payload: dict, db: AsyncSession = Depends(get_async_db)):
     """
     Marca una orden para escalamiento humano (detalle o reclamo).
     Requiere user_id; opcional order_serial para elegir una orden especifica.
@@ -207,13 +535,12 @@ def escalate_order(payload: dict, db: Session = Depends(get_db)):
     if not user_id:
         raise HTTPException(status_code=400, detail="Debes enviar user_id.")
 
-    q = db.query(Order).filter(Order.user_id == user_id)
-    if order_serial:
-        q = q.filter(Order.order_serial == order_serial)
-    order = q.order_by(Order.id.desc()).first()
-
-    if not order:
-        raise HTTPException(status_code=404, detail="No se encontro una orden para este usuario.")
+    order = (
+        await db.execute(_latest_user_order_query(user_id, order_serial).with_for_update())
+    ).scalars().first()
+
+    if not order:
+        raise HTTPException(status_code=404, detail="No se encontro una orden para este usuario.")
 
     # Evitar re-escalar la misma orden
     if (order.status or "").lower() == "escalated":
@@ -228,10 +555,11 @@ def escalate_order(payload: dict, db: Session = Depends(get_db)):
         }
 
     # Marcar como escalada
+    previous_status = order.status
     order.status = "escalated"
-    db.add(order)
-    db.commit()
-    db.refresh(order)
+    await db.run_sync(move_orders_status, [(order, previous_status)], "escalated")
+    await db.commit()
+    await asyncio.to_thread(bump_orders_version)
 
     summary = {
         "order_id": order.id,
@@ -1,8 +1,21 @@
 # app/routers/reports.py
+import asyncio
+import csv
+import io
+import json
 from fastapi import APIRouter, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.storage import models, db
+from app.storage.report_cache import report_cache
+from app.storage.rollups import (
+    order_summary_rollup_query,
+    rollup_day_range,
+    sales_by_product_rollup_query,
+)
 from datetime import datetime
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
@@ -23,16 +36,20 @@ def _filter_dates(query, model, desde, hasta):
     return query
 
 
-# === 1. Resumen por cliente ===
-@router.get("/order_summary")
-def order_summary(
-    cliente: str | None = Query(None),
-    producto: str | None = Query(None),
-    orden_id: int | None = Query(None),
-    desde: str | None = Query(None),
-    hasta: str | None = Query(None),
-    db: Session = Depends(db.get_db),
-):
+def _filter_order_and_item_dates(query, desde, hasta):
+    # El mismo rango sobre order_items.created_at (copia de la fecha de la orden)
+    # permite descartar particiones de ambas tablas con ORDERS_PARTITIONING=monthly
+    query = _filter_dates(query, models.Order, desde, hasta)
+    return _filter_dates(query, models.OrderItem, desde, hasta)
+
+
+# === Constructores de consultas (compartidos por los endpoints y la auditoría de planes) ===
+def order_summary_query(db: Session, cliente=None, producto=None, orden_id=None, desde=None, hasta=None):
+    # Rollup diario si los filtros lo permiten (sin orden puntual, fechas de día completo)
+    day_range = rollup_day_range(desde, hasta)
+    if orden_id is None and day_range is not None:
+        return order_summary_rollup_query(db, cliente, day_range)
+
     q = (
         db.query(
             models.Customer.user_id.label("cliente"),
@@ -49,21 +66,10 @@ def order_summary(
     if orden_id:
         q = q.filter(models.Order.id == orden_id)
 
-    q = _filter_dates(q, models.Order, desde, hasta)
-    results = q.all()
-    return [dict(r._mapping) for r in results]
+    return _filter_dates(q, models.Order, desde, hasta)
 
 
-# === 2. Detalle completo de órdenes ===
-@router.get("/order_full_detail")
-def order_full_detail(
-    cliente: str | None = Query(None),
-    producto: str | None = Query(None),
-    orden_id: int | None = Query(None),
-    desde: str | None = Query(None),
-    hasta: str | None = Query(None),
-    db: Session = Depends(db.get_db),
-):
+def order_full_detail_query(db: Session, cliente=None, producto=None, orden_id=None, desde=None, hasta=None):
     q = (
         db.query(
             models.Order.id.label("orden_id"),
@@ -88,21 +94,15 @@ def order_full_detail(
     if orden_id:
         q = q.filter(models.Order.id == orden_id)
 
-    q = _filter_dates(q, models.Order, desde, hasta)
-    results = q.all()
-    return [dict(r._mapping) for r in results]
+    return _filter_order_and_item_dates(q, desde, hasta)
 
 
-# === 3. Ventas por producto ===
-@router.get("/sales_by_product")
-def sales_by_product(
-    cliente: str | None = Query(None),
-    producto: str | None = Query(None),
-    orden_id: int | None = Query(None),
-    desde: str | None = Query(None),
-    hasta: str | None = Query(None),
-    db: Session = Depends(db.get_db),
-):
+def sales_by_product_query(db: Session, cliente=None, producto=None, orden_id=None, desde=None, hasta=None):
+    # Rollup diario si los filtros lo permiten (sin cliente ni orden puntual)
+    day_range = rollup_day_range(desde, hasta)
+    if cliente is None and orden_id is None and day_range is not None:
+        return sales_by_product_rollup_query(db, producto, day_range)
+
     q = (
         db.query(
             models.Product.name.label("producto"),
@@ -123,88 +123,153 @@ def sales_by_product(
     if orden_id:
         q = q.filter(models.Order.id == orden_id)
 
-    q = _filter_dates(q, models.Order, desde, hasta)
-    results = q.all()
-    return [dict(r._mapping) for r in results]
+    return _filter_order_and_item_dates(q, desde, hasta)
 
 
-# === 4. Consolidado de todos los reportes ===
-@router.get("/summary_all")
-def summary_all(
+async def _rows(session: AsyncSession, builder, filtros: dict) -> list[dict]:
+    # Los constructores usan la API Query (sync); solo se arma el SELECT y se ejecuta en async
+    stmt = builder(session.sync_session, **filtros).statement
+    result = await session.execute(stmt)
+    return [dict(r._mapping) for r in result]
+
+
+def _filters(cliente, producto, orden_id, desde, hasta) -> dict:
+    return {"cliente": cliente, "producto": producto, "orden_id": orden_id, "desde": desde, "hasta": hasta}
+
+
+async def _rows_isolated(builder, filtros: dict) -> list[dict]:
+    async with db.AsyncSessionLocal() as session:
+        return await _rows(session, builder, filtros)
+
+
+# === 1. Resumen por cliente ===
+@router.get("/order_summary")
+async def order_summary(
     cliente: str | None = Query(None),
     producto: str | None = Query(None),
     orden_id: int | None = Query(None),
     desde: str | None = Query(None),
     hasta: str | None = Query(None),
-    db: Session = Depends(db.get_db),
+    session: AsyncSession = Depends(db.get_async_db),
 ):
-    # --- Reutilizar las consultas existentes ---
+    filtros = _filters(cliente, producto, orden_id, desde, hasta)
+    return await report_cache.get_or_compute(
+        "order_summary", filtros, lambda: _rows(session, order_summary_query, filtros)
+    )
 
-    # 1️⃣ Resumen por cliente
-    q1 = (
-        db.query(
-            models.Customer.user_id.label("cliente"),
-            func.count(models.Order.id).label("num_ordenes"),
-            func.sum(models.Order.total).label("total_comprado"),
-        )
-        .join(models.Order, models.Customer.id == models.Order.customer_id)
-        .group_by(models.Customer.user_id)
+
+# === 2. Detalle completo de órdenes ===
+@router.get("/order_full_detail")
+async def order_full_detail(
+    cliente: str | None = Query(None),
+    producto: str | None = Query(None),
+    orden_id: int | None = Query(None),
+    desde: str | None = Query(None),
+    hasta: str | None = Query(None),
+    session: AsyncSession = Depends(db.get_async_db),
+):
+    filtros = _filters(cliente, producto, orden_id, desde, hasta)
+    return await report_cache.get_or_compute(
+        "order_full_detail", filtros, lambda: _rows(session, order_full_detail_query, filtros)
     )
-    if cliente:
-        q1 = q1.filter(models.Customer.user_id == cliente)
-    if orden_id:
-        q1 = q1.filter(models.Order.id == orden_id)
-    q1 = _filter_dates(q1, models.Order, desde, hasta)
-    resumen_clientes = [dict(r._mapping) for r in q1.all()]
 
-    # 2️⃣ Ventas por producto
-    q2 = (
-        db.query(
-            models.Product.name.label("producto"),
-            func.sum(models.OrderItem.quantity).label("total_unidades"),
-            func.sum(models.OrderItem.quantity * models.OrderItem.price).label("total_ventas"),
-        )
-        .join(models.OrderItem, models.Product.id == models.OrderItem.product_id)
-        .join(models.Order, models.Order.id == models.OrderItem.order_id)
-        .group_by(models.Product.name)
+
+# === 2b. Exportación del detalle en streaming ===
+_EXPORT_CHUNK_ROWS = 1000
+
+
+async def _export_rows(filtros: dict):
+    """Recorre el detalle con cursor del servidor; la memoria no crece con el número de filas."""
+    async with db.AsyncSessionLocal() as session:
+        q = order_full_detail_query(session.sync_session, **filtros)
+        yield [c["name"] for c in q.column_descriptions]
+        result = await session.stream(q.statement.execution_options(yield_per=_EXPORT_CHUNK_ROWS))
+        async for row in result:
+            yield row
+
+
+async def _stream_csv(filtros: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = _export_rows(filtros)
+    writer.writerow(await anext(rows))
+    i = 0
+    async for row in rows:
+        writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+        i += 1
+        if i % _EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def _stream_ndjson(filtros: dict):
+    rows = _export_rows(filtros)
+    keys = await anext(rows)
+    async for row in rows:
+        yield json.dumps(jsonable_encoder(dict(zip(keys, row))), ensure_ascii=False) + "\n"
+
+
+@router.get("/order_full_detail/export")
+async def order_full_detail_export(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    cliente: str | None = Query(None),
+    producto: str | None = Query(None),
+    orden_id: int | None = Query(None),
+    desde: str | None = Query(None),
+    hasta: str | None = Query(None),
+):
+    filtros = _filters(cliente, producto, orden_id, desde, hasta)
+    if format == "ndjson":
+        return StreamingResponse(_stream_ndjson(filtros), media_type="application/x-ndjson")
+    filename = f"order_full_detail_{datetime.now():%Y-%m-%d}.csv"
+    return StreamingResponse(
+        _stream_csv(filtros),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    if producto:
-        q2 = q2.filter(models.Product.name == producto)
-    if cliente:
-        q2 = q2.join(models.Customer, models.Customer.id == models.Order.customer_id)\
-               .filter(models.Customer.user_id == cliente)
-    if orden_id:
-        q2 = q2.filter(models.Order.id == orden_id)
-    q2 = _filter_dates(q2, models.Order, desde, hasta)
-    ventas_productos = [dict(r._mapping) for r in q2.all()]
 
-    # 3️⃣ Detalle completo de órdenes
-    q3 = (
-        db.query(
-            models.Order.id.label("orden_id"),
-            models.Customer.user_id.label("cliente"),
-            models.Product.name.label("producto"),
-            models.OrderItem.quantity.label("cantidad"),
-            models.OrderItem.price.label("precio_unitario"),
-            (models.OrderItem.quantity * models.OrderItem.price).label("subtotal"),
-            models.Order.total.label("total_orden"),
-            models.Order.created_at.label("fecha"),
-        )
-        .join(models.Customer, models.Customer.id == models.Order.customer_id)
-        .join(models.OrderItem, models.OrderItem.order_id == models.Order.id)
-        .join(models.Product, models.Product.id == models.OrderItem.product_id)
+
+# === 3. Ventas por producto ===
+@router.get("/sales_by_product")
+async def sales_by_product(
+    cliente: str | None = Query(None),
+    producto: str | None = Query(None),
+    orden_id: int | None = Query(None),
+    desde: str | None = Query(None),
+    hasta: str | None = Query(None),
+    session: AsyncSession = Depends(db.get_async_db),
+):
+    filtros = _filters(cliente, producto, orden_id, desde, hasta)
+    return await report_cache.get_or_compute(
+        "sales_by_product", filtros, lambda: _rows(session, sales_by_product_query, filtros)
     )
-    if cliente:
-        q3 = q3.filter(models.Customer.user_id == cliente)
-    if producto:
-        q3 = q3.filter(models.Product.name == producto)
-    if orden_id:
-        q3 = q3.filter(models.Order.id == orden_id)
-    q3 = _filter_dates(q3, models.Order, desde, hasta)
-    detalle_ordenes = [dict(r._mapping) for r in q3.all()]
 
+
+# === 4. Consolidado de todos los reportes ===
+@router.get("/summary_all")
+async def summary_all(
+    cliente: str | None = Query(None),
+    producto: str | None = Query(None),
+    orden_id: int | None = Query(None),
+    desde: str | None = Query(None),
+    hasta: str | None = Query(None),
+):
+    filtros = _filters(cliente, producto, orden_id, desde, hasta)
+    return await report_cache.get_or_compute("summary_all", filtros, lambda: _summary_all(filtros))
+
+
+async def _summary_all(filtros: dict) -> dict:
+    # Las tres consultas son independientes: se lanzan a la vez en conexiones
+    # separadas y la latencia queda cerca de la más lenta.
+    resumen, ventas, detalle = await asyncio.gather(
+        _rows_isolated(order_summary_query, filtros),
+        _rows_isolated(sales_by_product_query, filtros),
+        _rows_isolated(order_full_detail_query, filtros),
+    )
     return {
-        "order_summary": resumen_clientes,
-        "sales_by_product": ventas_productos,
-        "order_full_detail": detalle_ordenes,
+        "order_summary": resumen,
+        "sales_by_product": ventas,
+        "order_full_detail": detalle,
     }
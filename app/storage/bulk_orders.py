@@ -0,0 +1,168 @@
+# app/storage/bulk_orders.py
+"""
+Carga masiva de órdenes (`POST /orders/bulk`).
+
+Cada lote corre en una sola transacción (la del llamador):
+1. Seriales reservados en bloque con una sola sentencia.
+2. Clientes y productos con upsert por conjunto.
+3. Órdenes: en PostgreSQL se cargan con COPY a una tabla temporal de staging
+   y pasan a `orders` con un INSERT ... SELECT ... RETURNING; en otros motores,
+   un INSERT por lotes con RETURNING.
+4. `order_items`: COPY directo en PostgreSQL (ids ya conocidos) o executemany.
+5. Rollups diarios.
+
+Las órdenes quedan sincronizadas (con customer_id), así que no pasan por el outbox.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.storage import models
+from app.storage.order_serial import allocate_order_serials
+from app.storage.rollups import add_orders_to_rollups
+from app.storage.sync_relational import _upsert_ids
+
+_ORDER_COLUMNS = ("user_id", "items", "total", "status", "order_serial", "created_at", "customer_id")
+_ITEM_COLUMNS = ("order_id", "product_id", "quantity", "price", "created_at")
+
+# Se vacía en cada commit; sobrevive en la conexión del pool para el siguiente lote
+_STAGE_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS orders_bulk_stage (
+    user_id VARCHAR NOT NULL,
+    items JSON NOT NULL,
+    total DOUBLE PRECISION NOT NULL,
+    status VARCHAR NOT NULL,
+    order_serial VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    customer_id INTEGER NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+
+def _prepare(db: Session, orders: list[dict], now: datetime) -> tuple[list[dict], dict[str, int]]:
+    """Seriales en bloque + upsert de clientes y productos. Retorna filas de `orders` e ids de productos."""
+    serials = allocate_order_serials(db, len(orders), now)
+    customer_ids = _upsert_ids(
+        db,
+        models.Customer,
+        models.Customer.user_id,
+        [{"user_id": u} for u in sorted({o["user_id"] for o in orders})],
+    )
+    products: dict[str, float] = {}
+    for order in orders:
+        for item in order["items"]:
+            name = item.get("nombre")
+            if name and name not in products:
+                products[name] = float(item.get("precio_unitario", 0))
+    product_ids = _upsert_ids(
+        db,
+        models.Product,
+        models.Product.name,
+        [{"name": n, "price": p} for n, p in products.items()],
+    )
+    rows = [
+        {
+            "user_id": order["user_id"],
+            "items": order["items"],
+            "total": order["total"],
+            "status": order["status"],
+            "order_serial": serial,
+            "created_at": now,
+            "customer_id": customer_ids[order["user_id"]],
+        }
+        for order, serial in zip(orders, serials)
+    ]
+    return rows, product_ids
+
+
+def _insert_orders(db: Session, rows: list[dict]) -> dict[str, int]:
+    table = models.Order.__table__
+    result = db.execute(table.insert().returning(table.c.order_serial, table.c.id), rows)
+    return dict(result.all())
+
+
+def _insert_items(db: Session, items: list[tuple]) -> None:
+    if items:
+        db.execute(
+            models.OrderItem.__table__.insert(),
+            [dict(zip(_ITEM_COLUMNS, item)) for item in items],
+        )
+
+
+def _add_rollups(db: Session, rows: list[dict], ids: dict[str, int], product_ids: dict[str, int]) -> None:
+    orders = [SimpleNamespace(id=ids[r["order_serial"]], **r) for r in rows]
+    add_orders_to_rollups(db, orders, product_ids)
+
+
+# === PostgreSQL: COPY con el driver asíncrono de psycopg ===
+async def _driver_connection(db: AsyncSession):
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def _copy_orders(db: AsyncSession, rows: list[dict]) -> dict[str, int]:
+    columns = ", ".join(_ORDER_COLUMNS)
+    await db.execute(text(_STAGE_DDL))
+    driver = await _driver_connection(db)
+    async with driver.cursor() as cur:
+        async with cur.copy(f"COPY orders_bulk_stage ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(
+                    [json.dumps(row["items"], ensure_ascii=False) if c == "items" else row[c] for c in _ORDER_COLUMNS]
+                )
+    result = await db.execute(
+        text(f"INSERT INTO orders ({columns}) SELECT {columns} FROM orders_bulk_stage RETURNING order_serial, id")
+    )
+    return dict(result.all())
+
+
+async def _copy_items(db: AsyncSession, items: list[tuple]) -> None:
+    driver = await _driver_connection(db)
+    async with driver.cursor() as cur:
+        async with cur.copy(f"COPY order_items ({', '.join(_ITEM_COLUMNS)}) FROM STDIN") as copy:
+            for item in items:
+                await copy.write_row(item)
+
+
+async def bulk_insert_orders(db: AsyncSession, orders: list[dict]) -> list[dict]:
+    """
+    Inserta un lote de órdenes ya validadas (user_id, items, total, status).
+    No hace commit. Retorna order_id/order_serial/total en el mismo orden de entrada.
+    """
+    if not orders:
+        return []
+    now = datetime.utcnow()
+    use_copy = db.bind.dialect.name == "postgresql"
+
+    rows, product_ids = await db.run_sync(_prepare, orders, now)
+    ids = await _copy_orders(db, rows) if use_copy else await db.run_sync(_insert_orders, rows)
+
+    items = [
+        (
+            ids[row["order_serial"]],
+            product_ids[item["nombre"]],
+            int(item.get("cantidad", 1)),
+            float(item.get("precio_unitario", 0)),
+            row["created_at"],
+        )
+        for row in rows
+        for item in row["items"]
+        if item.get("nombre")
+    ]
+    if use_copy:
+        await _copy_items(db, items)
+    else:
+        await db.run_sync(_insert_items, items)
+
+    await db.run_sync(_add_rollups, rows, ids, product_ids)
+    return [
+        {"order_id": ids[row["order_serial"]], "order_serial": row["order_serial"], "total": row["total"]}
+        for row in rows
+    ]
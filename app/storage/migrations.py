@@ -0,0 +1,95 @@
+# app/storage/migrations.py
+"""
+Migraciones versionadas del esquema.
+
+`Base.metadata.create_all` crea tablas nuevas pero no altera las existentes
+(índices, columnas). Cada migración es una lista de sentencias idempotentes
+que se aplica una sola vez y queda registrada en `schema_migrations`.
+Para agregar una migración, añade una tupla al final de MIGRATIONS con la
+siguiente versión. Un paso puede ser SQL o una función que recibe la conexión
+(para migraciones de datos).
+"""
+from typing import Callable
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+
+def _rebuild_rollups(conn: Connection) -> None:
+    from app.storage.rollups import rebuild_rollups
+    with Session(bind=conn) as session:
+        rebuild_rollups(session)
+        session.flush()
+
+
+def _order_items_created_at(conn: Connection) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns("order_items")}
+    if "created_at" not in columns:
+        conn.execute(text("ALTER TABLE order_items ADD COLUMN created_at TIMESTAMP WITH TIME ZONE"))
+    conn.execute(text(
+        "UPDATE order_items SET created_at = "
+        "(SELECT o.created_at FROM orders o WHERE o.id = order_items.order_id) "
+        "WHERE created_at IS NULL"
+    ))
+
+
+MIGRATIONS: list[tuple[int, str, list[str | Callable[[Connection], None]]]] = [
+    (
+        1,
+        "Índices compuestos y de llaves foráneas para órdenes y reportes",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_orders_user_id_created_at_id ON orders (user_id, created_at, id)",
+            "CREATE INDEX IF NOT EXISTS ix_orders_user_id_id ON orders (user_id, id)",
+            "CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders (created_at, id)",
+            "CREATE INDEX IF NOT EXISTS ix_orders_status_created_at_id ON orders (status, created_at, id)",
+            "CREATE INDEX IF NOT EXISTS ix_orders_customer_id_created_at ON orders (customer_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)",
+            "CREATE INDEX IF NOT EXISTS ix_order_items_product_id ON order_items (product_id)",
+        ],
+    ),
+    (
+        2,
+        "Carga inicial de rollups diarios de ventas",
+        [_rebuild_rollups],
+    ),
+    (
+        3,
+        "order_items.created_at (fecha de la orden) para filtrar y particionar por fecha",
+        [_order_items_created_at],
+    ),
+]
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Clave arbitraria para serializar migraciones entre workers que arrancan a la vez
+_ADVISORY_LOCK_KEY = 7_340_221
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Aplica las migraciones pendientes. Retorna las versiones aplicadas."""
+    applied: list[int] = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+        conn.execute(text(_CREATE_TABLE))
+        current = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar_one()
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for stmt in statements:
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    conn.execute(text(stmt))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                {"v": version, "d": description},
+            )
+            applied.append(version)
+    return applied
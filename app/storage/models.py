@@ -5,8 +5,8 @@
 # ======================================================
 
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime,
-    ForeignKey, JSON
+    Column, Integer, String, Float, DateTime, Date,
+    ForeignKey, JSON, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -31,6 +31,15 @@ class Order(Base):
     customer = relationship("Customer", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order")
 
+    # Índices según los caminos de acceso reales (ver app/storage/migrations.py)
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_orders_user_id_id", "user_id", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_customer_id_created_at", "customer_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Order id={self.id} user_id={self.user_id} total={self.total}>"
 
@@ -88,9 +97,89 @@ class OrderItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
+    # Copia de orders.created_at: clave de partición con ORDERS_PARTITIONING=monthly
+    created_at = Column(DateTime(timezone=True), nullable=True)
 
     order = relationship("Order", back_populates="order_items")
     product = relationship("Product", back_populates="order_items")
 
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_product_id", "product_id"),
+    )
+
     def __repr__(self):
         return f"<OrderItem order={self.order_id} product={self.product_id} qty={self.quantity}>"
+
+
+class OrderSerialCounter(Base):
+    """
+    Contador diario de seriales AIFS-YYYYMMDD-NNNN.
+    Una fila por día; se incrementa dentro de la transacción de la orden.
+    """
+    __tablename__ = "order_serial_counters"
+
+    day = Column(Date, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<OrderSerialCounter day={self.day} last_value={self.last_value}>"
+
+
+class OrderSyncOutbox(Base):
+    """
+    Outbox de sincronización relacional: una fila por orden pendiente de
+    reflejarse en customers/products/order_items. Se escribe en la misma
+    transacción que la orden y la drena un worker en segundo plano.
+    Sin FK a orders para no acoplar el worker al ciclo de vida de la orden.
+    """
+    __tablename__ = "order_sync_outbox"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    available_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<OrderSyncOutbox order={self.order_id} attempts={self.attempts}>"
+
+
+# ======================================================
+# ROLLUPS DIARIOS PARA REPORTES
+# ======================================================
+
+class SalesDailyByProduct(Base):
+    """
+    Ventas agregadas por día, producto y estado de la orden.
+    Se mantiene incrementalmente (ver app/storage/rollups.py).
+    """
+    __tablename__ = "sales_daily_by_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    status = Column(String, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    sales = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index("ix_sales_daily_by_product_product_id_day", "product_id", "day"),
+    )
+
+
+class SalesDailyByCustomer(Base):
+    """
+    Órdenes y total comprado por día, cliente y estado de la orden.
+    """
+    __tablename__ = "sales_daily_by_customer"
+
+    day = Column(Date, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    status = Column(String, primary_key=True)
+    num_orders = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index("ix_sales_daily_by_customer_customer_id_day", "customer_id", "day"),
+    )
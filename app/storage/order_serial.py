@@ -1,13 +1,51 @@
+# app/storage/order_serial.py
+from datetime import datetime, time, timedelta
 from sqlalchemy import text
-from app.storage.db import engine
-
-def next_order_serial():
-    sql = """
-    SELECT 'AIFS-' || TO_CHAR(CURRENT_DATE, 'YYYYMMDD') || '-' ||
-           LPAD((COUNT(*) + 1)::text, 4, '0')
-    FROM orders
-    WHERE DATE(created_at) = CURRENT_DATE;
-    """
-    with engine.begin() as conn:
-        n = conn.execute(text(sql)).scalar_one()
-    return n
+from sqlalchemy.orm import Session
+
+# Camino normal: una fila por día, costo O(1) sin importar cuántas órdenes existan.
+# El UPDATE bloquea la fila del día hasta el commit de la orden, así que dos
+# órdenes concurrentes nunca reciben el mismo número.
+_BUMP_SQL = text("""
+UPDATE order_serial_counters
+SET last_value = last_value + :n
+WHERE day = :day
+RETURNING last_value
+""")
+
+# Primera orden del día: crea la fila. Se siembra con las órdenes ya existentes
+# de ese día (despliegues a mitad de jornada) usando un rango sobre created_at.
+_SEED_SQL = text("""
+INSERT INTO order_serial_counters (day, last_value)
+SELECT :day, COUNT(*) + :n FROM orders
+WHERE created_at >= :start AND created_at < :end
+ON CONFLICT (day) DO UPDATE SET last_value = order_serial_counters.last_value + :n
+RETURNING last_value
+""")
+
+
+def format_order_serial(day, value: int) -> str:
+    return f"AIFS-{day:%Y%m%d}-{value:04d}"
+
+
+def allocate_order_serials(db: Session, count: int, now: datetime | None = None) -> list[str]:
+    """
+    Reserva un bloque de `count` seriales consecutivos del día con una sola
+    sentencia (cargas masivas). Misma semántica transaccional que next_order_serial.
+    """
+    day = (now or datetime.utcnow()).date()
+    last = db.execute(_BUMP_SQL, {"day": day, "n": count}).scalar()
+    if last is None:
+        start = datetime.combine(day, time.min)
+        last = db.execute(
+            _SEED_SQL, {"day": day, "n": count, "start": start, "end": start + timedelta(days=1)}
+        ).scalar_one()
+    return [format_order_serial(day, value) for value in range(last - count + 1, last + 1)]
+
+
+def next_order_serial(db: Session, now: datetime | None = None) -> str:
+    """
+    Reserva el siguiente serial del día dentro de la transacción de `db`.
+    Si la transacción hace rollback, el número se libera junto con la orden.
+    """
+    return allocate_order_serials(db, 1, now)[0]
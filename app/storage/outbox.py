@@ -0,0 +1,137 @@
+# app/storage/outbox.py
+"""
+Outbox de sincronización relacional de órdenes.
+
+`create_order` solo inserta la orden y su fila de outbox (misma transacción).
+Este módulo drena el outbox por lotes y aplica `sync_orders_to_relational`
+con sentencias por conjunto; los fallos se reintentan con backoff.
+
+Modos de ejecución:
+- En la app: `run_outbox_worker` como tarea asyncio del lifespan (OUTBOX_WORKER=inline).
+- Proceso aparte: `python -m app.storage.outbox` (y OUTBOX_WORKER=off en la API).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.storage.db import SessionLocal
+from app.storage.models import Order, OrderSyncOutbox
+from app.storage.report_cache import bump_orders_version
+from app.storage.sync_relational import sync_orders_to_relational
+from app.utils.structured_log import configure_logging
+
+log = logging.getLogger(__name__)
+
+OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "inline").strip().lower()
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+
+
+def enqueue_order_sync(db: Session, order_id: int) -> None:
+    """Registra la orden para sincronizar. No hace commit (va con la orden)."""
+    now = datetime.utcnow()
+    db.add(OrderSyncOutbox(order_id=order_id, attempts=0, available_at=now, created_at=now))
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(300, 2 ** attempts))
+
+
+def _mark_failed(entry: OrderSyncOutbox, err: Exception, now: datetime) -> None:
+    entry.attempts += 1
+    entry.last_error = str(err)[:500]
+    entry.available_at = now + _backoff(entry.attempts)
+
+
+def drain_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Procesa un lote del outbox. Retorna cuántas entradas se tomaron.
+    Usa FOR UPDATE SKIP LOCKED para que varios workers no tomen las mismas filas.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        entries = db.execute(
+            select(OrderSyncOutbox)
+            .where(
+                OrderSyncOutbox.available_at <= now,
+                OrderSyncOutbox.attempts < OUTBOX_MAX_ATTEMPTS,
+            )
+            .order_by(OrderSyncOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not entries:
+            return 0
+
+        # Bloquea las órdenes (en orden de id, como el lote de estados) para que
+        # el rollup use el estado confirmado: un cambio de estado concurrente
+        # espera a esta transacción, o esta lee el estado ya cambiado.
+        orders = {
+            o.id: o
+            for o in db.execute(
+                select(Order)
+                .where(Order.id.in_({e.order_id for e in entries}))
+                .order_by(Order.id)
+                .with_for_update()
+            ).scalars()
+        }
+
+        # Camino rápido: todo el lote en un savepoint
+        try:
+            with db.begin_nested():
+                sync_orders_to_relational(db, list(orders.values()))
+                db.execute(
+                    delete(OrderSyncOutbox).where(OrderSyncOutbox.id.in_([e.id for e in entries]))
+                )
+        except Exception as batch_err:
+            log.warning(f"Outbox: lote de {len(entries)} falló ({batch_err}); reintentando orden por orden.")
+            # Aislar la(s) orden(es) problemáticas sin bloquear al resto
+            for entry in entries:
+                order = orders.get(entry.order_id)
+                try:
+                    with db.begin_nested():
+                        if order is not None:
+                            sync_orders_to_relational(db, [order])
+                        db.delete(entry)
+                except Exception as err:
+                    _mark_failed(entry, err, now)
+                    log.error(f"Outbox: orden {entry.order_id} falló (intento {entry.attempts}): {err}", extra={"order_id": entry.order_id})
+
+        db.commit()
+        bump_orders_version()
+        return len(entries)
+
+
+async def run_outbox_worker(stop: asyncio.Event) -> None:
+    """Bucle del worker: drena mientras haya trabajo y espera entre sondeos."""
+    while not stop.is_set():
+        try:
+            taken = await asyncio.to_thread(drain_outbox)
+        except Exception as err:
+            log.exception(f"Outbox: error drenando ({err}).")
+            taken = 0
+        if taken >= OUTBOX_BATCH_SIZE:
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+if __name__ == "__main__":
+    configure_logging()
+    log.info("Worker de sincronización relacional iniciado.")
+    try:
+        while True:
+            if drain_outbox() < OUTBOX_BATCH_SIZE:
+                time.sleep(OUTBOX_POLL_SECONDS)
+    except KeyboardInterrupt:
+        log.info("Worker detenido.")
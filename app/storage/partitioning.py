@@ -0,0 +1,234 @@
+# app/storage/partitioning.py
+"""
+Particionado mensual de `orders` y `order_items` por `created_at` (PostgreSQL, opt-in).
+
+Con ORDERS_PARTITIONING=monthly el lifespan crea ambas tablas como tablas
+particionadas por rango (si aún no existen) antes de `create_all`, y mantiene
+creadas las particiones de los próximos PARTITION_MONTHS_AHEAD meses
+(al iniciar y cada PARTITION_CHECK_HOURS).
+
+Particularidades del esquema particionado:
+- La PK y las UNIQUE deben incluir la clave de partición: (id, created_at) y
+  (order_serial, created_at). El serial lleva la fecha, así que sigue siendo único.
+- `order_items.created_at` es copia de la fecha de la orden; la FK a orders es
+  (order_id, created_at). Los reportes filtran por fecha en ambas tablas para
+  que el planner descarte particiones.
+- No hay partición DEFAULT: una fila fuera de rango falla en lugar de caer en
+  una partición que luego bloquearía crear la del mes.
+
+Migrar una base existente (una transacción; deja *_legacy salvo --drop-legacy):
+    python -m app.storage.partitioning --migrate
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.storage import models
+from app.storage.db import Base, engine as default_engine
+from app.storage.migrations import MIGRATIONS
+
+log = logging.getLogger(__name__)
+
+ORDERS_PARTITIONING = os.getenv("ORDERS_PARTITIONING", "off").strip().lower()
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_HOURS = float(os.getenv("PARTITION_CHECK_HOURS", "12"))
+
+_PARTITIONED_TABLES = ("orders", "order_items")
+
+_CREATE_ORDERS = """
+CREATE TABLE IF NOT EXISTS orders (
+    id SERIAL NOT NULL,
+    user_id VARCHAR NOT NULL,
+    items JSON NOT NULL,
+    total DOUBLE PRECISION NOT NULL,
+    status VARCHAR NOT NULL,
+    order_serial VARCHAR,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    customer_id INTEGER REFERENCES customers (id),
+    PRIMARY KEY (id, created_at),
+    UNIQUE (order_serial, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+_CREATE_ORDER_ITEMS = """
+CREATE TABLE IF NOT EXISTS order_items (
+    id SERIAL NOT NULL,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    quantity INTEGER NOT NULL,
+    price DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (id, created_at),
+    FOREIGN KEY (order_id, created_at) REFERENCES orders (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+# Los índices de `index=True` del ORM y los compuestos de la migración 1
+# (se crean en la tabla padre y PostgreSQL los propaga a cada partición)
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_order_serial ON orders (order_serial)",
+    "CREATE INDEX IF NOT EXISTS ix_order_items_id ON order_items (id)",
+    *next(steps for version, _, steps in MIGRATIONS if version == 1),
+]
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def _table_exists(conn: Connection, table: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar()
+
+
+def ensure_partitions(conn: Connection, first: date, last: date) -> list[str]:
+    """Crea las particiones mensuales faltantes entre `first` y `last` (inclusive). Retorna las creadas."""
+    created = []
+    month = _month_start(first)
+    while month <= last:
+        upper = _add_months(month, 1)
+        for table in _PARTITIONED_TABLES:
+            name = f"{table}_p{month:%Y%m}"
+            if _table_exists(conn, name):
+                continue
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+            ))
+            created.append(name)
+        month = upper
+    return created
+
+
+def ensure_partitions_ahead(engine: Engine = default_engine) -> list[str]:
+    today = datetime.utcnow().date()
+    with engine.begin() as conn:
+        if not is_partitioned(conn, "orders"):
+            return []
+        return ensure_partitions(conn, today, _add_months(_month_start(today), PARTITION_MONTHS_AHEAD))
+
+
+def _create_partitioned_tables(conn: Connection) -> None:
+    # Tablas referenciadas por las FKs antes que los padres particionados
+    Base.metadata.create_all(bind=conn, tables=[models.Customer.__table__, models.Product.__table__])
+    conn.execute(text(_CREATE_ORDERS))
+    conn.execute(text(_CREATE_ORDER_ITEMS))
+    for stmt in _INDEXES:
+        conn.execute(text(stmt))
+
+
+def ensure_partitioned_schema(engine: Engine = default_engine) -> list[str]:
+    """
+    Para el lifespan (antes de `create_all`): crea los padres particionados si
+    no existen y las particiones del mes actual y los siguientes.
+    """
+    if engine.dialect.name != "postgresql":
+        log.warning("ORDERS_PARTITIONING=monthly solo aplica a PostgreSQL; se usa el esquema normal.")
+        return []
+    with engine.begin() as conn:
+        if _table_exists(conn, "orders") and not is_partitioned(conn, "orders"):
+            log.warning("orders existe sin particionar: ejecuta `python -m app.storage.partitioning --migrate`.")
+            return []
+        _create_partitioned_tables(conn)
+        today = datetime.utcnow().date()
+        return ensure_partitions(conn, today, _add_months(_month_start(today), PARTITION_MONTHS_AHEAD))
+
+
+async def run_partition_maintainer(stop: asyncio.Event) -> None:
+    """Tarea del lifespan: revisa periódicamente que existan las particiones futuras."""
+    while not stop.is_set():
+        try:
+            created = await asyncio.to_thread(ensure_partitions_ahead)
+            if created:
+                log.info(f"Particiones creadas: {created}")
+        except Exception as err:
+            log.exception(f"Particionado: error creando particiones ({err}).")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=PARTITION_CHECK_HOURS * 3600)
+        except asyncio.TimeoutError:
+            pass
+
+
+# === Migración de una base existente ===
+def _rename_to_legacy(conn: Connection, table: str) -> None:
+    legacy = f"{table}_legacy"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Los nombres de índices y secuencias son globales al esquema: liberarlos para el padre nuevo
+    for (index,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy}).all():
+        conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "legacy_{index}"'))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+
+
+def migrate_to_partitioned(engine: Engine = default_engine, drop_legacy: bool = False) -> dict:
+    """Copia orders/order_items a tablas particionadas en una sola transacción."""
+    with engine.begin() as conn:
+        if is_partitioned(conn, "orders"):
+            return {"migrated": False, "reason": "orders ya está particionada"}
+        conn.execute(text("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE"))
+        for table in _PARTITIONED_TABLES:
+            _rename_to_legacy(conn, table)
+        _create_partitioned_tables(conn)
+
+        # Límites en UTC, igual que los de las particiones
+        bounds = conn.execute(text(
+            "SELECT MIN(created_at AT TIME ZONE 'UTC'), MAX(created_at AT TIME ZONE 'UTC') FROM orders_legacy"
+        )).one()
+        today = datetime.utcnow().date()
+        first = bounds[0].date() if bounds[0] else today
+        last = max(bounds[1].date() if bounds[1] else today, today)
+        ensure_partitions(conn, first, _add_months(_month_start(last), PARTITION_MONTHS_AHEAD))
+
+        orders = conn.execute(text(
+            "INSERT INTO orders (id, user_id, items, total, status, order_serial, created_at, customer_id) "
+            "SELECT id, user_id, items, total, status, order_serial, created_at, customer_id FROM orders_legacy"
+        )).rowcount
+        items = conn.execute(text(
+            "INSERT INTO order_items (id, order_id, product_id, quantity, price, created_at) "
+            "SELECT i.id, i.order_id, i.product_id, i.quantity, i.price, o.created_at "
+            "FROM order_items_legacy i JOIN orders_legacy o ON o.id = i.order_id"
+        )).rowcount
+        for table in _PARTITIONED_TABLES:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            ))
+        if drop_legacy:
+            conn.execute(text("DROP TABLE order_items_legacy"))
+            conn.execute(text("DROP TABLE orders_legacy"))
+        conn.execute(text("ANALYZE orders"))
+        conn.execute(text("ANALYZE order_items"))
+    return {"migrated": True, "orders": orders, "order_items": items, "legacy_dropped": drop_legacy}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Particionado mensual de orders/order_items (PostgreSQL).")
+    parser.add_argument("--migrate", action="store_true", help="Copiar las tablas actuales a tablas particionadas")
+    parser.add_argument("--drop-legacy", action="store_true", help="Con --migrate: borrar orders_legacy/order_items_legacy")
+    parser.add_argument("--ensure", action="store_true", help="Crear las particiones de los próximos meses")
+    args = parser.parse_args()
+    if args.migrate:
+        print(f"[partitioning] {migrate_to_partitioned(drop_legacy=args.drop_legacy)}")
+    elif args.ensure:
+        print(f"[partitioning] Particiones creadas: {ensure_partitions_ahead()}")
+    else:
+        parser.print_help()
@@ -0,0 +1,182 @@
+# app/storage/query_audit.py
+"""
+Auditoría de planes de consulta de los routers.
+
+Ejecuta EXPLAIN sobre cada consulta caliente de `orders` y `reports` contra
+la base configurada (DATABASE_URL) y falla si alguna recorre una tabla
+completa: un escaneo secuencial o un índice leído de punta a punta sin
+condición (PostgreSQL: Seq Scan, o Index/Index Only Scan sin `Index Cond`;
+SQLite: cualquier `SCAN tabla`, use o no un índice). El planner decide con
+estadísticas reales, así que la base debe tener datos representativos: con
+una base vacía se cargan `--seed` órdenes sintéticas y se corre ANALYZE.
+
+Uso (CI o local):
+    python -m app.storage.query_audit --seed 20000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.storage import models
+from app.storage.db import Base, SessionLocal, engine
+from app.storage.migrations import run_migrations
+from app.storage.order_serial import next_order_serial
+from app.storage.sync_relational import sync_orders_to_relational
+
+
+class Explain(Executable, ClauseElement):
+    """Envuelve una sentencia en EXPLAIN conservando sus parámetros."""
+    inherit_cache = False
+
+    def __init__(self, statement, prefix: str):
+        self.statement = statement
+        self.prefix = prefix
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return f"{element.prefix} {compiler.process(element.statement, **kw)}"
+
+
+def _audited_queries(db: Session) -> dict:
+    """Consultas de los routers con filtros representativos."""
+    from app.routers import orders as orders_router
+    from app.routers import reports as reports_router
+
+    now = datetime.utcnow()
+    desde = (now - timedelta(days=7)).isoformat()
+    hasta = now.isoformat()
+    cursor = orders_router._encode_cursor(SimpleNamespace(created_at=now, id=10**9))
+    return {
+        "orders.status": orders_router._orders_page_query(user_id="audit-user-1").limit(51),
+        "orders.status.serial": orders_router._orders_page_query(
+            user_id="audit-user-1", order_serial="AIFS-00000000-0001"
+        ),
+        "orders.status.total": orders_router._orders_count_query("audit-user-1"),
+        "orders.escalate": orders_router._latest_user_order_query("audit-user-1"),
+        "orders.list.status": orders_router._orders_page_query(status="pending").limit(101),
+        "orders.list.cursor": orders_router._orders_page_query(cursor=cursor).limit(101),
+        "orders.serial_seed": select(func.count()).select_from(models.Order).where(
+            models.Order.created_at >= now - timedelta(days=1), models.Order.created_at < now
+        ),
+        "reports.order_summary.fechas": reports_router.order_summary_query(db, desde=desde, hasta=hasta).statement,
+        "reports.order_summary.cliente": reports_router.order_summary_query(db, cliente="audit-user-1").statement,
+        "reports.sales_by_product.fechas": reports_router.sales_by_product_query(db, desde=desde, hasta=hasta).statement,
+        "reports.order_full_detail.orden": reports_router.order_full_detail_query(db, orden_id=1).statement,
+        "reports.order_full_detail.fechas": reports_router.order_full_detail_query(db, desde=desde, hasta=hasta).statement,
+    }
+
+
+def _seq_scans_postgres(rows) -> list[str]:
+    found = []
+
+    def walk(node):
+        kind = node.get("Node Type")
+        if kind == "Seq Scan":
+            found.append(node.get("Relation Name", "?"))
+        elif kind in ("Index Scan", "Index Only Scan") and "Index Cond" not in node:
+            # Recorre el índice completo (p. ej. solo para ordenar): sigue siendo un escaneo total
+            found.append(f"{node.get('Relation Name', '?')} (índice {node.get('Index Name', '?')} completo)")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    plan = rows[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    walk(plan[0]["Plan"])
+    return found
+
+
+def _seq_scans_sqlite(rows) -> list[str]:
+    # "SEARCH t USING INDEX ... (col=?)" usa el índice para acotar; "SCAN t" recorre la
+    # tabla y "SCAN t USING [COVERING] INDEX ..." recorre el índice completo.
+    found = []
+    for r in rows:
+        detail = r[3]
+        if not detail.startswith("SCAN ") or "CONSTANT ROW" in detail:
+            continue
+        table = detail.split()[1]
+        if table.startswith("(") or table == "SUBQUERY":
+            continue  # subconsulta materializada: sus tablas tienen su propia línea
+        found.append(f"{table} (índice completo)" if "USING" in detail else table)
+    return found
+
+
+def audit(db: Session) -> dict[str, list[str]]:
+    """Retorna {consulta: [tablas con escaneo secuencial]}."""
+    dialect = db.get_bind().dialect.name
+    results = {}
+    for name, stmt in _audited_queries(db).items():
+        if dialect == "postgresql":
+            rows = db.execute(Explain(stmt, "EXPLAIN (FORMAT JSON)")).all()
+            results[name] = _seq_scans_postgres(rows)
+        else:
+            rows = db.execute(Explain(stmt, "EXPLAIN QUERY PLAN")).all()
+            results[name] = _seq_scans_sqlite(rows)
+    db.rollback()
+    return results
+
+
+def seed(db: Session, n_orders: int) -> None:
+    """Carga órdenes sintéticas si la tabla está vacía."""
+    if db.execute(select(func.count()).select_from(models.Order)).scalar_one():
+        return
+    now = datetime.utcnow()
+    orders = []
+    for n in range(n_orders):
+        created_at = now - timedelta(minutes=17 * n)
+        items = [
+            {"nombre": f"Audit producto {(n + k) % 40}", "cantidad": 1 + k, "precio_unitario": 1000 + k}
+            for k in range(3)
+        ]
+        order = models.Order(
+            # ~5 órdenes por cliente: con pocos clientes el planner recorre `customers` entero
+            user_id=f"audit-user-{n % max(100, n_orders // 5)}",
+            items=items,
+            total=sum(i["cantidad"] * i["precio_unitario"] for i in items),
+            status=("pending", "confirmed", "delivered")[n % 3],
+            order_serial=next_order_serial(db, created_at),
+            created_at=created_at,
+        )
+        db.add(order)
+        orders.append(order)
+    db.flush()
+    sync_orders_to_relational(db, orders)
+    db.commit()
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=20000, help="Órdenes sintéticas a cargar si la base está vacía")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    with SessionLocal() as db:
+        if args.seed:
+            seed(db, args.seed)
+        results = audit(db)
+
+    failed = {name: tables for name, tables in results.items() if tables}
+    for name, tables in results.items():
+        status = "ESCANEO COMPLETO: " + ", ".join(tables) if tables else "ok"
+        print(f"{name:<36} {status}")
+    if failed:
+        print(f"\n{len(failed)} consulta(s) sin índice utilizable.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# app/storage/report_cache.py
+"""
+Caché de resultados de reportes con invalidación por versión.
+
+La clave combina el reporte, los filtros normalizados y una versión global de
+datos de órdenes. `bump_orders_version()` se llama en cada escritura de órdenes
+(creación, cambio de estado, escalamiento y sincronización del outbox), con lo
+que las entradas anteriores quedan inalcanzables sin tener que borrarlas.
+
+- Con Redis disponible, versión y entradas viven en Redis (compartidas entre
+  workers) con TTL y un índice LRU acotado a REPORT_CACHE_MAX_ENTRIES.
+- Siempre hay además un LRU local en memoria del mismo tamaño y TTL (sin
+  Redis, el TTL acota cuánto puede atrasarse un worker que no vio el bump).
+- Misses idénticos concurrentes en el mismo worker se agrupan: solo uno
+  consulta la base y los demás esperan su resultado. Si el líder se cancela
+  (cliente desconectado, apagado), los que esperaban reintentan por su cuenta.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import perf_counter, time
+from typing import Awaitable, Callable
+
+import redis
+from fastapi.encoders import jsonable_encoder
+
+from app.core.carts.breaker import CircuitBreaker
+from app.utils.metrics import REDIS_SECONDS, REPORT_CACHE_REQUESTS, registry
+
+log = logging.getLogger(__name__)
+
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+REPORT_CACHE_TTL_SECONDS = int(os.getenv("REPORT_CACHE_TTL_SECONDS", "600"))
+
+_VERSION_KEY = "reports:orders_version"
+_INDEX_KEY = "reports:cache:index"
+_ENTRY_PREFIX = "reports:cache:"
+
+
+class _LeaderCancelled(Exception):
+    """El cálculo del líder se canceló antes de publicar un resultado."""
+
+
+class ReportCache:
+    def __init__(self, redis_url: str | None = None, max_entries=REPORT_CACHE_MAX_ENTRIES, ttl=REPORT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local: OrderedDict[str, tuple[object, float]] = OrderedDict()
+        self._local_version = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        if redis_url:
+            self._client = redis.Redis.from_url(
+                redis_url, decode_responses=True, socket_timeout=0.2, socket_connect_timeout=0.2
+            )
+
+    # --- Redis protegido por breaker: si falla, se sigue solo con el LRU local ---
+    def _redis(self, fn, *args):
+        if self._client is None or not self._breaker.allow():
+            return None
+        start = perf_counter()
+        try:
+            result = fn(self._client, *args)
+            self._breaker.record_success()
+            return result
+        except redis.RedisError as err:
+            self._breaker.record_failure()
+            log.warning(f"Caché de reportes sin Redis ({err}).")
+            return None
+        finally:
+            REDIS_SECONDS.observe(perf_counter() - start, client="report_cache")
+
+    @property
+    def shared(self) -> bool:
+        return self._client is not None and self._breaker.state == "closed"
+
+    def version(self) -> str:
+        remote = self._redis(lambda c: c.get(_VERSION_KEY))
+        if remote is not None or self.shared:
+            return f"r{remote or 0}"
+        return f"l{self._local_version}"
+
+    def bump(self) -> None:
+        with self._lock:
+            self._local_version += 1
+            self._local.clear()
+        self._redis(lambda c: c.incr(_VERSION_KEY))
+
+    @staticmethod
+    def make_key(report: str, filters: dict) -> str:
+        normalized = {
+            k: (v.strip() if isinstance(v, str) else v)
+            for k, v in sorted(filters.items())
+            if v not in (None, "")
+        }
+        raw = json.dumps([report, normalized], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[1] > time():
+                self._local.move_to_end(key)
+                return entry[0]
+        raw = self._redis(lambda c: c.get(_ENTRY_PREFIX + key))
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self._redis(lambda c: c.zadd(_INDEX_KEY, {key: time()}))
+        self._store_local(key, value)
+        return value
+
+    def _store_local(self, key: str, value) -> None:
+        with self._lock:
+            self._local[key] = (value, time() + self.ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _set(self, key: str, value) -> None:
+        self._store_local(key, value)
+
+        def store(c):
+            with c.pipeline() as pipe:
+                pipe.set(_ENTRY_PREFIX + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+                pipe.zadd(_INDEX_KEY, {key: time()})
+                pipe.execute()
+            # LRU acotado: se eliminan las entradas con acceso más antiguo
+            overflow = c.zcard(_INDEX_KEY) - self.max_entries
+            if overflow > 0:
+                stale = c.zrange(_INDEX_KEY, 0, overflow - 1)
+                if stale:
+                    c.delete(*[_ENTRY_PREFIX + k for k in stale])
+                    c.zrem(_INDEX_KEY, *stale)
+
+        self._redis(store)
+
+    def _lookup(self, report: str, filters: dict) -> tuple[str, object]:
+        key = f"{self.version()}:{self.make_key(report, filters)}"
+        return key, self._get(key)
+
+    async def get_or_compute(self, report: str, filters: dict, compute: Callable[[], Awaitable[object]]):
+        if not REPORT_CACHE_ENABLED:
+            return jsonable_encoder(await compute())
+
+        # Las llamadas a Redis son bloqueantes (acotadas por timeout y breaker): van en un hilo
+        key, value = await asyncio.to_thread(self._lookup, report, filters)
+        if value is not None:
+            self.hits += 1
+            REPORT_CACHE_REQUESTS.inc(result="hit")
+            return value
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = Future()
+        if not leader:
+            self.coalesced += 1
+            REPORT_CACHE_REQUESTS.inc(result="coalesced")
+            try:
+                # shield: cancelar este request no debe cancelar el futuro compartido
+                return await asyncio.shield(asyncio.wrap_future(pending))
+            except _LeaderCancelled:
+                return await self.get_or_compute(report, filters, compute)
+
+        self.misses += 1
+        REPORT_CACHE_REQUESTS.inc(result="miss")
+        try:
+            value = jsonable_encoder(await compute())
+            await asyncio.to_thread(self._set, key, value)
+            pending.set_result(value)
+            return value
+        except Exception as err:
+            pending.set_exception(err)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if not pending.done():
+                # CancelledError no pasa por `except Exception`: liberar a los que esperan
+                pending.set_exception(_LeaderCancelled())
+
+    def stats(self) -> dict:
+        return {
+            "shared": self.shared,
+            "entries_local": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+report_cache = ReportCache(redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+
+@registry.collector
+def _report_cache_metrics():
+    served = report_cache.hits + report_cache.coalesced
+    total = served + report_cache.misses
+    return [
+        ("report_cache_hit_ratio", "Fracción de consultas servidas sin ir a la base", (), [((), served / total if total else 0.0)]),
+        ("report_cache_entries", "Entradas en el LRU local", (), [((), len(report_cache._local))]),
+    ]
+
+
+def bump_orders_version() -> None:
+    """Invalida todos los reportes cacheados (llamar después del commit)."""
+    report_cache.bump()
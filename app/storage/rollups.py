@@ -0,0 +1,256 @@
+# app/storage/rollups.py
+"""
+Rollups diarios de ventas para los reportes.
+
+- `sales_daily_by_product` (día, producto, estado) y `sales_daily_by_customer`
+  (día, cliente, estado) se actualizan de forma incremental cuando una orden
+  se sincroniza y cuando cambia de estado (el monto pasa de un estado a otro).
+- Los reportes suman todos los estados, igual que las consultas sobre las
+  tablas crudas; guardar el estado permite excluir p. ej. canceladas a futuro.
+- Reconstrucción completa offline: `python -m app.storage.rollups --rebuild`.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import Date, cast, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.storage import models
+from app.storage.db import SessionLocal, dialect_insert
+
+
+def _status(value: str | None) -> str:
+    return (value or "pending").strip().lower()
+
+
+def _day(value: datetime) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _upsert(db: Session, model, keys: list[str], measures: list[str], rows: list[dict]) -> None:
+    """Suma las medidas sobre la fila existente (o la crea)."""
+    if not rows:
+        return
+    stmt = dialect_insert(db, model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={m: getattr(model, m) + getattr(stmt.excluded, m) for m in measures},
+    )
+    db.execute(stmt)
+
+
+def _apply(db: Session, product_deltas: dict, customer_deltas: dict) -> None:
+    _upsert(
+        db,
+        models.SalesDailyByProduct,
+        ["day", "product_id", "status"],
+        ["units", "sales"],
+        [
+            {"day": d, "product_id": p, "status": s, "units": u, "sales": v}
+            for (d, p, s), (u, v) in product_deltas.items()
+        ],
+    )
+    _upsert(
+        db,
+        models.SalesDailyByCustomer,
+        ["day", "customer_id", "status"],
+        ["num_orders", "total"],
+        [
+            {"day": d, "customer_id": c, "status": s, "num_orders": n, "total": t}
+            for (d, c, s), (n, t) in customer_deltas.items()
+        ],
+    )
+
+
+def add_orders_to_rollups(db: Session, orders: list[models.Order], product_ids: dict[str, int]) -> None:
+    """Suma órdenes recién sincronizadas (ya con customer_id) a los rollups."""
+    product_deltas: dict = defaultdict(lambda: [0, 0.0])
+    customer_deltas: dict = defaultdict(lambda: [0, 0.0])
+    for order in orders:
+        day, status = _day(order.created_at), _status(order.status)
+        bucket = customer_deltas[(day, order.customer_id, status)]
+        bucket[0] += 1
+        bucket[1] += float(order.total or 0)
+        for item in order.items or []:
+            name = item.get("nombre")
+            if not name:
+                continue
+            qty = int(item.get("cantidad", 1))
+            bucket = product_deltas[(day, product_ids[name], status)]
+            bucket[0] += qty
+            bucket[1] += qty * float(item.get("precio_unitario", 0))
+    _apply(db, product_deltas, customer_deltas)
+
+
+def move_orders_status(db: Session, changes: list[tuple[models.Order, str]], new_status: str) -> None:
+    """
+    Traslada el aporte de cada orden del estado anterior al nuevo.
+    `changes` = [(orden, estado_anterior)]. Ignora órdenes aún no sincronizadas
+    (el outbox las sumará con su estado vigente). El llamador debe tener la
+    orden bloqueada (FOR UPDATE), igual que el outbox al sincronizar; si no,
+    el estado leído por la sync puede quedar viejo en el rollup.
+    """
+    synced = [(o, _status(old)) for o, old in changes if o.customer_id is not None]
+    new_status = _status(new_status)
+    synced = [(o, old) for o, old in synced if old != new_status]
+    if not synced:
+        return
+
+    by_id = {o.id: (o, old) for o, old in synced}
+    items = db.execute(
+        select(
+            models.OrderItem.order_id,
+            models.OrderItem.product_id,
+            func.sum(models.OrderItem.quantity),
+            func.sum(models.OrderItem.quantity * models.OrderItem.price),
+        )
+        .where(models.OrderItem.order_id.in_(list(by_id)))
+        .group_by(models.OrderItem.order_id, models.OrderItem.product_id)
+    ).all()
+
+    product_deltas: dict = defaultdict(lambda: [0, 0.0])
+    customer_deltas: dict = defaultdict(lambda: [0, 0.0])
+    for order, old in synced:
+        day, total = _day(order.created_at), float(order.total or 0)
+        for status, sign in ((old, -1), (new_status, 1)):
+            bucket = customer_deltas[(day, order.customer_id, status)]
+            bucket[0] += sign
+            bucket[1] += sign * total
+    for order_id, product_id, units, sales in items:
+        order, old = by_id[order_id]
+        day = _day(order.created_at)
+        for status, sign in ((old, -1), (new_status, 1)):
+            bucket = product_deltas[(day, product_id, status)]
+            bucket[0] += sign * int(units or 0)
+            bucket[1] += sign * float(sales or 0)
+    _apply(db, product_deltas, customer_deltas)
+
+
+def _day_expr(db: Session, column):
+    # SQLite no tiene tipo DATE: date() devuelve 'YYYY-MM-DD', que es como se guarda Date.
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recalcula ambos rollups desde las tablas crudas. No hace commit."""
+    day = _day_expr(db, models.Order.created_at)
+    status = func.lower(func.coalesce(models.Order.status, "pending"))
+    db.execute(delete(models.SalesDailyByProduct))
+    db.execute(delete(models.SalesDailyByCustomer))
+    db.execute(
+        models.SalesDailyByProduct.__table__.insert().from_select(
+            ["day", "product_id", "status", "units", "sales"],
+            select(
+                day,
+                models.OrderItem.product_id,
+                status,
+                func.sum(models.OrderItem.quantity),
+                func.sum(models.OrderItem.quantity * models.OrderItem.price),
+            )
+            .join(models.Order, models.Order.id == models.OrderItem.order_id)
+            .group_by(day, models.OrderItem.product_id, status),
+        )
+    )
+    db.execute(
+        models.SalesDailyByCustomer.__table__.insert().from_select(
+            ["day", "customer_id", "status", "num_orders", "total"],
+            select(
+                day,
+                models.Order.customer_id,
+                status,
+                func.count(models.Order.id),
+                func.sum(models.Order.total),
+            )
+            .where(models.Order.customer_id.is_not(None))
+            .group_by(day, models.Order.customer_id, status),
+        )
+    )
+
+
+# === Lectura desde reportes ===
+def rollup_day_range(desde: str | None, hasta: str | None):
+    """
+    Traduce los filtros de fecha de los reportes a un rango de días.
+    Solo aplica si las fechas son días completos (sin hora ni zona), como las
+    que envía el dashboard; si no, retorna None y se usan las tablas crudas.
+    `desde` incluye el día; `hasta` (created_at <= medianoche) lo excluye.
+    """
+    bounds = []
+    for value in (desde, hasta):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            bounds.append(None)  # los reportes crudos ignoran fechas inválidas
+            continue
+        if parsed.tzinfo is not None or parsed.time() != datetime.min.time():
+            return None
+        bounds.append(parsed.date())
+    return tuple(bounds)
+
+
+def _filter_days(query, model, day_range):
+    start, end = day_range
+    if start:
+        query = query.filter(model.day >= start)
+    if end:
+        query = query.filter(model.day < end)
+    return query
+
+
+def order_summary_rollup_query(db: Session, cliente, day_range):
+    r = models.SalesDailyByCustomer
+    q = (
+        db.query(
+            models.Customer.user_id.label("cliente"),
+            func.sum(r.num_orders).label("num_ordenes"),
+            func.sum(r.total).label("total_comprado"),
+        )
+        .join(models.Customer, models.Customer.id == r.customer_id)
+        .group_by(models.Customer.user_id)
+        .having(func.sum(r.num_orders) > 0)
+        .order_by(func.sum(r.total).desc())
+    )
+    if cliente:
+        q = q.filter(models.Customer.user_id == cliente)
+    return _filter_days(q, r, day_range)
+
+
+def sales_by_product_rollup_query(db: Session, producto, day_range):
+    r = models.SalesDailyByProduct
+    q = (
+        db.query(
+            models.Product.name.label("producto"),
+            func.sum(r.units).label("total_unidades"),
+            func.sum(r.sales).label("total_ventas"),
+        )
+        .join(models.Product, models.Product.id == r.product_id)
+        .group_by(models.Product.name)
+        .having(func.sum(r.units) != 0)
+        .order_by(func.sum(r.sales).desc())
+    )
+    if producto:
+        q = q.filter(models.Product.name == producto)
+    return _filter_days(q, r, day_range)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de rollups de ventas.")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular desde las tablas crudas")
+    args = parser.parse_args()
+    if args.rebuild:
+        with SessionLocal() as session:
+            rebuild_rollups(session)
+            session.commit()
+        from app.storage.report_cache import bump_orders_version
+        bump_orders_version()
+        print("[rollups] Rollups reconstruidos.")
+    else:
+        parser.print_help()
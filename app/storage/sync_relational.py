@@ -1,57 +1,94 @@
 # app/storage/sync_relational.py
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 from . import models
+from .db import dialect_insert as _insert
+from .rollups import add_orders_to_rollups
+
+
+def _upsert_ids(db: Session, model, key_col, rows: list[dict]) -> dict:
+    """
+    Inserta las filas que no existan (ON CONFLICT DO NOTHING RETURNING) y
+    devuelve {clave: id} para todas, consultando solo las que ya existían.
+    """
+    if not rows:
+        return {}
+    key = key_col.key
+    stmt = (
+        _insert(db, model)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[key])
+        .returning(key_col, model.id)
+    )
+    ids = {k: i for k, i in db.execute(stmt).all()}
+    missing = [r[key] for r in rows if r[key] not in ids]
+    if missing:
+        ids.update(db.execute(select(key_col, model.id).where(key_col.in_(missing))).all())
+    return ids
+
+
+def sync_orders_to_relational(db: Session, orders: list[models.Order]) -> None:
+    """
+    Sincroniza un lote de órdenes con customers, products y order_items
+    usando sentencias por conjunto (sin consultas por ítem).
+    No hace commit: corre dentro de la transacción del llamador.
+    """
+    if not orders:
+        return
+
+    # Órdenes que se sincronizan por primera vez (aún sin cliente): son las que suman a los rollups
+    first_sync = [o for o in orders if o.customer_id is None]
+
+    # --- 1. Clientes ---
+    user_ids = sorted({o.user_id for o in orders})
+    customer_ids = _upsert_ids(
+        db, models.Customer, models.Customer.user_id, [{"user_id": u} for u in user_ids]
+    )
+    for order in orders:
+        order.customer_id = customer_ids[order.user_id]
+
+    # --- 2. Productos (uno por nombre, precio de la primera aparición) ---
+    products: dict[str, float] = {}
+    for order in orders:
+        for item in order.items or []:
+            name = item.get("nombre")
+            if name and name not in products:
+                products[name] = float(item.get("precio_unitario", 0))
+    product_ids = _upsert_ids(
+        db,
+        models.Product,
+        models.Product.name,
+        [{"name": n, "price": p} for n, p in products.items()],
+    )
+
+    # --- 3. Reemplazar ítems en bloque ---
+    db.flush()
+    db.execute(
+        delete(models.OrderItem).where(models.OrderItem.order_id.in_([o.id for o in orders]))
+    )
+    rows = [
+        {
+            "order_id": order.id,
+            "product_id": product_ids[item["nombre"]],
+            "quantity": int(item.get("cantidad", 1)),
+            "price": float(item.get("precio_unitario", 0)),
+            "created_at": order.created_at,
+        }
+        for order in orders
+        for item in order.items or []
+        if item.get("nombre")
+    ]
+    if rows:
+        db.execute(_insert(db, models.OrderItem), rows)
+
+    # --- 4. Rollups diarios ---
+    add_orders_to_rollups(db, first_sync, product_ids)
+
 
 def sync_order_to_relational(db: Session, order: models.Order):
     """
     Sincroniza una orden con las tablas relacionales:
     customers, products y order_items.
-    Evita duplicados y múltiples commits.
+    Corre en la misma transacción que la orden (el llamador hace commit).
     """
-    # --- 1. Cliente ---
-    customer = (
-        db.query(models.Customer)
-        .filter(models.Customer.user_id == order.user_id)
-        .first()
-    )
-    if not customer:
-        customer = models.Customer(user_id=order.user_id)
-        db.add(customer)
-        db.flush()  # aún sin commit
-    order.customer_id = customer.id
-
-    # --- 2. Limpiar ítems antiguos ---
-    db.query(models.OrderItem).filter(
-        models.OrderItem.order_id == order.id
-    ).delete()
-
-    # --- 3. Productos e ítems ---
-    for item in order.items:
-        name = item.get("nombre")
-        price = float(item.get("precio_unitario", 0))
-        qty = int(item.get("cantidad", 1))
-
-        # Buscar o crear producto
-        product = (
-            db.query(models.Product)
-            .filter(models.Product.name == name)
-            .first()
-        )
-        if not product:
-            product = models.Product(name=name, price=price)
-            db.add(product)
-            db.flush()
-
-        # Crear ítem
-        db.add(
-            models.OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=qty,
-                price=price,
-            )
-        )
-
-    # --- 4. Commit único ---
-    db.commit()
-    print(f"✅ Orden {order.id} sincronizada correctamente.")
+    sync_orders_to_relational(db, [order])
@@ -1,18 +1,199 @@
-import json, os
+# app/utils/logger.py
+"""
+Registro de interacciones del chat en JSONL (solo se agregan líneas).
+
+`log_interaction` solo encola el registro; un hilo de fondo lo escribe en
+lotes, hace fsync cada LOG_FSYNC_SECONDS y rota por fecha y por tamaño
+(LOG_MAX_BYTES). Cada proceso escribe su propio archivo (sufijo con el pid),
+así varios workers nunca intercalan líneas:
+    logs/chat_history-YYYYMMDD-w<pid>.jsonl, ...-w<pid>.1.jsonl, ...
+
+Conversión única del archivo antiguo (arreglo JSON):
+    python -m app.utils.logger --convert-legacy
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
-LOG_FILE = os.path.join('logs','chat_history.json')
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_PREFIX = "chat_history"
+LEGACY_LOG_FILE = os.path.join(LOG_DIR, "chat_history.json")
+LOG_ENABLED = os.getenv("CHAT_LOG_ENABLED", "1").lower() in ("1", "true", "yes")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_FSYNC_SECONDS = float(os.getenv("LOG_FSYNC_SECONDS", "1.0"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class InteractionLog:
+    def __init__(
+        self,
+        directory: str = LOG_DIR,
+        prefix: str = LOG_PREFIX,
+        max_bytes: int = LOG_MAX_BYTES,
+        fsync_seconds: float = LOG_FSYNC_SECONDS,
+        queue_max: int = LOG_QUEUE_MAX,
+        batch_size: int = 500,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.fsync_seconds = fsync_seconds
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._day = None
+        self._part = 0
+
+    # --- Lado del request: nunca bloquea ---
+    def log(self, record: dict) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="interaction-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Escribe lo pendiente, hace fsync y cierra el archivo."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # --- Hilo escritor ---
+    def _path(self, day: str, part: int) -> str:
+        suffix = f".{part}" if part else ""
+        return os.path.join(self.directory, f"{self.prefix}-{day}-w{os.getpid()}{suffix}.jsonl")
+
+    def _target(self):
+        """Archivo abierto para hoy; rota si cambió la fecha o superó el tamaño."""
+        day = datetime.now().strftime("%Y%m%d")
+        if self._file is not None and day == self._day and self._size < self.max_bytes:
+            return self._file
+        self._close_file()
+        if day != self._day:
+            self._day, self._part = day, 0
+        else:
+            self._part += 1
+        os.makedirs(self.directory, exist_ok=True)
+        # Si el pid se repite tras un reinicio se continúa el archivo, respetando el tamaño
+        while os.path.exists(self._path(day, self._part)) and os.path.getsize(self._path(day, self._part)) >= self.max_bytes:
+            self._part += 1
+        self._file = open(self._path(day, self._part), "ab")
+        self._size = self._file.tell()
+        return self._file
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _run(self) -> None:
+        last_sync = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.fsync_seconds))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if any(record is _STOP for record in batch):
+                # Un log() posterior a close() puede dejar el centinela en medio del lote
+                batch = [record for record in batch if record is not _STOP]
+                stopping = True
+            if batch:
+                try:
+                    for record in batch:
+                        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                        self._target().write(line)
+                        self._size += len(line)
+                    dirty = True
+                except OSError as err:
+                    self.dropped += len(batch)
+                    dirty = False  # si falló al abrir el archivo rotado no hay nada que sincronizar
+                    log.warning(f"Log de interacciones: no se pudo escribir ({err}).")
+            if dirty and self._file is not None and (stopping or time.monotonic() - last_sync >= self.fsync_seconds):
+                try:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as err:
+                    log.warning(f"Log de interacciones: fsync falló ({err}).")
+                last_sync, dirty = time.monotonic(), False
+        self._close_file()
+
+
+interaction_log = InteractionLog()
+
+
 def log_interaction(session_id, user_msg, agent_reply, channel='unknown'):
-    os.makedirs('logs', exist_ok=True)
-    record = {'timestamp': datetime.now().isoformat(), 'session_id': session_id, 'channel': channel, 'cliente': user_msg, 'agente': agent_reply}
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump([record], f, ensure_ascii=False, indent=2)
+    if not LOG_ENABLED:
+        return
+    interaction_log.log({
+        'timestamp': datetime.now().isoformat(),
+        'session_id': session_id,
+        'channel': channel,
+        'cliente': user_msg,
+        'agente': agent_reply,
+    })
+
+
+def close_interaction_log() -> None:
+    interaction_log.close()
+
+
+# === Conversión del archivo antiguo ===
+def convert_legacy(path: str = LEGACY_LOG_FILE) -> int:
+    """Pasa el arreglo JSON antiguo a JSONL y renombra el original a *.migrated."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)
+    target = os.path.join(os.path.dirname(path) or ".", f"{LOG_PREFIX}-legacy.jsonl")
+    with open(target, "a", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(path, path + ".migrated")
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del log de interacciones.")
+    parser.add_argument("--convert-legacy", nargs="?", const=LEGACY_LOG_FILE, metavar="RUTA",
+                        help="Convertir logs/chat_history.json (arreglo) a JSONL")
+    args = parser.parse_args()
+    if args.convert_legacy:
+        print(f"[logger] Registros convertidos: {convert_legacy(args.convert_legacy)}")
     else:
-        with open(LOG_FILE, 'r+', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-            except Exception:
-                data = []
-            data.append(record)
-            f.seek(0)
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        parser.print_help()
@@ -0,0 +1,322 @@
+# app/utils/metrics.py
+"""
+Métricas en proceso con salida en formato de texto de Prometheus (`GET /metrics`).
+
+- Counter, Gauge e Histogram guardan sus valores por combinación de labels
+  detrás de un lock propio: seguros entre hilos y sin dependencias externas.
+- Los collectors (`registry.collector(fn)`) se evalúan al renderizar, para
+  estado que ya vive en otro objeto (breaker del carrito, caché, catálogo).
+- Varios workers (METRICS_MULTIPROC_DIR): cada proceso vuelca su snapshot a
+  `<dir>/w<pid>.json` cada METRICS_FLUSH_SECONDS y al renderizar; `/metrics`
+  suma counters e histogramas de todos los archivos y expone los gauges con
+  un label `pid` (solo de procesos vivos). Vaciar el directorio en cada deploy.
+"""
+from __future__ import annotations
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "").strip()
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(k), self._copy(v)] for k, v in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @staticmethod
+    def _copy(value):
+        return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+
+    def time(self, **labels):
+        """Decorador que observa la duración de cada llamada."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list = []
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, fn):
+        """
+        Registra `fn() -> [(nombre, ayuda, labelnames, [(valores_labels, valor)])]`,
+        evaluada al renderizar y expuesta como gauges.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    # --- Snapshot del proceso ---
+    def snapshot(self) -> dict:
+        families = {}
+        for metric in list(self._metrics.values()):
+            family = {"type": metric.kind, "help": metric.help, "labelnames": list(metric.labelnames), "samples": metric.samples()}
+            if isinstance(metric, Histogram):
+                family["buckets"] = list(metric.buckets)
+            families[metric.name] = family
+        for fn in self._collectors:
+            try:
+                collected = fn()
+            except Exception:
+                continue
+            for name, help_text, labelnames, samples in collected:
+                families[name] = {
+                    "type": "gauge",
+                    "help": help_text,
+                    "labelnames": list(labelnames),
+                    "samples": [[[str(v) for v in values], float(value)] for values, value in samples],
+                }
+        return families
+
+    # --- Modo multi-worker ---
+    def _snapshot_path(self, pid: int | None = None) -> str:
+        return os.path.join(METRICS_MULTIPROC_DIR, f"w{pid or os.getpid()}.json")
+
+    def flush(self) -> None:
+        if not METRICS_MULTIPROC_DIR:
+            return
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+        path = self._snapshot_path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def start_flusher(self) -> None:
+        """Hilo que vuelca el snapshot periódicamente (solo con METRICS_MULTIPROC_DIR)."""
+        if not METRICS_MULTIPROC_DIR or self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(METRICS_FLUSH_SECONDS)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _merged(self) -> dict:
+        self.flush()
+        merged: dict = {}
+        for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "w*.json")):
+            pid = int(os.path.basename(path)[1:-5])
+            try:
+                with open(path, encoding="utf-8") as f:
+                    families = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = self._alive(pid)
+            for name, family in families.items():
+                target = merged.setdefault(name, {**family, "samples": {}})
+                if family["type"] == "gauge":
+                    if not alive:
+                        continue
+                    if "pid" not in target["labelnames"]:
+                        target["labelnames"] = family["labelnames"] + ["pid"]
+                    for values, value in family["samples"]:
+                        target["samples"][tuple(values + [str(pid)])] = value
+                    continue
+                for values, value in family["samples"]:
+                    key = tuple(values)
+                    current = target["samples"].get(key)
+                    if current is None:
+                        target["samples"][key] = value
+                    elif family["type"] == "counter":
+                        target["samples"][key] = current + value
+                    else:
+                        target["samples"][key] = {
+                            "buckets": [a + b for a, b in zip(current["buckets"], value["buckets"])],
+                            "sum": current["sum"] + value["sum"],
+                            "count": current["count"] + value["count"],
+                        }
+        for family in merged.values():
+            family["samples"] = [[list(k), v] for k, v in family["samples"].items()]
+        return merged
+
+    # --- Formato de texto ---
+    def render(self) -> str:
+        families = self._merged() if METRICS_MULTIPROC_DIR else self.snapshot()
+        lines = []
+        for name, family in sorted(families.items()):
+            kind, names = family["type"], family["labelnames"]
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {kind}")
+            for values, value in family["samples"]:
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels_text(names, values)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(family["buckets"]) + [float("inf")], value["buckets"]):
+                    cumulative += count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{name}_bucket{_labels_text(names, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels_text(names, values)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels_text(names, values)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# === Métricas de la app ===
+HTTP_REQUESTS = registry.counter("http_requests_total", "Requests HTTP por router, método y estado", ("router", "method", "status"))
+HTTP_LATENCY = registry.histogram("http_request_duration_seconds", "Latencia HTTP por router (hasta el último byte)", ("router",))
+CHAT_STAGE_SECONDS = registry.histogram("chat_stage_duration_seconds", "Tiempo por etapa del pipeline de /chat/", ("stage",))
+DB_QUERY_SECONDS = registry.histogram("db_query_duration_seconds", "Duración de sentencias SQL", ("engine", "dialect"))
+REDIS_SECONDS = registry.histogram("redis_call_duration_seconds", "Duración de llamadas a Redis", ("client",))
+REPORT_CACHE_REQUESTS = registry.counter("report_cache_requests_total", "Consultas a la caché de reportes", ("result",))
+
+
+# code object de cada función decorada → etapa (el profiler etiqueta los stacks con esto)
+STAGE_CODES: dict = {}
+
+
+def chat_stage(stage: str):
+    """Decorador: mide una etapa del chat en `chat_stage_duration_seconds`."""
+    timer = CHAT_STAGE_SECONDS.time(stage=stage)
+
+    def decorator(fn):
+        STAGE_CODES[fn.__code__] = stage
+        return timer(fn)
+    return decorator
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: cuenta requests y mide la latencia hasta el último byte (incluye streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("path", "")
+            router = path.strip("/").split("/")[0] if route is not None else "unmatched"
+            HTTP_REQUESTS.inc(router=router or "root", method=scope["method"], status=status[0])
+            HTTP_LATENCY.observe(time.perf_counter() - start, router=router or "root")
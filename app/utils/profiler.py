@@ -0,0 +1,206 @@
+# app/utils/profiler.py
+"""
+Profiler bajo demanda para workers en producción (solo admin).
+
+Se activa con PROFILER_ENABLED=1 y PROFILER_TOKEN (header X-Admin-Token).
+Desactivado, ni el middleware ni el router se montan: costo cero.
+
+Modos de una sesión (`POST /admin/profile/start`):
+- `sample`: un hilo toma el stack del event loop cada `interval_ms` y acumula
+  stacks colapsados (formato flamegraph). Es seguro con requests concurrentes.
+- `cprofile`: cProfile sobre el hilo del event loop durante la ventana; con
+  requests concurrentes también se miden los demás que corran en ese lapso.
+
+La sesión termina al completar `requests` llamadas a /chat/ o al pasar
+`seconds`. Los frames de funciones marcadas con `chat_stage` se etiquetan con
+su etapa (`[stage:escalation]`), y el resultado resume el tiempo por etapa.
+`GET /admin/profile/result` devuelve el dump y además queda en PROFILER_DIR.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from app.utils.metrics import STAGE_CODES
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0").lower() in ("1", "true", "yes")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join("var", "profiles"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class ProfileSession:
+    def __init__(self, mode: str, requests: int | None, seconds: float | None, interval_ms: float = 5.0):
+        self.mode = mode
+        self.remaining = requests
+        self.deadline = time.monotonic() + min(seconds or PROFILER_MAX_SECONDS, PROFILER_MAX_SECONDS)
+        self.interval = max(interval_ms, 1.0) / 1000
+        self.started_at = datetime.utcnow()
+        self.finished_at: datetime | None = None
+        self.requests_seen = 0
+        self.stacks: Counter = Counter()
+        self.stage_samples: Counter = Counter()
+        self._profile: cProfile.Profile | None = None
+        self._target_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.path: str | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def start(self) -> None:
+        """Se llama desde el hilo del event loop."""
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+            self._thread.start()
+
+    # --- Sampler ---
+    def _sample_loop(self) -> None:
+        # Deja de muestrear al vencer la ventana aunque nadie llame a stop()
+        while not self._stop.wait(self.interval) and not self.expired():
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is not None:
+                self._record(frame)
+
+    def _record(self, frame) -> None:
+        labels, stage = [], None
+        while frame is not None:
+            code = frame.f_code
+            tag = STAGE_CODES.get(code)
+            if tag is not None:
+                stage = stage or tag  # la etapa más interna
+                labels.append(f"[stage:{tag}]")
+            labels.append(_frame_label(code))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(labels))] += 1
+        self.stage_samples[stage or "(sin etapa)"] += 1
+
+    # --- Fin de la sesión ---
+    def request_done(self) -> bool:
+        """Cuenta una llamada a /chat/. Retorna True si la sesión debe cerrarse."""
+        self.requests_seen += 1
+        if self.remaining is not None:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                return True
+        return time.monotonic() >= self.deadline
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def stop(self) -> None:
+        """Se llama desde el hilo del event loop (cProfile solo se detiene desde ahí)."""
+        if not self.active:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self.finished_at = datetime.utcnow()
+        self.path = self._write()
+
+    # --- Resultados ---
+    def stage_summary(self) -> dict:
+        if self.mode == "sample":
+            total = sum(self.stage_samples.values()) or 1
+            return {stage: round(n / total, 4) for stage, n in self.stage_samples.most_common()}
+        # cprofile: tiempo acumulado de cada función marcada, sumado por etapa
+        stats = pstats.Stats(self._profile).stats
+        by_key = {(c.co_filename, c.co_firstlineno, c.co_name): s for c, s in STAGE_CODES.items()}
+        summary: Counter = Counter()
+        for key, (_, _, _, cumulative, _) in stats.items():
+            stage = by_key.get(key)
+            if stage:
+                summary[stage] += cumulative
+        return {stage: round(seconds, 6) for stage, seconds in summary.most_common()}
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def pstats_text(self, limit: int = 60) -> str:
+        out = io.StringIO()
+        out.write("# tiempo acumulado por etapa (s)\n")
+        for stage, seconds in self.stage_summary().items():
+            out.write(f"#   {stage}: {seconds}\n")
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def _write(self) -> str:
+        os.makedirs(PROFILER_DIR, exist_ok=True)
+        base = os.path.join(PROFILER_DIR, f"profile-{self.started_at:%Y%m%d-%H%M%S}-w{os.getpid()}")
+        if self._profile is not None:
+            self._profile.dump_stats(base + ".prof")
+            return base + ".prof"
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return base + ".collapsed"
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "active": self.active,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "requests_seen": self.requests_seen,
+            "remaining_requests": self.remaining,
+            "samples": sum(self.stacks.values()) if self.mode == "sample" else None,
+            "file": self.path,
+        }
+
+
+class Profiler:
+    """Una sesión a la vez por worker."""
+
+    def __init__(self):
+        self.session: ProfileSession | None = None
+
+    def start(self, mode: str, requests: int | None, seconds: float | None, interval_ms: float) -> ProfileSession:
+        if self.session is not None and self.session.active:
+            raise RuntimeError("Ya hay una sesión de profiling activa en este worker.")
+        self.session = ProfileSession(mode, requests, seconds, interval_ms)
+        self.session.start()
+        return self.session
+
+    def stop(self) -> ProfileSession | None:
+        if self.session is not None:
+            self.session.stop()
+        return self.session
+
+
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """Cierra la sesión al completar N llamadas a /chat/ o al vencer la ventana."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if session is None or not session.active or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            done = session.request_done() if scope["path"].startswith("/chat") else session.expired()
+            if done and session.active:
+                session.stop()
@@ -0,0 +1,110 @@
+# app/utils/structured_log.py
+"""
+Logging estructurado del proyecto y tracer de depuración por muestreo.
+
+- `configure_logging()` (lo llama el lifespan) instala un único handler en el
+  logger raíz: cada registro sale como una línea JSON (LOG_FORMAT=json) o como
+  texto (LOG_FORMAT=text), con el nivel de LOG_LEVEL. La escritura a stdout la
+  hace un QueueListener en su propio hilo, así el event loop nunca espera I/O.
+- Cada módulo usa `logging.getLogger(__name__)` como en app/core/carts.
+- Tracer: `start_trace(session_id)` decide al inicio del request si se
+  capturan las trazas de los detectores (1 de cada TRACE_SAMPLE_RATE requests,
+  o siempre para las sesiones de TRACE_SESSIONS). `trace(evento, **campos)`
+  cuesta una lectura de contextvar cuando el request no está muestreado;
+  `finish_trace()` emite todo el recorrido como un solo registro.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+TRACE_SAMPLE_RATE = int(os.getenv("TRACE_SAMPLE_RATE", "0"))  # 0 = sin muestreo aleatorio
+TRACE_SESSIONS = {s.strip() for s in os.getenv("TRACE_SESSIONS", "").split(",") if s.strip()}
+
+trace_log = logging.getLogger("app.trace")
+
+# Atributos propios de LogRecord; el resto viene de `extra=` y va al JSON
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> None:
+    """Configura el logger raíz una sola vez (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola de registros pendientes (apagado de la app)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# === Tracer por muestreo ===
+_trace: contextvars.ContextVar[list | None] = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(session_id: str | None = None, force: bool = False) -> contextvars.Token:
+    """Abre (o no) la traza del request actual. Retorna el token para `finish_trace`."""
+    sampled = (
+        force
+        or (session_id is not None and session_id in TRACE_SESSIONS)
+        or (TRACE_SAMPLE_RATE > 0 and random.randrange(TRACE_SAMPLE_RATE) == 0)
+    )
+    return _trace.set([] if sampled else None)
+
+
+def is_tracing() -> bool:
+    return _trace.get() is not None
+
+
+def trace(event: str, **fields) -> None:
+    events = _trace.get()
+    if events is not None:
+        events.append({"event": event, **fields})
+
+
+def finish_trace(token: contextvars.Token, **context) -> None:
+    events = _trace.get()
+    _trace.reset(token)
+    if events is not None:
+        trace_log.info("trace", extra={**context, "events": events})
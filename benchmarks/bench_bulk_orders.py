@@ -0,0 +1,65 @@
+"""
+Benchmark de carga masiva de órdenes (`bulk_insert_orders`).
+
+Inserta `--orders` órdenes en lotes de `--batch` (una transacción por lote,
+como `POST /orders/bulk`) y reporta órdenes por minuto. En PostgreSQL usa
+COPY; en otros motores, INSERT por lotes.
+
+Uso:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_bulk_orders --orders 20000 --batch 1000
+"""
+import argparse
+import asyncio
+import time
+
+from app.storage import models  # noqa: F401  # registra modelos
+from app.storage.bulk_orders import bulk_insert_orders
+from app.storage.db import AsyncSessionLocal, Base, async_engine, engine
+
+
+def make_orders(n: int, lines: int) -> list[dict]:
+    orders = []
+    for i in range(n):
+        items = [
+            {"nombre": f"Bench producto {(i + k) % 200}", "cantidad": 1 + k, "precio_unitario": 1000 + k}
+            for k in range(lines)
+        ]
+        orders.append({
+            "user_id": f"bench-bulk-{i % 500}",
+            "items": items,
+            "status": "pending",
+            "total": sum(it["cantidad"] * it["precio_unitario"] for it in items),
+        })
+    return orders
+
+
+async def run(orders: list[dict], batch: int) -> float:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for offset in range(0, len(orders), batch):
+            await bulk_insert_orders(db, orders[offset:offset + batch])
+            await db.commit()
+    elapsed = time.perf_counter() - start
+    await async_engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=3)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    elapsed = asyncio.run(run(make_orders(args.orders, args.lines), args.batch))
+    print({
+        "orders": args.orders,
+        "batch": args.batch,
+        "seconds": round(elapsed, 2),
+        "orders_per_min": round(args.orders / elapsed * 60),
+    })
+
+
+if __name__ == "__main__":
+    main()
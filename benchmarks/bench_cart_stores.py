@@ -0,0 +1,75 @@
+"""
+Benchmark de los stores de carrito: memoria, SQLite (WAL) y Redis.
+
+Uso:
+    python -m benchmarks.bench_cart_stores --ops 5000 --threads 4
+
+Redis se omite si REDIS_URL no responde.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from app.core.carts.models import CartItem
+from app.core.carts.store_memory import MemoryCartStore
+from app.core.carts.store_redis import RedisCartStore
+from app.core.carts.store_sqlite import SQLiteCartStore
+
+
+def _run_ops(store, prefix: str, ops: int, latencies: list) -> None:
+    for n in range(ops):
+        session_id = f"{prefix}-{n % 200}"
+        start = time.perf_counter()
+        cart = store.get_or_create(session_id)
+        cart.items["sku-1"] = CartItem(sku="sku-1", name="Producto", qty=1 + n % 5, unit_price=1000.0)
+        store.save(cart)
+        latencies.append(time.perf_counter() - start)
+
+
+def bench(name: str, store, ops: int, threads: int) -> dict:
+    latencies: list[float] = []
+    workers = [
+        threading.Thread(target=_run_ops, args=(store, f"{name}-{t}", ops // threads, latencies))
+        for t in range(threads)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "store": name,
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    stores = {"memory": MemoryCartStore()}
+    tmpdir = tempfile.mkdtemp(prefix="carts-bench-")
+    stores["sqlite"] = SQLiteCartStore(path=os.path.join(tmpdir, "carts.sqlite3"))
+    try:
+        redis_store = RedisCartStore(url=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        redis_store.client.ping()
+        stores["redis"] = redis_store
+    except Exception as err:
+        print(f"[bench] Redis no disponible ({err}); se omite.")
+
+    for name, store in stores.items():
+        print(bench(name, store, args.ops, args.threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Arranque y memoria por worker: catálogo desde CSV vs snapshot mmap.
+
+Para cada tamaño genera un catálogo sintético (el mismo de
+`bench_nlp_scaling`), lo escribe como CSV + synonyms.json, compila el snapshot
+y lanza `--workers` procesos por modo que importan `app.core.catalog`,
+construyen sus cachés y responden un corpus de mensajes. Cada proceso reporta
+el tiempo de carga y su memoria según /proc (RSS, privada y PSS: la privada es
+la que se multiplica por la cantidad de workers). También compara las
+respuestas de ambos modos: la búsqueda difusa del snapshot mira solo los
+candidatos con más trigramas en común, así que puede diferir en casos límite.
+
+Uso:
+    python -m benchmarks.bench_catalog_snapshot --sizes 1000,10000,100000 --workers 4
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _memory_kb() -> dict:
+    """RSS, memoria privada y PSS del proceso actual (Linux)."""
+    result = {}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            next(f)  # rango de direcciones del rollup
+            values = {k: int(v.split()[0]) for k, v in (line.split(":", 1) for line in f) if v.strip().endswith("kB")}
+        result["rss_kb"] = values.get("Rss", 0)
+        result["pss_kb"] = values.get("Pss", 0)
+        result["private_kb"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    except OSError:
+        import resource
+        result["rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def child(messages_path: str) -> None:
+    """Proceso worker: mide la carga del catálogo con el entorno recibido."""
+    import app.utils.metrics  # noqa: F401  # dependencias comunes fuera de la medición
+    import app.utils.structured_log  # noqa: F401
+
+    before = _memory_kb()
+    start = time.perf_counter()
+    from app.core import catalog
+    catalog._init_caches()
+    load_seconds = time.perf_counter() - start
+    with open(messages_path, encoding="utf-8") as f:
+        messages = json.load(f)
+    start = time.perf_counter()
+    answers = [catalog.find_product_from_message(m) for m in messages]
+    query_seconds = time.perf_counter() - start
+    after = _memory_kb()
+    print(json.dumps({
+        "snapshot": catalog.SNAPSHOT is not None,
+        "load_seconds": round(load_seconds, 4),
+        "query_ms": round(query_seconds / len(messages) * 1000, 3),
+        "memory_kb": after,
+        "catalog_kb": {k: after[k] - before.get(k, 0) for k in after},
+        "answers": answers,
+    }))
+
+
+def _write_sources(directory: str, rows: list[dict], synonyms: dict) -> tuple[str, str]:
+    catalog_path = os.path.join(directory, "Catalog.csv")
+    with open(catalog_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    synonyms_path = os.path.join(directory, "synonyms.json")
+    with open(synonyms_path, "w", encoding="utf-8") as f:
+        json.dump(synonyms, f, ensure_ascii=False)
+    return catalog_path, synonyms_path
+
+
+def _run_workers(env: dict, messages_path: str, workers: int) -> list[dict]:
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_catalog_snapshot", "--child", messages_path],
+            env=env, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    return [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+
+
+def run(sizes: list[int], workers: int) -> list[dict]:
+    from app.core.catalog_snapshot import compile_files
+    from benchmarks.bench_nlp_scaling import make_catalog, make_corpora
+
+    results = []
+    for size in sizes:
+        rows, synonyms = make_catalog(size)
+        corpora = make_corpora(rows, synonyms)
+        messages = corpora["short"] + corpora["price"] + corpora["complaint"] + corpora["names"]
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_path, synonyms_path = _write_sources(directory, rows, synonyms)
+            snapshot_path = os.path.join(directory, "catalog.snap")
+            start = time.perf_counter()
+            compile_files(catalog_path, synonyms_path, snapshot_path)
+            build_seconds = time.perf_counter() - start
+            messages_path = os.path.join(directory, "messages.json")
+            with open(messages_path, "w", encoding="utf-8") as f:
+                json.dump(messages, f, ensure_ascii=False)
+
+            env = dict(os.environ, CATALOG_FILE=catalog_path, SYNONYMS_FILE=synonyms_path, LOG_LEVEL="WARNING")
+            env.pop("CATALOG_SNAPSHOT", None)
+            modes = {
+                "csv": _run_workers(env, messages_path, workers),
+                "snapshot": _run_workers(dict(env, CATALOG_SNAPSHOT=snapshot_path), messages_path, workers),
+            }
+            baseline = modes["csv"][0]["answers"]
+            same = sum(a == b for a, b in zip(baseline, modes["snapshot"][0]["answers"]))
+            case = {
+                "size": size,
+                "snapshot_build_seconds": round(build_seconds, 3),
+                "snapshot_file_kb": round(os.path.getsize(snapshot_path) / 1024, 1),
+                "answers_equal": f"{same}/{len(baseline)}",
+            }
+            for mode, reports in modes.items():
+                if mode == "snapshot" and not all(r["snapshot"] for r in reports):
+                    raise SystemExit("El worker no cargó el snapshot")
+                case[mode] = {
+                    "load_seconds": max(r["load_seconds"] for r in reports),
+                    "query_ms": round(sum(r["query_ms"] for r in reports) / len(reports), 3),
+                    "catalog_private_kb_per_worker": round(sum(r["catalog_kb"].get("private_kb", 0) for r in reports) / len(reports)),
+                    "pss_kb_total": sum(r["memory_kb"].get("pss_kb", 0) for r in reports),
+                }
+            print(f"[bench] {size}: csv {case['csv']['load_seconds']}s, snapshot {case['snapshot']['load_seconds']}s", file=sys.stderr)
+            results.append(case)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--workers", type=int, default=4, help="Procesos por modo (simulan workers de uvicorn)")
+    parser.add_argument("--child", metavar="MESSAGES", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+    results = run([int(s) for s in args.sizes.split(",")], args.workers)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
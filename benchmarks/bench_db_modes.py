@@ -0,0 +1,145 @@
+"""
+Comparación de carga: engine sync (threadpool) vs engine async.
+
+Simula `--concurrency` clientes en lazo cerrado que lanzan consultas de los
+routers de órdenes y reportes: en modo `sync` cada request ocupa un hilo y,
+como en FastAPI/AnyIO, solo 40 corren a la vez; en modo `async` todas corren
+en el event loop con `AsyncSession`. La latencia incluye la espera por hilo
+o por conexión del pool. Ambos modos usan el pool de los routers
+(DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT): el modo sync crea su propio
+engine con esas opciones en lugar del engine sync chico de la app.
+
+Antes de la carga verifica el agrupamiento de misses de la caché de reportes:
+si el request líder se cancela (cliente desconectado), el que esperaba su
+resultado debe recalcular en lugar de quedar colgado.
+
+Uso:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_db_modes --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.routers.orders import _orders_page_query
+from app.routers.reports import order_summary_query
+from app.storage.db import DATABASE_URL, POOL_OPTIONS, AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.storage.query_audit import seed
+from app.storage.report_cache import ReportCache
+
+FASTAPI_THREADPOOL = 40
+
+# Mismo pool que el engine async, para comparar los modos en igualdad
+RouterSession = sessionmaker(bind=create_engine(DATABASE_URL, future=True, **POOL_OPTIONS))
+
+
+def _sync_query(n: int) -> None:
+    with RouterSession() as db:
+        if n % 2:
+            db.execute(_orders_page_query(user_id=f"audit-user-{n % 50}").limit(51)).scalars().all()
+        else:
+            order_summary_query(db, cliente=f"audit-user-{n % 50}").all()
+
+
+async def _async_query(n: int) -> None:
+    async with AsyncSessionLocal() as db:
+        if n % 2:
+            (await db.execute(_orders_page_query(user_id=f"audit-user-{n % 50}").limit(51))).scalars().all()
+        else:
+            (await db.execute(order_summary_query(db.sync_session, cliente=f"audit-user-{n % 50}").statement)).all()
+
+
+def run_sync(requests: int, concurrency: int) -> tuple[float, list[float]]:
+    # `concurrency` clientes en lazo cerrado; como en FastAPI, a lo sumo 40 ejecutan a la vez
+    limiter = threading.Semaphore(FASTAPI_THREADPOOL)
+    latencies: list[float] = []
+
+    def client(ids: range) -> None:
+        for n in ids:
+            start = time.perf_counter()
+            with limiter:
+                _sync_query(n)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, (range(c, requests, concurrency) for c in range(concurrency))))
+    return time.perf_counter() - start, latencies
+
+
+async def run_async(requests: int, concurrency: int) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    async def client(ids: range) -> None:
+        for n in ids:
+            start = time.perf_counter()
+            await _async_query(n)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(range(c, requests, concurrency)) for c in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await async_engine.dispose()
+    return elapsed, latencies
+
+
+async def check_cancelled_leader(timeout: float = 5.0) -> dict:
+    """Cancela al líder de un miss agrupado mientras otro request espera su resultado."""
+    cache = ReportCache(redis_url=None)
+    leader_started = asyncio.Event()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            leader_started.set()
+            await asyncio.Event().wait()  # el líder nunca termina por su cuenta
+        return {"calls": calls}
+
+    leader = asyncio.create_task(cache.get_or_compute("bench", {"case": "cancel"}, compute))
+    await leader_started.wait()
+    follower = asyncio.create_task(cache.get_or_compute("bench", {"case": "cancel"}, compute))
+    while cache.coalesced == 0:
+        await asyncio.sleep(0.001)
+    leader.cancel()
+    try:
+        value = await asyncio.wait_for(follower, timeout)
+    except asyncio.TimeoutError:
+        raise SystemExit("La caché de reportes dejó colgado al request agrupado tras cancelar al líder")
+    return {"case": "cancelled_leader", "follower_result": value, "compute_calls": calls}
+
+
+def report(mode: str, elapsed: float, latencies: list[float]) -> None:
+    latencies.sort()
+    print({
+        "mode": mode,
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=5000, help="Órdenes sintéticas si la tabla está vacía")
+    args = parser.parse_args()
+
+    print(asyncio.run(check_cancelled_leader()))
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed(db, args.seed)
+
+    report("sync", *run_sync(args.requests, args.concurrency))
+    report("async", *asyncio.run(run_async(args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
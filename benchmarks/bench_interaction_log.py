@@ -0,0 +1,79 @@
+"""
+Benchmark del log de interacciones: arreglo JSON reescrito en cada mensaje
+(formato antiguo) vs JSONL con cola y escritor en segundo plano.
+
+Reporta el tiempo por llamada visto por el request y el tiempo hasta que
+todo quedó en disco (fsync incluido).
+
+Uso:
+    python -m benchmarks.bench_interaction_log --messages 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.utils.logger import InteractionLog
+
+
+def _record(i: int) -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "session_id": f"bench-{i % 50}",
+        "channel": "web",
+        "cliente": "quiero 2 kilos de pechuga de pollo",
+        "agente": "Agregué 2 x Pechuga de pollo a tu carrito.",
+    }
+
+
+def legacy_append(path: str, record: dict) -> None:
+    """Lo que hacía `log_interaction` antes: leer todo, agregar y reescribir."""
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([record], f, ensure_ascii=False, indent=2)
+        return
+    with open(path, "r+", encoding="utf-8") as f:
+        data = json.load(f)
+        data.append(record)
+        f.seek(0)
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def run_legacy(directory: str, n: int) -> dict:
+    path = os.path.join(directory, "chat_history.json")
+    start = time.perf_counter()
+    for i in range(n):
+        legacy_append(path, _record(i))
+    elapsed = time.perf_counter() - start
+    return {"mode": "legacy_json", "us_per_call": round(elapsed / n * 1e6, 1), "seconds_total": round(elapsed, 3)}
+
+
+def run_jsonl(directory: str, n: int) -> dict:
+    log = InteractionLog(directory=directory)
+    start = time.perf_counter()
+    for i in range(n):
+        log.log(_record(i))
+    enqueued = time.perf_counter() - start
+    log.close(timeout=60)
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": "jsonl_queue",
+        "us_per_call": round(enqueued / n * 1e6, 1),
+        "seconds_total": round(elapsed, 3),
+        "dropped": log.dropped,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+    for runner in (run_legacy, run_jsonl):
+        with tempfile.TemporaryDirectory() as directory:
+            print(runner(directory, args.messages))
+
+
+if __name__ == "__main__":
+    main()
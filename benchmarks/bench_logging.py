@@ -0,0 +1,101 @@
+"""
+Benchmark del logging de los detectores del chat (catálogo, escalamiento y
+respuestas), en requests por segundo.
+
+Modos:
+- legacy_print: cada traza se imprime al momento con flush, como hacían los
+  print() de depuración.
+- trace_all: tracer estructurado con todos los requests muestreados.
+- sampled_N: tracer con 1 de cada N requests muestreados.
+- off: sin muestreo.
+
+La salida va a un archivo temporal en todos los modos, para no medir la terminal.
+
+Uso:
+    python -m benchmarks.bench_logging --requests 1000 --sample 100
+"""
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+
+from app.core import catalog, escalation, responses
+from app.core.catalog import find_product_from_message, get_product_row
+from app.core.escalation import should_escalate
+from app.core.responses import generate_response
+from app.utils import structured_log
+from app.utils.structured_log import configure_logging, finish_trace, shutdown_logging, start_trace
+
+MESSAGES = [
+    "hola, quiero 2 kilos de pechuga de pollo",
+    "cuánto valen las papas",
+    "precio del queso mozzarella",
+    "el pedido llegó incompleto y frío, qué mal servicio",
+    "gracias, muy amable",
+    "aceite de girasol",
+    "me cobraron de más en la factura",
+    "galletas integrales por favor",
+]
+
+_TRACED_MODULES = (catalog, escalation, responses)
+
+
+def _handle(message: str, force: bool) -> None:
+    token = start_trace("bench", force=force)
+    try:
+        should_escalate(message)
+        name = find_product_from_message(message)
+        row = get_product_row(name) if name else None
+        generate_response(dict(row, cantidad=1) if row else None, message)
+    finally:
+        finish_trace(token, session_id="bench")
+
+
+def _legacy_trace(event: str, **fields) -> None:
+    print(f"[DEBUG] {event}: {fields}", flush=True)
+
+
+def run(mode: str, n: int, sample: int) -> dict:
+    original = structured_log.trace
+    structured_log.TRACE_SAMPLE_RATE = sample if mode.startswith("sampled") else 0
+    force = mode in ("trace_all", "legacy_print")
+    if mode == "legacy_print":
+        for module in _TRACED_MODULES:
+            module.trace = _legacy_trace
+    start = time.perf_counter()
+    try:
+        for i in range(n):
+            _handle(MESSAGES[i % len(MESSAGES)], force)
+    finally:
+        for module in _TRACED_MODULES:
+            module.trace = original
+    elapsed = time.perf_counter() - start
+    return {"mode": mode, "requests": n, "req_per_s": round(n / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=100)
+    args = parser.parse_args()
+    random.seed(7)
+
+    results = []
+    with tempfile.TemporaryFile("w+") as sink:
+        stdout, sys.stdout = sys.stdout, sink
+        configure_logging(level="INFO", fmt="json", stream=sink)
+        try:
+            for mode in ("legacy_print", "trace_all", f"sampled_{args.sample}", "off"):
+                results.append(run(mode, args.requests, args.sample))
+        finally:
+            shutdown_logging()
+            sys.stdout = stdout
+    logging.getLogger().handlers.clear()
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Benchmark de escalamiento de los caminos calientes de NLP y precios.
+
+Genera catálogos y sinónimos sintéticos a partir de `Catalog.csv` (50, 1k,
+10k y 100k productos) y corpus de mensajes (consultas cortas, preguntas de
+precio, pedidos multiproducto, pegados de 300 líneas, reclamos con sarcasmo y
+emoji). Mide cada función con un presupuesto de tiempo por caso y reporta
+ops/s, p50/p99 y pico de memoria (tracemalloc, en una llamada aparte).
+
+Si un caso tarda más de `--call-limit` segundos en una llamada, los corpus más
+pesados de esa función y tamaño se marcan como omitidos.
+
+Los resultados se guardan en JSON; con `--compare` se contrastan contra una
+corrida anterior y el proceso sale con código 1 si algún caso perdió más de
+`--threshold` de ops/s, o si un caso medido en la base ahora quedó omitido o
+no aparece (dentro de los tamaños y funciones de la corrida actual).
+
+Uso:
+    python -m benchmarks.bench_nlp_scaling --sizes 50,1000 --budget 1
+    python -m benchmarks.bench_nlp_scaling --compare var/bench/base.json --threshold 0.15
+    python -m benchmarks.bench_nlp_scaling --compare var/bench/base.json --against var/bench/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.core import catalog, nlp_rules
+from app.core.escalation import should_escalate
+from app.core.pricing import calculate_total
+
+QUALIFIERS = ["premium", "familiar", "light", "artesanal", "clasico", "organico", "extra", "mini", "gourmet", "tradicional"]
+
+COMPLAINTS = [
+    "wow, qué excelente servicio, el pedido llegó incompleto otra vez 🙄",
+    "genial, llevo 3 horas esperando y nada 😡",
+    "me cobraron de más en la factura, increíble 👏👏",
+    "claro, porque pagar por comida fría es lo mejor que me ha pasado",
+    "el repartidor nunca llegó y nadie responde, pésimo",
+    "gracias por nada, el producto venía vencido 🤮",
+    "qué maravilla, otra vez me mandaron el producto equivocado",
+    "no me gustó, la entrega se demoró muchísimo y vino dañado",
+]
+
+FUNCTIONS = [
+    "find_product_from_message",
+    "get_product_row",
+    "extract_products_and_quantities",
+    "normalize_input",
+    "should_escalate",
+    "detect_additional_intents",
+    "calculate_total",
+]
+
+
+# === Datos sintéticos ===
+def make_catalog(size: int) -> tuple[list[dict], dict[str, list[str]]]:
+    base_rows = catalog.load_catalog()
+    with open(catalog.SYNONYMS_FILE, encoding="utf-8-sig") as f:
+        base_synonyms = json.load(f)
+    rng = random.Random(size)
+    rows, synonyms = [], {}
+    for i in range(size):
+        base = base_rows[i % len(base_rows)]
+        k = i // len(base_rows)
+        if k == 0:
+            name, suffix = base["nombre"], ""
+        else:
+            suffix = f" {QUALIFIERS[k % len(QUALIFIERS)]} {k}"
+            name = base["nombre"] + suffix
+        row = dict(base, nombre=name, sku=f"{base['sku']}-{k:05d}")
+        row["precio_lista"] = str(int(float(base["precio_lista"]) * rng.uniform(0.8, 1.3)))
+        rows.append(row)
+        variants = base_synonyms.get(base["nombre"], [])[:3]
+        synonyms[name] = [v + suffix for v in variants] + [name.lower()]
+    return rows, synonyms
+
+
+def make_corpora(rows: list[dict], synonyms: dict[str, list[str]]) -> dict[str, list]:
+    rng = random.Random(len(rows))
+    names = list(synonyms)
+
+    def syn() -> str:
+        return rng.choice(synonyms[rng.choice(names)])
+
+    def typo(name: str) -> str:
+        pos = rng.randrange(len(name))
+        return name[:pos] + name[pos + 1:]
+
+    return {
+        "short": [rng.choice(["quiero {}", "{}", "tienen {}?", "me das {}"]).format(syn()) for _ in range(20)],
+        "price": [rng.choice(["cuánto vale {}", "precio de {}", "cuánto cuesta el {}"]).format(syn()) for _ in range(20)],
+        "multi": [
+            ", ".join(f"{rng.randint(1, 12)} {syn()}" for _ in range(3)) + f" y {rng.randint(1, 12)} {syn()}"
+            for _ in range(10)
+        ],
+        "complaint": list(COMPLAINTS),
+        "paste_300": ["\n".join(f"{rng.randint(1, 40)} {syn()}" for _ in range(300)) for _ in range(2)],
+        "names": [rng.choice([n, n.lower(), typo(n)]) for n in rng.sample(names, min(20, len(names)))],
+        "rows": [(rng.choice(rows), rng.randint(1, 80)) for _ in range(20)],
+    }
+
+
+def install(rows: list[dict], synonyms: dict[str, list[str]], directory: str) -> float:
+    """Reemplaza catálogo y sinónimos de los módulos y reconstruye sus cachés. Retorna segundos."""
+    path = os.path.join(directory, f"synonyms-{len(rows)}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(synonyms, f, ensure_ascii=False)
+    start = time.perf_counter()
+    catalog.SNAPSHOT = None
+    catalog.CATALOG = rows
+    catalog.SYNONYMS = synonyms
+    catalog.rebuild_caches()
+    nlp_rules.SYNONYMS_FILE = path
+    nlp_rules.ENRICHED_SYNONYMS = {}
+    nlp_rules._load_enriched_synonyms()
+    return time.perf_counter() - start
+
+
+# === Medición ===
+def _call(function: str, item):
+    if function == "find_product_from_message":
+        return catalog.find_product_from_message(item)
+    if function == "get_product_row":
+        return catalog.get_product_row(item)
+    if function == "extract_products_and_quantities":
+        return nlp_rules.extract_products_and_quantities(item)
+    if function == "normalize_input":
+        return nlp_rules.normalize_input(item)
+    if function == "should_escalate":
+        return should_escalate(item)
+    if function == "detect_additional_intents":
+        return nlp_rules.detect_additional_intents(item)
+    return calculate_total(*item)
+
+
+def _corpora_for(function: str) -> list[str]:
+    if function == "get_product_row":
+        return ["names"]
+    if function == "calculate_total":
+        return ["rows"]
+    return ["short", "price", "complaint", "multi", "paste_300"]  # de más barato a más caro
+
+
+def measure(function: str, items: list, budget: float) -> dict:
+    latencies = []
+    deadline = time.perf_counter() + budget
+    i = 0
+    while True:
+        item = items[i % len(items)]
+        start = time.perf_counter()
+        _call(function, item)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        if time.perf_counter() >= deadline:
+            break
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        "calls": len(latencies),
+        "ops_per_sec": round(len(latencies) / total, 2) if total else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 4),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4),
+    }
+    tracemalloc.start()
+    _call(function, items[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["peak_kb"] = round(peak / 1024, 1)
+    return result
+
+
+def run(sizes: list[int], functions: list[str], budget: float, call_limit: float) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            rows, synonyms = make_catalog(size)
+            corpora = make_corpora(rows, synonyms)
+            setup = install(rows, synonyms, directory)
+            print(f"[bench] catálogo {size}: cachés en {setup:.2f}s", file=sys.stderr)
+            for function in functions:
+                too_slow = False
+                for corpus in _corpora_for(function):
+                    case = {"size": size, "function": function, "corpus": corpus}
+                    if too_slow:
+                        results.append({**case, "skipped": f"una llamada superó {call_limit}s en un corpus más liviano"})
+                        continue
+                    case.update(measure(function, corpora[corpus], budget))
+                    too_slow = case["max_ms"] / 1000 > call_limit
+                    results.append(case)
+                    print(f"[bench] {size:>6} {function:<32} {corpus:<10} {case['ops_per_sec']} ops/s", file=sys.stderr)
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "budget_seconds": budget,
+        },
+        "results": results,
+    }
+
+
+# === Comparación contra una corrida anterior ===
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    def key(r):
+        return r["size"], r["function"], r["corpus"]
+
+    before = {key(r): r for r in baseline["results"] if r.get("ops_per_sec")}
+    after = {key(r): r for r in current["results"]}
+    sizes = {r["size"] for r in current["results"]}
+    functions = {r["function"] for r in current["results"]}
+    regressions = []
+    for k, old in before.items():
+        r = after.get(k)
+        case = dict(zip(("size", "function", "corpus"), k))
+        if r is None:
+            # Fuera del alcance de esta corrida (otros --sizes/--functions) no cuenta
+            if k[0] in sizes and k[1] in functions:
+                regressions.append({**case, "before": old["ops_per_sec"], "after": "ausente", "change": None})
+            continue
+        if not r.get("ops_per_sec"):
+            # Omitido por --call-limit: una llamada se volvió más lenta que el límite
+            regressions.append({**case, "before": old["ops_per_sec"], "after": "omitido", "change": None})
+            continue
+        change = r["ops_per_sec"] / old["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append({**case, "before": old["ops_per_sec"], "after": r["ops_per_sec"], "change": round(change, 3)})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50,1000,10000,100000")
+    parser.add_argument("--functions", default=",".join(FUNCTIONS))
+    parser.add_argument("--budget", type=float, default=2.0, help="Segundos por caso")
+    parser.add_argument("--call-limit", type=float, default=5.0, help="Omitir corpus más pesados si una llamada supera esto")
+    parser.add_argument("--out", default=None, help="Archivo JSON de salida (por defecto var/bench/nlp_scaling-<fecha>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON de una corrida anterior")
+    parser.add_argument("--against", metavar="RESULT", help="Con --compare: comparar este JSON en vez de correr el benchmark")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Caída máxima tolerada de ops/s (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.against:
+        with open(args.against, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        current = run(
+            [int(s) for s in args.sizes.split(",")],
+            [f for f in args.functions.split(",") if f],
+            args.budget,
+            args.call_limit,
+        )
+        out = args.out or os.path.join("var", "bench", f"nlp_scaling-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"[bench] resultados en {out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for r in regressions:
+            after = f"{r['after']} ops/s ({r['change']:+.1%})" if r["change"] is not None else r["after"]
+            print(f"REGRESIÓN {r['size']} {r['function']} {r['corpus']}: {r['before']} ops/s → {after}")
+        if regressions:
+            sys.exit(1)
+        print(f"[bench] sin regresiones mayores a {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
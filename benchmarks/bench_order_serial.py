@@ -0,0 +1,61 @@
+"""
+Prueba de concurrencia del asignador de seriales de órdenes.
+
+Lanza cientos de creaciones de órdenes en paralelo (cada una en su propia
+transacción) y verifica que no haya seriales repetidos.
+
+Uso:
+    DATABASE_URL=postgresql+psycopg://... DB_SYNC_POOL_SIZE=32 python -m benchmarks.bench_order_serial --orders 500 --workers 32
+
+Usa el engine sync de la app: sube DB_SYNC_POOL_SIZE a --workers para que las
+creaciones compitan de verdad en lugar de esperar por conexión del pool.
+"""
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.storage import models  # noqa: F401  # registra modelos
+from app.storage.db import Base, SessionLocal, engine
+from app.storage.models import Order
+from app.storage.order_serial import next_order_serial
+
+
+def create_one(n: int) -> str:
+    with SessionLocal() as db:
+        created_at = datetime.utcnow()
+        serial = next_order_serial(db, created_at)
+        db.add(Order(
+            user_id=f"bench-{n}",
+            items=[{"nombre": "Producto", "cantidad": 1, "precio_unitario": 1000}],
+            total=1000.0,
+            status="pending",
+            order_serial=serial,
+            created_at=created_at,
+        ))
+        db.commit()
+        return serial
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        serials = list(pool.map(create_one, range(args.orders)))
+    elapsed = time.perf_counter() - start
+
+    duplicated = [s for s, c in Counter(serials).items() if c > 1]
+    print(f"{len(serials)} órdenes en {elapsed:.2f}s ({len(serials) / elapsed:.1f} órdenes/s)")
+    if duplicated:
+        raise SystemExit(f"Seriales duplicados: {duplicated[:10]}")
+    print("OK: todos los seriales son únicos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark de reportes filtrados por fecha, antes y después de particionar.
+
+Mide las consultas crudas de reportes (fechas con hora para no usar los
+rollups) sobre una ventana de 30 días y sobre todo el histórico, e indica
+cuántas tablas/particiones de orders y order_items recorre el plan.
+
+Uso (PostgreSQL):
+    # 1. Esquema normal: sembrar y medir ("antes")
+    DATABASE_URL=... python -m benchmarks.bench_partitioning --seed 200000 --months 24
+    # 2. Migrar a tablas particionadas
+    DATABASE_URL=... python -m app.storage.partitioning --migrate
+    # 3. Medir de nuevo ("después")
+    DATABASE_URL=... python -m benchmarks.bench_partitioning
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app.routers.reports import order_full_detail_query, order_summary_query, sales_by_product_query
+from app.storage import models
+from app.storage.db import Base, SessionLocal, engine
+from app.storage.migrations import run_migrations
+from app.storage.partitioning import ensure_partitions, is_partitioned
+from app.storage.query_audit import Explain
+from app.storage.sync_relational import sync_orders_to_relational
+
+BUILDERS = {
+    "order_summary": order_summary_query,
+    "sales_by_product": sales_by_product_query,
+    "order_full_detail": order_full_detail_query,
+}
+
+
+def seed(n_orders: int, months: int, chunk: int = 2000) -> None:
+    """Órdenes sintéticas repartidas en los últimos `months` meses (si la tabla está vacía)."""
+    now = datetime.utcnow().replace(microsecond=0)
+    span = timedelta(days=30 * months)
+    with SessionLocal() as db:
+        if db.execute(select(func.count()).select_from(models.Order)).scalar_one():
+            return
+        if engine.dialect.name == "postgresql" and is_partitioned(db.connection(), "orders"):
+            ensure_partitions(db.connection(), (now - span).date(), now.date())
+        for offset in range(0, n_orders, chunk):
+            orders = []
+            for n in range(offset, min(offset + chunk, n_orders)):
+                created_at = now - span * (n / n_orders)
+                items = [
+                    {"nombre": f"Bench producto {(n + k) % 60}", "cantidad": 1 + k, "precio_unitario": 1000 + k}
+                    for k in range(3)
+                ]
+                orders.append(models.Order(
+                    user_id=f"bench-user-{n % 300}",
+                    items=items,
+                    total=sum(i["cantidad"] * i["precio_unitario"] for i in items),
+                    status="delivered",
+                    order_serial=f"BENCH-{created_at:%Y%m%d}-{n:07d}",
+                    created_at=created_at,
+                ))
+            db.add_all(orders)
+            db.flush()
+            sync_orders_to_relational(db, orders)
+            db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+
+def _scanned_relations(db, stmt) -> int:
+    if engine.dialect.name != "postgresql":
+        return -1
+    plan = db.execute(Explain(stmt, "EXPLAIN (FORMAT JSON)")).scalar()
+    found = set()
+
+    def walk(node):
+        name = node.get("Relation Name", "")
+        if name.startswith(("orders", "order_items")):
+            found.add(name)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return len(found)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--reps", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    if args.seed:
+        seed(args.seed, args.months)
+
+    now = datetime.utcnow()
+    windows = {
+        "30d": ((now - timedelta(days=30)).isoformat(timespec="seconds"), now.isoformat(timespec="seconds")),
+        "todo": ((now - timedelta(days=31 * (args.months + 1))).isoformat(timespec="seconds"), now.isoformat(timespec="seconds")),
+    }
+    with SessionLocal() as db:
+        partitioned = engine.dialect.name == "postgresql" and is_partitioned(db.connection(), "orders")
+        for report, builder in BUILDERS.items():
+            for window, (desde, hasta) in windows.items():
+                q = builder(db, desde=desde, hasta=hasta)
+                timings = []
+                for _ in range(args.reps):
+                    start = time.perf_counter()
+                    q.all()
+                    timings.append(time.perf_counter() - start)
+                print({
+                    "schema": "partitioned" if partitioned else "plain",
+                    "report": report,
+                    "window": window,
+                    "p50_ms": round(statistics.median(timings) * 1000, 2),
+                    "relations_scanned": _scanned_relations(db, q.statement),
+                })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark de creación de órdenes con sincronización relacional por conjunto.
+
+Mide orden + serial + customers/products/order_items en una sola transacción
+para órdenes de 1, 50 y 500 líneas.
+
+Uso:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_relational_sync --reps 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from app.storage import models  # noqa: F401  # registra modelos
+from app.storage.db import Base, SessionLocal, engine
+from app.storage.models import Order
+from app.storage.order_serial import next_order_serial
+from app.storage.sync_relational import sync_orders_to_relational
+
+
+def create_order(lines: int, rep: int) -> float:
+    items = [
+        {"nombre": f"Bench producto {n}", "cantidad": 1 + n % 7, "precio_unitario": 1000 + n}
+        for n in range(lines)
+    ]
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        created_at = datetime.utcnow()
+        order = Order(
+            user_id=f"bench-user-{rep % 10}",
+            items=items,
+            total=sum(i["cantidad"] * i["precio_unitario"] for i in items),
+            status="pending",
+            order_serial=next_order_serial(db, created_at),
+            created_at=created_at,
+        )
+        db.add(order)
+        db.flush()
+        sync_orders_to_relational(db, [order])
+        db.commit()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reps", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 50, 500])
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    for lines in args.sizes:
+        create_order(lines, -1)  # calentamiento (productos ya existentes)
+        timings = sorted(create_order(lines, rep) for rep in range(args.reps))
+        print({
+            "lines": lines,
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "max_ms": round(timings[-1] * 1000, 2),
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark de memoria de la exportación en streaming de order_full_detail.
+
+Compara el pico de memoria (tracemalloc) de materializar el detalle con
+`_rows(...)` contra recorrer la exportación CSV en streaming (engine async). El pico del
+streaming debe mantenerse plano aunque crezca el número de filas.
+
+Uso:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_report_export --seed 20000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app.routers.reports import _rows, _stream_csv, order_full_detail_query
+from app.storage.db import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.storage.query_audit import seed
+
+
+def measure(fn) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = asyncio.run(fn())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows_or_bytes": result, "ms": round(elapsed * 1000, 1), "peak_mb": round(peak / 2**20, 2)}
+
+
+async def materialized() -> int:
+    async with AsyncSessionLocal() as db:
+        rows = await _rows(db, order_full_detail_query, {})
+    await async_engine.dispose()
+    return len(rows)
+
+
+async def streamed() -> int:
+    total = 0
+    async for chunk in _stream_csv({}):
+        total += len(chunk)
+    await async_engine.dispose()
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="Órdenes sintéticas a insertar antes de medir")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if args.seed:
+        with SessionLocal() as db:
+            seed(db, args.seed)
+    print({"mode": "materialized", **measure(materialized)})
+    print({"mode": "streamed_csv", **measure(streamed)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Prueba de carga end-to-end en proceso (sin cluster de staging).
+
+Levanta la app completa con su lifespan sobre `httpx.ASGITransport` y
+reemplaza los servicios externos: carrito en memoria, sin Redis (la caché de
+reportes queda solo local) y una base SQLite desechable (o la que se pase con
+`--database-url`, p. ej. un PostgreSQL local).
+
+Reproduce conversaciones grabadas:
+- JSONL del historial del chat (`logs/chat_history-*.jsonl`: session_id, cliente),
+- JSONL genérico con `message` (y opcionalmente `session_id`, `channel`),
+- el arreglo antiguo `logs/chat_history.json`.
+Sin `--transcripts` usa conversaciones sintéticas del catálogo.
+
+Cada usuario virtual toma una sesión según `--mix`:
+- chat: reproduce una conversación en `/chat/`;
+- buyer: conversación + `POST /orders/`;
+- dashboard: consulta `GET /reports/summary_all` varias veces.
+
+Antes de medir espera a que `/health/ready` responda 200 (warm-up del
+arranque terminado), para que los primeros requests no compitan con la
+construcción de cachés e índices.
+
+Reporta throughput, percentiles de latencia y tasa de error por endpoint.
+Con un solo proceso, el trabajo CPU de `/chat/` se serializa en el event
+loop: los números son por worker.
+
+Uso:
+    python -m benchmarks.load_harness --sessions 300 --concurrency 20
+    python -m benchmarks.load_harness --transcripts logs/chat_history-20250101-w1.jsonl --duration 60 --mix chat=6,buyer=3,dashboard=1
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+
+def _configure_env(database_url: str | None, keep_logs: bool) -> str | None:
+    """Antes de importar la app: servicios locales en lugar de Redis/PostgreSQL."""
+    tmp = None
+    if database_url is None:
+        tmp = tempfile.mkdtemp(prefix="load-harness-")
+        database_url = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["CART_STORE"] = "memory"
+    os.environ["REDIS_URL"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not keep_logs:
+        os.environ["CHAT_LOG_ENABLED"] = "0"
+    return tmp
+
+
+# === Conversaciones ===
+def load_transcripts(paths: list[str]) -> list[list[dict]]:
+    sessions: dict[str, list[dict]] = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                records = json.load(f)
+            else:
+                records = [json.loads(line) for line in f if line.strip()]
+        for n, record in enumerate(records):
+            message = record.get("message") or record.get("cliente") or record.get("text")
+            if not message:
+                continue
+            session = record.get("session_id") or f"{os.path.basename(path)}-{n}"
+            sessions[session].append({"message": message, "channel": record.get("channel") or "replay"})
+    return list(sessions.values())
+
+
+def synthetic_transcripts(rows: list[dict], count: int = 200, seed: int = 7) -> list[list[dict]]:
+    rng = random.Random(seed)
+    names = [r["nombre"].lower() for r in rows]
+    templates = [
+        ["hola", "cuánto vale {a}", "quiero {q} {a} y {q} {b}", "ver carrito", "gracias"],
+        ["buenas tardes", "precio de {a}", "hacen envíos a medellín?", "quiero {q} {a}"],
+        ["quiero {q} {a}, {q} {b} y {q} {c}", "quita {a}", "ver carrito"],
+        ["tienen {a}?", "tienen descuento por volumen?", "gracias"],
+        ["el pedido llegó incompleto otra vez 🙄", "quiero hablar con un asesor"],
+        ["cuál es el pedido mínimo?", "aceptan pago contraentrega?", "{a}"],
+    ]
+    transcripts = []
+    for _ in range(count):
+        a, b, c = rng.sample(names, 3)
+        transcripts.append([
+            {"message": t.format(a=a, b=b, c=c, q=rng.randint(1, 12)), "channel": "synthetic"}
+            for t in rng.choice(templates)
+        ])
+    return transcripts
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"chat", "buyer", "dashboard"}
+    if unknown:
+        raise SystemExit(f"--mix: tipos desconocidos {sorted(unknown)}")
+    return mix
+
+
+# === Carga ===
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.sessions = 0
+
+    async def call(self, client, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+            if ok and endpoint == "/chat/":
+                ok = "error interno" not in response.json().get("agent_response", "").lower()
+        except Exception:
+            response, ok = None, False
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+
+            def pct(p):
+                return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "error_rate": round(self.errors[endpoint] / len(values), 4),
+                "p50_ms": pct(0.50),
+                "p90_ms": pct(0.90),
+                "p99_ms": pct(0.99),
+                "max_ms": round(values[-1] * 1000, 2),
+                "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "seconds": round(elapsed, 2),
+            "sessions": self.sessions,
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+async def run_session(client, stats: Stats, kind: str, transcript: list[dict], rows: list[dict], rng: random.Random, n: int, think: float):
+    session_id = f"load-{n}"
+    if kind == "dashboard":
+        for _ in range(rng.randint(2, 5)):
+            await stats.call(client, "/reports/summary_all", "GET", "/reports/summary_all")
+            if think:
+                await asyncio.sleep(think)
+        return
+    for turn in transcript:
+        await stats.call(
+            client, "/chat/", "POST", "/chat/",
+            json={"message": turn["message"], "session_id": session_id, "channel": turn["channel"]},
+        )
+        if think:
+            await asyncio.sleep(think)
+    if kind == "buyer":
+        items = [
+            {"nombre": r["nombre"], "cantidad": rng.randint(1, 10), "precio_unitario": float(r["precio_lista"])}
+            for r in rng.sample(rows, rng.randint(1, 4))
+        ]
+        await stats.call(
+            client, "/orders/", "POST", "/orders/",
+            json={"user_id": f"load-user-{n % 500}", "items": items, "status": "pending"},
+        )
+
+
+async def wait_ready(client, timeout: float = 120.0) -> float:
+    """Espera a que /health/ready responda 200; retorna los segundos esperados."""
+    start = time.perf_counter()
+    while True:
+        response = await client.get("/health/ready")
+        if response.status_code == 200:
+            return time.perf_counter() - start
+        if response.json().get("status") == "failed":
+            raise SystemExit("El warm-up del arranque falló: /health/ready en estado failed")
+        if time.perf_counter() - start > timeout:
+            raise SystemExit(f"/health/ready no respondió 200 en {timeout:.0f}s")
+        await asyncio.sleep(0.05)
+
+
+async def drive(args, transcripts: list[list[dict]]) -> dict:
+    import httpx
+
+    from app.core.catalog import CATALOG
+    from app.main import app
+
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    rng = random.Random(args.seed)
+    stats = Stats()
+    counter = iter(range(10**9))
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def user(client):
+        while True:
+            n = next(counter)
+            if deadline is None and n >= args.sessions:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            kind = rng.choices(kinds, weights)[0]
+            await run_session(client, stats, kind, rng.choice(transcripts), CATALOG, rng, n, args.think_ms / 1000)
+            stats.sessions += 1
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-harness", timeout=None) as client:
+            waited = await wait_ready(client)
+            print(f"[load] app lista tras {waited:.2f}s de warm-up", file=sys.stderr)
+            start = time.perf_counter()
+            await asyncio.gather(*(user(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+    return stats.report(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcripts", nargs="*", default=[], help="Archivos (acepta globs) JSONL o chat_history.json")
+    parser.add_argument("--sessions", type=int, default=200, help="Sesiones a ejecutar (si no hay --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="Segundos de carga (tiene prioridad sobre --sessions)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--mix", default="chat=7,buyer=2,dashboard=1", help="Pesos por tipo de sesión")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pausa entre requests de una sesión")
+    parser.add_argument("--database-url", default=None, help="Base a usar (por defecto SQLite temporal)")
+    parser.add_argument("--keep-chat-log", action="store_true", help="No desactivar el log de interacciones")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", default=None, help="Guardar el reporte en este archivo")
+    args = parser.parse_args()
+
+    _configure_env(args.database_url, args.keep_chat_log)
+    paths = [p for pattern in args.transcripts for p in sorted(glob.glob(pattern))]
+    if paths:
+        transcripts = load_transcripts(paths)
+    else:
+        from app.core.catalog import CATALOG
+        transcripts = synthetic_transcripts(CATALOG)
+    if not transcripts:
+        raise SystemExit("No se encontraron conversaciones en los archivos indicados.")
+    print(f"[load] {len(transcripts)} conversaciones, concurrencia {args.concurrency}", file=sys.stderr)
+
+    report = asyncio.run(drive(args, transcripts))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()